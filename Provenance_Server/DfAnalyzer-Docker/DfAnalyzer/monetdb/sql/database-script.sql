@@ -108,7 +108,7 @@ CREATE TABLE attribute(
 
 CREATE TABLE task(
 	id INTEGER DEFAULT NEXT VALUE FOR "task_id_seq" NOT NULL,
-	identifier INTEGER NOT NULL,
+	identifier BIGINT NOT NULL,
 	df_version INTEGER NOT NULL,
 	dt_id INTEGER NOT NULL,
 	status VARCHAR(10),
@@ -253,7 +253,7 @@ BEGIN
 END;
 
 -- DROP FUNCTION insertTask;
-CREATE FUNCTION insertTask (videntifier INTEGER, vdf_tag VARCHAR(50), vdt_tag VARCHAR(50), vstatus VARCHAR(10), vworkspace VARCHAR(500), 
+CREATE FUNCTION insertTask (videntifier BIGINT, vdf_tag VARCHAR(50), vdt_tag VARCHAR(50), vstatus VARCHAR(10), vworkspace VARCHAR(500), 
 	vcomputing_resource VARCHAR(100), voutput_msg TEXT, verror_msg TEXT)
 RETURNS INTEGER
 BEGIN
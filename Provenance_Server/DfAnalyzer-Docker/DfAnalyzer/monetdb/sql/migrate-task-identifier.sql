@@ -0,0 +1,41 @@
+-- Widens task.identifier to BIGINT in databases created before task ids
+-- became 64-bit. DfAnalyzer runs this script at startup when it finds an
+-- INTEGER identifier column.
+DROP FUNCTION insertTask;
+
+ALTER TABLE task ADD COLUMN identifier_bigint BIGINT;
+UPDATE task SET identifier_bigint = identifier;
+ALTER TABLE task DROP COLUMN identifier;
+ALTER TABLE task RENAME COLUMN identifier_bigint TO identifier;
+ALTER TABLE task ALTER COLUMN identifier SET NOT NULL;
+
+CREATE FUNCTION insertTask (videntifier BIGINT, vdf_tag VARCHAR(50), vdt_tag VARCHAR(50), vstatus VARCHAR(10), vworkspace VARCHAR(500), 
+	vcomputing_resource VARCHAR(100), voutput_msg TEXT, verror_msg TEXT)
+RETURNS INTEGER
+BEGIN
+	DECLARE vid INTEGER;
+	DECLARE vvstatus VARCHAR(10);
+	DECLARE vdf_version INTEGER;
+	DECLARE vdt_id INTEGER;
+
+	SELECT dfv.version, dt.id INTO vdf_version, vdt_id
+	FROM dataflow df, data_transformation dt, dataflow_version as dfv
+	WHERE df.id = dt.df_id AND dfv.df_id = df.id AND df.tag = vdf_tag AND dt.tag = vdt_tag;
+
+	IF((vdf_version IS NOT NULL) AND (vdt_id IS NOT NULL)) THEN
+		SELECT t.id, t.status INTO vid, vvstatus
+		FROM task t
+		WHERE t.df_version = vdf_version AND t.dt_id = vdt_id AND t.identifier = videntifier;
+
+		IF(vid IS NULL) THEN
+		    SELECT NEXT VALUE FOR "task_id_seq" into vid;
+		    INSERT INTO task(id,identifier,df_version,dt_id,status,workspace,computing_resource,output_msg,error_msg) 
+		    VALUES (vid,videntifier,vdf_version,vdt_id,vstatus,vworkspace,vcomputing_resource,voutput_msg,verror_msg);
+	    ELSE
+	    	UPDATE task
+	    	SET status = vstatus, output_msg = voutput_msg, error_msg = verror_msg
+	    	WHERE identifier = videntifier AND df_version = vdf_version AND dt_id = vdt_id;
+		END IF;
+    END IF;
+	RETURN vid;
+END;
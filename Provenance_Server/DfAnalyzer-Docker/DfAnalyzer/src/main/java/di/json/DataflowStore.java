@@ -0,0 +1,119 @@
+package di.json;
+
+import java.io.File;
+import java.io.FileWriter;
+import java.io.IOException;
+import java.util.ArrayList;
+import java.util.logging.Level;
+import java.util.logging.Logger;
+import org.json.simple.JSONArray;
+import org.json.simple.JSONObject;
+
+/**
+ * Keeps the last specification of every registered dataflow on disk, so
+ * that a dataflow is known after a restart even if its client does not
+ * register it again, and so that delta specifications can be merged.
+ */
+public class DataflowStore {
+
+    private static final File DIRECTORY = new File(
+            System.getProperty("dfa.dataflow.dir", "dataflows"));
+
+    private static File getFile(String dfTag) {
+        return new File(DIRECTORY, dfTag.toLowerCase() + ".json");
+    }
+
+    public static synchronized JSONObject get(String dfTag) {
+        File file = getFile(dfTag);
+        if (!file.exists()) {
+            return null;
+        }
+        return JSONReader.readDataflow(file.getAbsolutePath());
+    }
+
+    public static synchronized void put(JSONObject dfJSON) {
+        DIRECTORY.mkdirs();
+        File file = getFile((String) dfJSON.get("tag"));
+        File tmp = new File(DIRECTORY, file.getName() + ".tmp");
+        try (FileWriter writer = new FileWriter(tmp)) {
+            writer.write(dfJSON.toJSONString());
+        } catch (IOException ex) {
+            Logger.getLogger(DataflowStore.class.getName()).log(Level.SEVERE, null, ex);
+            return;
+        }
+        if (!tmp.renameTo(file)) {
+            file.delete();
+            tmp.renameTo(file);
+        }
+    }
+
+    /**
+     * Merges a delta specification (new transformations and new sets of
+     * existing transformations) into the stored one.
+     *
+     * @param delta the delta specification
+     * @param newSets receives a "transformation/set" key for every new set
+     * @param oldSetTags receives the tags of the sets stored before the merge
+     * @return the merged specification, or null if the dataflow is unknown
+     */
+    public static synchronized JSONObject merge(JSONObject delta,
+            ArrayList<String> newSets, ArrayList<String> oldSetTags) {
+        JSONObject stored = get((String) delta.get("tag"));
+        if (stored == null) {
+            return null;
+        }
+        JSONArray storedDts = (JSONArray) stored.get("transformations");
+        if (storedDts == null) {
+            storedDts = new JSONArray();
+            stored.put("transformations", storedDts);
+        }
+        for (Object o : storedDts) {
+            JSONArray sets = (JSONArray) ((JSONObject) o).get("sets");
+            if (sets != null) {
+                for (Object s : sets) {
+                    String tag = ((String) ((JSONObject) s).get("tag")).toLowerCase();
+                    if (!oldSetTags.contains(tag)) {
+                        oldSetTags.add(tag);
+                    }
+                }
+            }
+        }
+
+        JSONArray dts = (JSONArray) delta.get("transformations");
+        if (dts != null) {
+            for (Object o : dts) {
+                JSONObject dtJSON = (JSONObject) o;
+                String dtTag = ((String) dtJSON.get("tag")).toLowerCase();
+                JSONObject storedDt = JSONReader.getDataTransformation(stored, (String) dtJSON.get("tag"));
+                if (storedDt == null) {
+                    storedDt = new JSONObject();
+                    storedDt.put("tag", dtJSON.get("tag"));
+                    storedDt.put("sets", new JSONArray());
+                    storedDts.add(storedDt);
+                }
+                JSONArray storedSets = (JSONArray) storedDt.get("sets");
+                if (storedSets == null) {
+                    storedSets = new JSONArray();
+                    storedDt.put("sets", storedSets);
+                }
+                ArrayList<String> storedSetTags = new ArrayList<>();
+                for (Object s : storedSets) {
+                    storedSetTags.add(((String) ((JSONObject) s).get("tag")).toLowerCase());
+                }
+                JSONArray sets = (JSONArray) dtJSON.get("sets");
+                if (sets != null) {
+                    for (Object s : sets) {
+                        String tag = ((String) ((JSONObject) s).get("tag")).toLowerCase();
+                        if (!storedSetTags.contains(tag)) {
+                            storedSets.add(s);
+                            newSets.add(dtTag + "/" + tag);
+                        }
+                    }
+                }
+            }
+        }
+
+        put(stored);
+        return stored;
+    }
+}
@@ -0,0 +1,63 @@
+package di.json;
+
+import java.util.LinkedHashMap;
+import java.util.Map;
+import org.json.simple.JSONArray;
+import org.json.simple.JSONObject;
+
+/**
+ * Keeps the elements of interned datasets, so that clients can send a
+ * dataset repeated across tasks (e.g. system and script metadata) once and
+ * refer to it afterwards. A set of a task with a "ref" and "elements" is
+ * stored under its reference; a set with a "ref" only is expanded with the
+ * stored elements. The least recently used references are forgotten, and
+ * a task with an unknown reference is rejected, so the client sends the
+ * dataset again.
+ */
+public class DatasetReferences {
+
+    private static final int MAX_ENTRIES = Integer.getInteger(
+            "dfa.dataset.references", 10000);
+
+    private static final Map<String, JSONArray> REFERENCES
+            = new LinkedHashMap<String, JSONArray>(16, 0.75f, true) {
+        @Override
+        protected boolean removeEldestEntry(Map.Entry<String, JSONArray> eldest) {
+            return size() > MAX_ENTRIES;
+        }
+    };
+
+    /**
+     * Stores and expands the dataset references of a task.
+     *
+     * @param task the task json
+     * @return the task, without references
+     * @throws IllegalArgumentException if a reference is unknown
+     */
+    public static synchronized JSONObject expand(JSONObject task) {
+        JSONArray sets = (JSONArray) task.get("sets");
+        if (sets == null) {
+            return task;
+        }
+        for (Object o : sets) {
+            JSONObject set = (JSONObject) o;
+            Object ref = set.remove("ref");
+            if (ref == null) {
+                continue;
+            }
+            String key = task.get("dataflow") + "/" + set.get("tag") + "/" + ref;
+            JSONArray elements = (JSONArray) set.get("elements");
+            if (elements != null) {
+                REFERENCES.put(key, elements);
+                continue;
+            }
+            elements = REFERENCES.get(key);
+            if (elements == null) {
+                throw new IllegalArgumentException(
+                        "Unknown dataset reference " + key + ".");
+            }
+            set.put("elements", elements);
+        }
+        return task;
+    }
+}
@@ -123,7 +123,7 @@ public class JSONReader {
         return null;
     }
 
-    static JSONObject getTask(String dataflowAnalyzerDirectory, String dataflowTag, String transformationTag, Integer taskID) {
+    static JSONObject getTask(String dataflowAnalyzerDirectory, String dataflowTag, String transformationTag, Long taskID) {
         try {
             JSONParser parser = new JSONParser();
             FileReader fr = new FileReader(Utils.getTaskFilePath(dataflowAnalyzerDirectory, dataflowTag, transformationTag, taskID));
@@ -398,7 +398,7 @@ public class JSONReader {
         Transaction t = new Transaction(TransactionType.TASK, fileName, path, dbms);
 
         Task task = new Task();
-        task.ID = Integer.parseInt((String) jsonFile.get("id"));
+        task.ID = Long.parseLong((String) jsonFile.get("id"));
 
         Object objSubID = jsonFile.get("subid");
         if (objSubID != null && !((String) objSubID).equals("null")) {
@@ -469,27 +469,36 @@ public class JSONReader {
             Iterator<JSONObject> it = sets.iterator();
             while (it.hasNext()) {
                 JSONObject setJSON = it.next();
+                String setTag = (String) setJSON.get("tag");
 
                 Element e = new Element();
                 e.dataflowTag = task.dataflowTag;
                 e.transformationTag = task.transformationTag;
-                e.setTag = (String) setJSON.get("tag");
+                e.setTag = setTag;
 
                 JSONArray elements = (JSONArray) setJSON.get("elements");
                 if (elements != null) {
                     for (Object element : elements.toArray()) {
                         if (element instanceof JSONArray) {
-                            JSONArray values = (JSONArray) element;
-                            for (Object value : values) {
-                                e.values.add((String) value);
+                            // every row of a columnar dataset is one element
+                            Element row = new Element();
+                            row.dataflowTag = task.dataflowTag;
+                            row.transformationTag = task.transformationTag;
+                            row.setTag = setTag;
+                            for (Object value : (JSONArray) element) {
+                                // JSON null is kept as a missing value, not as 'null' text
+                                row.values.add(value == null ? null : String.valueOf(value));
                             }
+                            task.elements.add(row);
                         } else {
-                            e.values.add((String) element);
+                            e.values.add(element == null ? null : String.valueOf(element));
                         }
                     }
                 }
 
-                task.elements.add(e);
+                if (elements == null || !e.values.isEmpty()) {
+                    task.elements.add(e);
+                }
             }
         }
 
@@ -53,7 +53,7 @@ public class Utils {
         return Utils.getJSONDirectory(dfaDirectory) + DIR_SEPARATOR + obj.dataflowTag + DIR_SEPARATOR;
     }
 
-    public static String getTaskFilePath(String dfaDirectory, String dataflowTag, String transformationTag, Integer taskID) {
+    public static String getTaskFilePath(String dfaDirectory, String dataflowTag, String transformationTag, Long taskID) {
         return dfaDirectory + DIR_SEPARATOR
                 + dataflowTag + DIR_SEPARATOR
                 + transformationTag + SEPARATOR
@@ -33,6 +33,10 @@ public class Transaction {
     public long generationEnd;
     public long queueingStart;
     public long queueingEnd;
+    // set only for delta dataflow specifications: the "transformation/set"
+    // keys of the new sets and the tags of the sets stored before
+    public ArrayList<String> deltaSets;
+    public ArrayList<String> storedSetTags;
     
     public Transaction(TransactionType type){
         this.type = type;
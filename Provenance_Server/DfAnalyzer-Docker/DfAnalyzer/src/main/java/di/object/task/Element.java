@@ -13,7 +13,7 @@ import utils.Utils;
 public class Element extends DataflowObject {
 
     public String transformationTag = "";
-    public Integer taskID;
+    public Long taskID;
     public String setTag = "";
     public ArrayList<String> values = new ArrayList<>();
 
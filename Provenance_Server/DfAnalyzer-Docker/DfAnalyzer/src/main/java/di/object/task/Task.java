@@ -13,7 +13,7 @@ import di.dataflow.object.DataflowObject;
 public class Task extends DataflowObject {
 
     public String transformationTag = "";
-    public Integer ID = null;
+    public Long ID = null;
     public Integer subID = null;
     public String resource = "";
     public String workspace = "";
@@ -52,7 +52,7 @@ public class DataflowProvenance {
                     newDf = false;
                     dfID = df.ID;
                 }
-            } else if (newDf && o.getType() == DataflowType.TRANSFORMATION) {
+            } else if (o.getType() == DataflowType.TRANSFORMATION && (newDf || t.deltaSets != null)) {
                 Transformation dt = (Transformation) o;
                 if (Utils.verbose) {
                     Utils.print(1, "Transformation - " + dt.tag);
@@ -64,7 +64,7 @@ public class DataflowProvenance {
                     Utils.print(1, "Program - " + p.name);
                 }
                 storeProgram(db, dfID, transformations.get(p.transformationTag), p, t.getDBMS());
-            } else if (newDf && o.getType() == DataflowType.SET) {
+            } else if (o.getType() == DataflowType.SET && (newDf || isDeltaSet(t, (Set) o))) {
                 Set s = (Set) o;
                 if (Utils.verbose) {
                     Utils.print(1, "Set - " + s.tag);
@@ -79,7 +79,9 @@ public class DataflowProvenance {
                         depDtID, s, t.getDBMS());
                 sets.put(s.tag, setID);
 
-                if (setTags.indexOf(s.tag) == -1) {
+                if (!newDf && t.storedSetTags.contains(s.tag)) {
+                    addTaskColumn(db, s, t.getDBMS());
+                } else if (setTags.indexOf(s.tag) == -1) {
                     s.defineTaskColumns();
                     setTags.add(s.tag);
                     setTables.add(s);
@@ -132,6 +134,11 @@ public class DataflowProvenance {
         return dfID;
     }
 
+    private static boolean isDeltaSet(Transaction t, Set s) {
+        return t.deltaSets != null
+                && t.deltaSets.contains(s.transformation.tag + "/" + s.tag);
+    }
+
     private static Integer storeDataflow(Connection db, Dataflow df, DBMS dbms) {
         try {
             Statement st = db.createStatement();
@@ -285,6 +292,23 @@ public class DataflowProvenance {
         return false;
     }
 
+    private static boolean addTaskColumn(Connection db, Set s, DBMS dbms) {
+        String table = Utils.getDataSetTableName(s.tag).toLowerCase();
+        if (!dbms.equals(DBMS.MEMSQL)) {
+            table = "\"" + table + "\"";
+        }
+        try {
+            Statement st = db.createStatement();
+            st.execute("ALTER TABLE " + table + " ADD COLUMN "
+                    + s.transformation.tag.toLowerCase() + "_task_id INTEGER;");
+            return true;
+        } catch (Exception ex) {
+            ex.printStackTrace();
+        }
+
+        return false;
+    }
+
     private static String createDataSetSQLStatement(Set s, DBMS dbms) {
         String SQL;
         if (dbms.equals(DBMS.MEMSQL)) {
@@ -647,7 +671,7 @@ public class DataflowProvenance {
         return sb;
     }
 
-    protected static Integer getTransformationID(Connection db, String dtTag, Integer identifier) {
+    protected static Integer getTransformationID(Connection db, String dtTag, Long identifier) {
         try {
             Statement st = db.createStatement();
             StringBuilder sb = new StringBuilder();
@@ -35,7 +35,7 @@ import di.main.Utils;
  */
 public class TaskProvenance {
 
-    public static Integer handleTaskTransaction(Connection db, Transaction t) {
+    public static Long handleTaskTransaction(Connection db, Transaction t) {
         for (DataflowObject o : t.getObjects()) {
             if (o.getType() == DataflowType.TASK) {
                 Task task = (Task) o;
@@ -60,7 +60,7 @@ public class TaskProvenance {
         return null;
     }
 
-    public static Integer handleTaskTransaction(Connection db, Transaction t, Dataflow df) {
+    public static Long handleTaskTransaction(Connection db, Transaction t, Dataflow df) {
         for (DataflowObject o : t.getObjects()) {
             if (o.getType() == DataflowType.TASK) {
                 Task task = (Task) o;
@@ -72,14 +72,14 @@ public class TaskProvenance {
                     return storeTask(db, task, df, t.getDBMS());
                 } else {
                     System.err.println(" ERROR: Task - " + task.dataflowTag + " - " + task.ID + " - " + task.subID + " - " + task.status);
-                    return -1;
+                    return -1L;
                 }
             }
         }
         return null;
     }
 
-    private static Integer storeTask(Connection db, Task t, Dataflow df, DBMS dbms) {
+    private static Long storeTask(Connection db, Task t, Dataflow df, DBMS dbms) {
         try {
             Statement st = db.createStatement();
             if (!t.dependencyIDs.isEmpty()) {
@@ -90,7 +90,7 @@ public class TaskProvenance {
                             if (Utils.isNumericArray(record[index])) {
                                 HashMap<String, Integer> hmap = new HashMap<>();
                                 hmap.put(t.dependencyTags.get(index).toLowerCase(),
-                                        DataflowProvenance.getTransformationID(db, t.dependencyTags.get(index).toLowerCase(), Integer.parseInt(record[index])));
+                                        DataflowProvenance.getTransformationID(db, t.dependencyTags.get(index).toLowerCase(), Long.parseLong(record[index])));
                                 t.dependencyTaskIDs.add(hmap);
                             }
                         }
@@ -108,7 +108,7 @@ public class TaskProvenance {
                         + t.output + "','" + t.error + "');");
             }
             if (rs.next()) {
-                t.ID = rs.getInt(1);
+                t.ID = rs.getLong(1);
             }
 
             ArrayList<Set> taskSets = df.getSetsFromTransformation(t.transformationTag);
@@ -409,7 +409,9 @@ public class TaskProvenance {
                 String currentValue = element.values.get(i);
                 index++;
 
-                if (a.type == AttributeType.LONG_TEXT
+                if (currentValue == null) {
+                    tuple.append(",NULL");
+                } else if (a.type == AttributeType.LONG_TEXT
                         || a.type == AttributeType.TEXT
                         || a.type == AttributeType.FILE) {
                     tuple.append(",'").append(currentValue).append("'");
@@ -536,7 +538,7 @@ public class TaskProvenance {
         }
     }
 
-    private static ResultSet insertTask(Connection db, Integer videntifier, String vdf_tag, String vdt_tag, String vstatus, String vworkspace, String vcomputing_resource, String voutput_msg, String verror_msg) throws SQLException {
+    private static ResultSet insertTask(Connection db, Long videntifier, String vdf_tag, String vdt_tag, String vstatus, String vworkspace, String vcomputing_resource, String voutput_msg, String verror_msg) throws SQLException {
         Integer vid = null, vdf_version = null, vdt_id = null;
         String vvstatus;
 
@@ -555,7 +557,7 @@ public class TaskProvenance {
             st = db.prepareStatement("SELECT t.id, t.status FROM task t WHERE t.df_version = (?) AND t.dt_id = (?) AND t.identifier = (?);");
             st.setInt(1, vdf_version);
             st.setInt(2, vdt_id);
-            st.setInt(3, videntifier);
+            st.setLong(3, videntifier);
             rs = st.executeQuery();
 
             if (rs.next()) {
@@ -565,7 +567,7 @@ public class TaskProvenance {
 
             if (vid == null) {
                 st = db.prepareStatement("INSERT INTO task(identifier,df_version,dt_id,status,workspace,computing_resource,output_msg,error_msg) VALUES(?,?,?,?,?,?,?,?);", Statement.RETURN_GENERATED_KEYS);
-                st.setInt(1, videntifier);
+                st.setLong(1, videntifier);
                 st.setInt(2, vdf_version);
                 st.setInt(3, vdt_id);
                 st.setString(4, vstatus);
@@ -580,7 +582,7 @@ public class TaskProvenance {
                 st.setString(1, vstatus);
                 st.setString(2, voutput_msg);
                 st.setString(3, verror_msg);
-                st.setInt(4, videntifier);
+                st.setLong(4, videntifier);
                 st.setInt(5, vdf_version);
                 st.setInt(6, vdt_id);
                 st.executeUpdate();
@@ -591,7 +593,7 @@ public class TaskProvenance {
         return rs;
     }
 
-    private static ResultSet insertFile(Connection db, Integer vtask_id, String vname, String vpath) throws SQLException {
+    private static ResultSet insertFile(Connection db, Long vtask_id, String vname, String vpath) throws SQLException {
         PreparedStatement st = db.prepareStatement("SELECT id FROM file WHERE name = (?) AND path = (?);");
         st.setString(1, vname);
         st.setString(2, vpath);
@@ -599,7 +601,7 @@ public class TaskProvenance {
 
         if (!rs.next()) {
             st = db.prepareStatement("INSERT INTO file(task_id,name,path) VALUES(?,?,?);", Statement.RETURN_GENERATED_KEYS);
-            st.setInt(1, vtask_id);
+            st.setLong(1, vtask_id);
             st.setString(2, vname);
             st.setString(3, vpath);
             st.executeUpdate();
@@ -610,14 +612,14 @@ public class TaskProvenance {
         return rs;
     }
 
-    private static ResultSet insertPerformance(Connection db, Integer vtask_id, Integer vsubtask_id, String vmethod, String vdescription, String vstarttime, String vendtime, String vinvocation) throws SQLException {
+    private static ResultSet insertPerformance(Connection db, Long vtask_id, Integer vsubtask_id, String vmethod, String vdescription, String vstarttime, String vendtime, String vinvocation) throws SQLException {
         PreparedStatement st = db.prepareStatement("SELECT id FROM performance WHERE method = (?);");
         st.setString(1, vmethod);
         ResultSet rs = st.executeQuery();
 
         if (!rs.next()) {
             st = db.prepareStatement("INSERT INTO performance(task_id,subtask_id,method,description,starttime,endtime,invocation) VALUES(?,?,?,?,?,?,?);", Statement.RETURN_GENERATED_KEYS);
-            st.setInt(1, vtask_id);
+            st.setLong(1, vtask_id);
             st.setInt(2, vsubtask_id);
             st.setString(3, vmethod);
             st.setString(4, vdescription);
@@ -120,12 +120,12 @@ public class PDE {
 
 //    retrospective provenance
     public Task task(String dataflowTag, String transformationTag,
-            int ID, Integer subID, TaskStatus status) {
+            long ID, Integer subID, TaskStatus status) {
         return new Task(dataflowTag, transformationTag, ID, subID, status);
     }
 
     public Task task(String dataflowTag, String transformationTag,
-            int ID, int subID, TaskStatus status, String workspace, String resource) {
+            long ID, int subID, TaskStatus status, String workspace, String resource) {
         Task task = new Task(dataflowTag, transformationTag, ID, subID, status);
         task.setWorkspace(workspace);
         task.setResource(resource);
@@ -133,12 +133,12 @@ public class PDE {
     }
 
     public Task task(String dataflowTag, String transformationTag,
-            int ID, TaskStatus status) {
+            long ID, TaskStatus status) {
         return new Task(dataflowTag, transformationTag, ID, status);
     }
 
     public Task task(String dataflowTag, String transformationTag,
-            int ID, TaskStatus status, String workspace, String resource) {
+            long ID, TaskStatus status, String workspace, String resource) {
         Task task = new Task(dataflowTag, transformationTag, ID, status);
         task.setWorkspace(workspace);
         task.setResource(resource);
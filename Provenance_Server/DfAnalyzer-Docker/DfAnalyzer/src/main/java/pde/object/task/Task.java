@@ -161,7 +161,7 @@ public class Task extends DataflowObject {
     }
     
     public Task(String dataflowTag, String transformationTag,
-            int ID, Integer subID, TaskStatus status) {
+            long ID, Integer subID, TaskStatus status) {
         this(ObjectType.TASK);
         setDataflowTag(dataflowTag);
         setTransformationTag(transformationTag);
@@ -171,7 +171,7 @@ public class Task extends DataflowObject {
     }
     
     public Task(String dataflowTag, String transformationTag,
-            int ID, TaskStatus status) {
+            long ID, TaskStatus status) {
         this(ObjectType.TASK);
         setDataflowTag(dataflowTag);
         setTransformationTag(transformationTag);
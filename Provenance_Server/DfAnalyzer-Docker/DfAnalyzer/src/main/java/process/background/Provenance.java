@@ -12,17 +12,18 @@ import di.object.dataflow.Dataflow;
  */
 public class Provenance {
 
-    public static Integer performTransaction(Connection db, Transaction t) {
+    public static Long performTransaction(Connection db, Transaction t) {
         switch (t.getType()) {
             case DATAFLOW:
-                return DataflowProvenance.handleDataflowTransaction(db, t);
+                Integer dfID = DataflowProvenance.handleDataflowTransaction(db, t);
+                return dfID == null ? null : dfID.longValue();
             case TASK:
                 return TaskProvenance.handleTaskTransaction(db, t);
         }
         
         return null;
     }
-    public static Integer performTransaction(Connection db, Transaction t, Dataflow df) {
+    public static Long performTransaction(Connection db, Transaction t, Dataflow df) {
         switch (t.getType()) {
             case DATAFLOW:
                 //TODO: transformar em  erro/log e identificar corretamente o objeto não inserido
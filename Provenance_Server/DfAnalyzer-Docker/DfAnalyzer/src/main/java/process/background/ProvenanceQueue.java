@@ -5,10 +5,15 @@ import java.text.DecimalFormat;
 import java.util.ArrayList;
 import di.object.process.Transaction;
 import di.object.dataflow.Dataflow;
+import di.enumeration.dbms.DBMS;
+import di.json.DataflowStore;
+import di.json.JSONReader;
 import java.io.IOException;
+import java.util.concurrent.ConcurrentHashMap;
 import java.util.concurrent.ConcurrentLinkedQueue;
 import java.util.logging.Level;
 import java.util.logging.Logger;
+import org.json.simple.JSONObject;
 import rest.config.DbConnection;
 import utils.Utils;
 
@@ -28,6 +33,18 @@ public class ProvenanceQueue extends Thread {
     public double queueTotalTime;
     public int transactionsProcessed;
 
+    // transactions applied per dataflow, used as the version of its data
+    private final ConcurrentHashMap<String, Long> appliedTransactions = new ConcurrentHashMap<>();
+    private final long startedAt = System.currentTimeMillis();
+
+    /**
+     * Returns a version of the data of a dataflow, which changes every time
+     * a transaction of the dataflow is stored and when the server restarts.
+     */
+    public String getVersion(String dfTag) {
+        return startedAt + "-" + appliedTransactions.getOrDefault(dfTag.toLowerCase(), 0L);
+    }
+
     public void removeDataflow(String dfTag) {
         for (Dataflow df : dataflowsInMemory) { //TODO: change to a Map with df_tag as keys (to insert and remove instances more efficiently)
             if (df.dataflowTag.equals(dfTag)) {
@@ -43,6 +60,14 @@ public class ProvenanceQueue extends Thread {
                 return df;
             }
         }
+        // the dataflow was registered before a restart
+        JSONObject specification = dfTag == null ? null : DataflowStore.get(dfTag);
+        if (specification != null) {
+            Dataflow df = JSONReader.generationDataflowTransaction(null, null,
+                    specification, DBMS.MONETDB).getDataflowFromObjects();
+            dataflowsInMemory.add(df);
+            return df;
+        }
         return null;
     }
 
@@ -113,9 +138,14 @@ public class ProvenanceQueue extends Thread {
             t.execStartTime = startTime;
             t.execEndTime = endTime;
             queueTotalTime = queueTotalTime + (t.queueEndTime - t.queueStartTime);
+            if (t.getDataflowTag() != null) {
+                appliedTransactions.merge(t.getDataflowTag().toLowerCase(), 1L, Long::sum);
+            }
 
             Dataflow dataflow = t.getDataflowFromObjects();
-            if (!dataflowsInMemory.contains(dataflow)) {
+            if (dataflow != null) {
+                // the latest specification of a dataflow replaces the older one
+                removeDataflow(dataflow.dataflowTag);
                 dataflowsInMemory.add(dataflow);
             }
         }
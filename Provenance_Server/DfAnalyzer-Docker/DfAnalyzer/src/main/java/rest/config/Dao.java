@@ -28,6 +28,15 @@ public class Dao {
         }
     }
 
+    public boolean hasDataflow(String tag) {
+        try (Connection con = sql2o.open()) {
+            String sql = "SELECT COUNT(*) FROM dataflow WHERE tag=:tag;";
+            Integer count = con.createQuery(sql).addParameter("tag", tag)
+                    .executeScalar(Integer.class);
+            return count != null && count > 0;
+        }
+    }
+
     public List<Attribute> getAllAttributesOfDataSet(Long datasetID) {
         try (Connection con = sql2o.open()) {
             String sql = "SELECT  extractor_id, name, type FROM attribute where ds_id=:id;";
@@ -54,11 +54,36 @@ public class DbConnection {
                     .append(config.getDatabaseName())
                     .toString(),
                     config.getUser(), config.getPassword());
-        } catch (ClassNotFoundException | SQLException ex) {
+            migrateTaskIdentifier();
+        } catch (ClassNotFoundException | SQLException | IOException ex) {
             Logger.getLogger(DbConnection.class.getName()).log(Level.SEVERE, null, ex);
         }
     }
 
+    /**
+     * Widens task.identifier to BIGINT in databases created before task ids
+     * became 64-bit, by running monetdb/sql/migrate-task-identifier.sql.
+     */
+    private void migrateTaskIdentifier() throws SQLException, IOException {
+        if (!config.isMonetDB()) {
+            return;
+        }
+        PreparedStatement st = connection.prepareStatement("SELECT c.type "
+                + "FROM sys.columns c, sys.tables t "
+                + "WHERE c.table_id = t.id AND t.name = 'task' AND c.name = 'identifier';");
+        ResultSet rs = st.executeQuery();
+        if (!rs.next() || !rs.getString(1).equals("int")) {
+            return;
+        }
+        File script = new File(config.getDataIngestorDirectory(),
+                "monetdb" + File.separator + "sql" + File.separator
+                + "migrate-task-identifier.sql");
+        Logger.getLogger(DbConnection.class.getName()).log(Level.INFO,
+                "Migrating task.identifier to BIGINT with {0}", script);
+        connection.createStatement().execute(
+                new String(Files.readAllBytes(script.toPath()), "UTF-8"));
+    }
+
     public Connection getConnection() {
         return connection;
     }
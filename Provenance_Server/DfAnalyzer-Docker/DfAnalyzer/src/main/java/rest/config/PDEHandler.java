@@ -229,7 +229,7 @@ public class PDEHandler {
 
             Task task = pde.task(args[0],
                     args[1],
-                    Integer.parseInt(args[2]),
+                    Long.parseLong(args[2]),
                     subID,
                     TaskStatus.valueOf(args[4].toUpperCase()));
             if (args.length >= 6) {
@@ -1,6 +1,10 @@
 package rest.config;
 
 import com.google.common.base.Stopwatch;
+import java.io.File;
+import java.io.IOException;
+import java.nio.file.Files;
+import java.nio.file.StandardCopyOption;
 import org.springframework.beans.factory.annotation.Autowired;
 import org.springframework.stereotype.Service;
 import qp.dataflow.Dataflow;
@@ -18,7 +22,7 @@ public class QPHandler {
     @Autowired
     private DbConnection db;
 
-    public String runQuery(String dataflowTag, Integer dataflowID, String message) {
+    public synchronized String runQuery(String dataflowTag, Integer dataflowID, String message) {
         //load dataflow from provenance database
         QuerySpecification spec = new QuerySpecification(dataflowTag, dataflowID, message);
         Dataflow dataflow = db.loadDataflow(spec);
@@ -36,6 +40,21 @@ public class QPHandler {
         answer.append("\nCurrentPath:" + currentPath);
         return answer.toString();
     }
+
+    /**
+     * Runs a query and returns a private copy of its CSV result, which the
+     * caller deletes. Queries are serialized because MonetDB writes every
+     * result to the same file.
+     */
+    public synchronized File runQueryToFile(String dataflowTag, Integer dataflowID, String message) throws IOException {
+        runQuery(dataflowTag, dataflowID, message);
+        File result = new File(System.getProperty("user.dir"), "query_result.csv");
+        File copy = File.createTempFile("query_result", ".csv");
+        if (result.exists()) {
+            Files.copy(result.toPath(), copy.toPath(), StandardCopyOption.REPLACE_EXISTING);
+        }
+        return copy;
+    }
     
     
 }
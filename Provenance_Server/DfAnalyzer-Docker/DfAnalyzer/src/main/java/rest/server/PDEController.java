@@ -2,16 +2,27 @@ package rest.server;
 
 import di.enumeration.dbms.DBMS;
 import di.enumeration.process.TransactionType;
+import di.json.DataflowStore;
+import di.json.DatasetReferences;
 import di.json.JSONReader;
 import di.object.process.DaemonDI;
 import di.object.process.Transaction;
+import java.util.ArrayList;
+import org.json.simple.JSONArray;
 import org.json.simple.JSONObject;
+import org.json.simple.parser.JSONParser;
+import org.json.simple.parser.ParseException;
 import org.springframework.beans.factory.annotation.Autowired;
+import org.springframework.http.HttpStatus;
+import org.springframework.http.ResponseEntity;
+import org.springframework.web.bind.annotation.GetMapping;
+import org.springframework.web.bind.annotation.PathVariable;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestBody;
 import org.springframework.web.bind.annotation.RequestMapping;
 import org.springframework.web.bind.annotation.RestController;
 import process.background.ProvenanceQueue;
+import rest.config.Dao;
 import rest.config.PDEHandler;
 
 /**
@@ -28,6 +39,9 @@ public class PDEController {
     @Autowired
     private DaemonDI daemonDI;
 
+    @Autowired
+    private Dao dao;
+
     @PostMapping(value = "/dataflow")
     public String dataflow(@RequestBody String message) {
         daemonDI.transactionsGenerated++;
@@ -107,7 +121,7 @@ public class PDEController {
     }
 
     @PostMapping(value = "/dataflow/json")
-    public String dataflow_ingest(@RequestBody String payload) {
+    public ResponseEntity<String> dataflow_ingest(@RequestBody String payload) {
         daemonDI.transactionsGenerated++;
         
         long parsingStart;
@@ -121,8 +135,27 @@ public class PDEController {
         JSONObject dataflow_json = JSONReader.readDataflowFromRequest(payload);
         parsingEnd = System.currentTimeMillis();
 
+        // a delta specification only holds the new transformations and sets
+        ArrayList<String> deltaSets = null;
+        ArrayList<String> storedSetTags = null;
+        JSONObject specification = dataflow_json;
+        if (Boolean.TRUE.equals(dataflow_json.get("delta"))) {
+            deltaSets = new ArrayList<>();
+            storedSetTags = new ArrayList<>();
+            specification = DataflowStore.merge(dataflow_json, deltaSets, storedSetTags);
+            if (specification == null) {
+                JSONObject error = new JSONObject();
+                error.put("error", "Unknown dataflow, the full specification is required.");
+                return new ResponseEntity<>(error.toJSONString(), HttpStatus.CONFLICT);
+            }
+        } else {
+            DataflowStore.put(dataflow_json);
+        }
+
         generationStart = System.currentTimeMillis();
-        Transaction dfTransaction = JSONReader.generationDataflowTransaction(null, null, dataflow_json, DBMS.MONETDB);
+        Transaction dfTransaction = JSONReader.generationDataflowTransaction(null, null, specification, DBMS.MONETDB);
+        dfTransaction.deltaSets = deltaSets;
+        dfTransaction.storedSetTags = storedSetTags;
         generationEnd = System.currentTimeMillis();
 
         dfTransaction.parsingStart = parsingStart;
@@ -142,11 +175,29 @@ public class PDEController {
         daemonDI.generationTime = daemonDI.generationTime + (generationEnd - generationStart);
         daemonDI.queueingTime = daemonDI.queueingTime + (queueingEnd - queueingStart);
         
-        return dataflow_json.toJSONString();
+        return new ResponseEntity<>(dataflow_json.toJSONString(), HttpStatus.OK);
+    }
+
+    /**
+     * Tells clients whether a dataflow is stored, so that a cached
+     * registration is checked before it is skipped, and announces that
+     * delta specifications are accepted.
+     *
+     * @param dataflowTag the dataflow tag
+     * @return 200 if the dataflow is stored, 404 otherwise
+     */
+    @GetMapping(value = "/dataflow/{df_tag}")
+    public ResponseEntity<String> dataflow_status(@PathVariable("df_tag") String dataflowTag) {
+        JSONObject result = new JSONObject();
+        result.put("tag", dataflowTag);
+        result.put("delta", true);
+        HttpStatus status = dao.hasDataflow(dataflowTag.toLowerCase())
+                ? HttpStatus.OK : HttpStatus.NOT_FOUND;
+        return new ResponseEntity<>(result.toJSONString(), status);
     }
 
     @PostMapping(value = "/task/json")
-    public String task_ingest(@RequestBody String payload) {
+    public ResponseEntity<String> task_ingest(@RequestBody String payload) {
         daemonDI.transactionsGenerated++;
         
         long parsingStart;
@@ -158,6 +209,11 @@ public class PDEController {
 
         parsingStart = System.currentTimeMillis();
         JSONObject task_json = JSONReader.getTaskFromRequest(payload);
+        try {
+            DatasetReferences.expand(task_json);
+        } catch (IllegalArgumentException ex) {
+            return new ResponseEntity<>(ex.getMessage(), HttpStatus.CONFLICT);
+        }
         parsingEnd = System.currentTimeMillis();
 
         generationStart = System.currentTimeMillis();
@@ -181,7 +237,71 @@ public class PDEController {
         daemonDI.generationTime = daemonDI.generationTime + (generationEnd - generationStart);
         daemonDI.queueingTime = daemonDI.queueingTime + (queueingEnd - queueingStart);
 
-        return task_json.toJSONString();
+        return new ResponseEntity<>(task_json.toJSONString(), HttpStatus.OK);
+    }
+
+    @PostMapping(value = "/task/batch/json")
+    public String task_batch_ingest(@RequestBody String payload) {
+        long parsingStart;
+        long parsingEnd;
+        long generationStart;
+        long generationEnd;
+        long queueingStart;
+        long queueingEnd;
+
+        JSONArray results = new JSONArray();
+        JSONArray tasks;
+        parsingStart = System.currentTimeMillis();
+        try {
+            tasks = (JSONArray) new JSONParser().parse(payload);
+        } catch (ParseException | ClassCastException ex) {
+            // counted as one request, as a failed task of /task/json is
+            daemonDI.transactionsGenerated++;
+            JSONObject result = new JSONObject();
+            result.put("error", "The batch must be a json array of tasks.");
+            results.add(result);
+            return results.toJSONString();
+        }
+        parsingEnd = System.currentTimeMillis();
+        daemonDI.parsingTime = daemonDI.parsingTime + (parsingEnd - parsingStart);
+
+        // tasks are queued in array order, so the order per task id is kept
+        for (Object item : tasks) {
+            // every task is counted before it is read, as in /task/json
+            daemonDI.transactionsGenerated++;
+            JSONObject result = new JSONObject();
+            try {
+                JSONObject task_json = (JSONObject) item;
+                result.put("id", task_json.get("id"));
+                DatasetReferences.expand(task_json);
+
+                generationStart = System.currentTimeMillis();
+                Transaction tkTransaction = JSONReader.generationTaskTransaction(null, null, task_json, DBMS.MONETDB);
+                generationEnd = System.currentTimeMillis();
+
+                tkTransaction.parsingStart = parsingStart;
+                tkTransaction.parsingEnd = parsingEnd;
+                tkTransaction.generationStart = generationStart;
+                tkTransaction.generationEnd = generationEnd;
+
+                queueingStart = System.currentTimeMillis();
+                daemonDI.queue.handleTransaction(ProvenanceQueue.DBOperation.PENDENT_TRANSACTION, tkTransaction);
+                queueingEnd = System.currentTimeMillis();
+
+                tkTransaction.queueingStart = queueingStart;
+                tkTransaction.queueingEnd = queueingEnd;
+
+                daemonDI.generationTime = daemonDI.generationTime + (generationEnd - generationStart);
+                daemonDI.queueingTime = daemonDI.queueingTime + (queueingEnd - queueingStart);
+                result.put("status", 200);
+            } catch (RuntimeException ex) {
+                result.put("status", 400);
+                result.put("error", String.valueOf(ex.getMessage()));
+            }
+            results.add(result);
+        }
+
+        return results.toJSONString();
     }
 
     @RequestMapping("/shutdown")
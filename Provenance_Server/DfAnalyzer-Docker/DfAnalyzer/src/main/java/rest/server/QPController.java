@@ -1,13 +1,21 @@
 package rest.server;
 
+import di.object.process.DaemonDI;
+import java.io.File;
+import java.io.IOException;
 import java.io.UnsupportedEncodingException;
 import java.net.URLDecoder;
+import java.nio.file.Files;
 import org.springframework.beans.factory.annotation.Autowired;
+import org.springframework.http.HttpStatus;
+import org.springframework.http.ResponseEntity;
+import org.springframework.web.bind.annotation.GetMapping;
 import org.springframework.web.bind.annotation.PathVariable;
 import org.springframework.web.bind.annotation.PostMapping;
 import org.springframework.web.bind.annotation.RequestBody;
 import org.springframework.web.bind.annotation.RequestMapping;
 import org.springframework.web.bind.annotation.RestController;
+import org.springframework.web.servlet.mvc.method.annotation.StreamingResponseBody;
 import rest.config.QPHandler;
 
 /**
@@ -20,6 +28,9 @@ public class QPController {
     
     @Autowired
     private QPHandler qpHandler;
+
+    @Autowired
+    private DaemonDI daemonDI;
     
 
     @PostMapping(value = "/{df_tag}/{df_id}")
@@ -31,5 +42,28 @@ public class QPController {
             reqParam = reqParam.substring(8);
             return qpHandler.runQuery(dataflowTag, dataflowID, reqParam);
     }
+
+    @PostMapping(value = "/{df_tag}/{df_id}/csv", produces = "text/csv")
+    public ResponseEntity<StreamingResponseBody> csv(@PathVariable("df_tag") String dataflowTag,
+            @PathVariable("df_id") Integer dataflowID,
+            @RequestBody String message) throws IOException {
+
+        String reqParam = URLDecoder.decode(message, "UTF-8");
+        reqParam = reqParam.substring(8);
+        File result = qpHandler.runQueryToFile(dataflowTag, dataflowID, reqParam);
+        StreamingResponseBody body = out -> {
+            try {
+                Files.copy(result.toPath(), out);
+            } finally {
+                result.delete();
+            }
+        };
+        return new ResponseEntity<>(body, HttpStatus.OK);
+    }
+
+    @GetMapping(value = "/{df_tag}/version")
+    public String version(@PathVariable("df_tag") String dataflowTag) {
+        return daemonDI.queue.getVersion(dataflowTag);
+    }
 }
 
@@ -0,0 +1,61 @@
+package di.json;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+
+import java.util.ArrayList;
+import java.util.Arrays;
+import org.json.simple.JSONArray;
+import org.json.simple.JSONObject;
+import org.junit.Test;
+
+public class DataflowStoreTest {
+
+    static String specification(String dfTag, String sets) {
+        return "{\"tag\":\"" + dfTag + "\",\"transformations\":["
+                + "{\"tag\":\"tf\",\"sets\":[" + sets + "]}]}";
+    }
+
+    static String set(String tag) {
+        return "{\"tag\":\"" + tag + "\",\"type\":\"INPUT\",\"attributes\":"
+                + "[{\"name\":\"a\",\"type\":\"TEXT\"}]}";
+    }
+
+    @Test
+    public void storedDataflowIsReadBack() {
+        DataflowStore.put(JSONReader.readDataflowFromRequest(
+                specification("StoreRead", set("ia"))));
+        JSONObject stored = DataflowStore.get("storeread");
+        assertEquals("StoreRead", stored.get("tag"));
+    }
+
+    @Test
+    public void deltaAddsNewSetsAndTransformations() {
+        DataflowStore.put(JSONReader.readDataflowFromRequest(
+                specification("storemerge", set("ia"))));
+        JSONObject delta = JSONReader.readDataflowFromRequest(
+                "{\"tag\":\"storemerge\",\"delta\":true,\"transformations\":["
+                + "{\"tag\":\"tf\",\"sets\":[" + set("ia") + "," + set("IB") + "]},"
+                + "{\"tag\":\"tf2\",\"sets\":[" + set("ic") + "]}]}");
+        ArrayList<String> newSets = new ArrayList<>();
+        ArrayList<String> oldSetTags = new ArrayList<>();
+
+        JSONObject merged = DataflowStore.merge(delta, newSets, oldSetTags);
+
+        assertEquals(Arrays.asList("tf/ib", "tf2/ic"), newSets);
+        assertEquals(Arrays.asList("ia"), oldSetTags);
+        JSONArray transformations = (JSONArray) merged.get("transformations");
+        assertEquals(2, transformations.size());
+        assertEquals(2, ((JSONArray) JSONReader.getDataTransformation(
+                merged, "tf").get("sets")).size());
+        assertEquals(merged, DataflowStore.get("storemerge"));
+    }
+
+    @Test
+    public void deltaOfUnknownDataflowIsNotMerged() {
+        JSONObject delta = JSONReader.readDataflowFromRequest(
+                "{\"tag\":\"storeunknown\",\"delta\":true,\"transformations\":[]}");
+        assertNull(DataflowStore.merge(delta, new ArrayList<>(), new ArrayList<>()));
+        assertNull(DataflowStore.get("storeunknown"));
+    }
+}
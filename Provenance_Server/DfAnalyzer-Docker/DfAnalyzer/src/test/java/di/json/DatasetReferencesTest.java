@@ -0,0 +1,52 @@
+package di.json;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+
+import org.json.simple.JSONArray;
+import org.json.simple.JSONObject;
+import org.junit.Test;
+
+public class DatasetReferencesTest {
+
+    static JSONObject task(String dfTag, String set) {
+        return JSONReader.getTaskFromRequest("{\"id\":\"1\",\"dataflow\":\""
+                + dfTag + "\",\"sets\":[" + set + "]}");
+    }
+
+    static JSONObject firstSet(JSONObject task) {
+        return (JSONObject) ((JSONArray) task.get("sets")).get(0);
+    }
+
+    @Test
+    public void referencedDatasetIsExpanded() {
+        JSONObject first = DatasetReferences.expand(task("refexpand",
+                "{\"tag\":\"meta\",\"ref\":\"r1\",\"elements\":[[\"host\",1]]}"));
+        assertNull(firstSet(first).get("ref"));
+        assertEquals(1, ((JSONArray) firstSet(first).get("elements")).size());
+
+        JSONObject second = DatasetReferences.expand(task("refexpand",
+                "{\"tag\":\"meta\",\"ref\":\"r1\"}"));
+        assertNull(firstSet(second).get("ref"));
+        assertEquals(firstSet(first).get("elements"), firstSet(second).get("elements"));
+    }
+
+    @Test(expected = IllegalArgumentException.class)
+    public void unknownReferenceIsRejected() {
+        DatasetReferences.expand(task("refunknown", "{\"tag\":\"meta\",\"ref\":\"r1\"}"));
+    }
+
+    @Test(expected = IllegalArgumentException.class)
+    public void referencesAreKeptPerDataflow() {
+        DatasetReferences.expand(task("refowner",
+                "{\"tag\":\"meta\",\"ref\":\"r1\",\"elements\":[[\"host\",1]]}"));
+        DatasetReferences.expand(task("refother", "{\"tag\":\"meta\",\"ref\":\"r1\"}"));
+    }
+
+    @Test
+    public void setsWithoutReferenceAreKept() {
+        JSONObject task = DatasetReferences.expand(task("refnone",
+                "{\"tag\":\"ia\",\"elements\":[[1]]}"));
+        assertEquals(1, ((JSONArray) firstSet(task).get("elements")).size());
+    }
+}
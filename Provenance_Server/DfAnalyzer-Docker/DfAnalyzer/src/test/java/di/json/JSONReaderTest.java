@@ -0,0 +1,54 @@
+package di.json;
+
+import static org.junit.Assert.assertEquals;
+
+import di.enumeration.dbms.DBMS;
+import di.object.task.Element;
+import di.object.task.Task;
+import java.util.Arrays;
+import org.junit.Test;
+
+public class JSONReaderTest {
+
+    static Task readTask(String payload) {
+        return (Task) JSONReader.generationTaskTransaction(null, null,
+                JSONReader.getTaskFromRequest(payload), DBMS.MONETDB)
+                .getObjects().get(0);
+    }
+
+    @Test
+    public void columnarElementsAreRows() {
+        Task task = readTask("{\"id\":\"1\",\"dataflow\":\"df\",\"transformation\":\"tf\","
+                + "\"status\":\"FINISHED\",\"sets\":["
+                + "{\"tag\":\"ia\",\"elements\":[[1,\"a\"],[2.5,\"b\"]]},"
+                + "{\"tag\":\"ib\",\"elements\":[\"x;y\"]}]}");
+
+        assertEquals(3, task.elements.size());
+        Element first = task.elements.get(0);
+        assertEquals("ia", first.setTag);
+        assertEquals(Arrays.asList("1", "a"), first.values);
+        assertEquals(Arrays.asList("2.5", "b"), task.elements.get(1).values);
+        assertEquals("ib", task.elements.get(2).setTag);
+        assertEquals(Arrays.asList("x;y"), task.elements.get(2).values);
+    }
+
+    @Test
+    public void nullValuesAreKeptAsNull() {
+        Task task = readTask("{\"id\":\"1\",\"dataflow\":\"df\",\"transformation\":\"tf\","
+                + "\"status\":\"FINISHED\",\"sets\":["
+                + "{\"tag\":\"ia\",\"elements\":[[null,\"a\"],[1,null]]},"
+                + "{\"tag\":\"ib\",\"elements\":[null]}]}");
+
+        assertEquals(Arrays.asList(null, "a"), task.elements.get(0).values);
+        assertEquals(Arrays.asList("1", null), task.elements.get(1).values);
+        assertEquals(Arrays.asList((String) null), task.elements.get(2).values);
+    }
+
+    @Test
+    public void taskIdentifiersAre64Bit() {
+        Task task = readTask("{\"id\":\"4398046511104\",\"dataflow\":\"df\","
+                + "\"transformation\":\"tf\",\"status\":\"RUNNING\"}");
+
+        assertEquals(Long.valueOf(4398046511104L), task.ID);
+    }
+}
@@ -0,0 +1,46 @@
+package di.provenance;
+
+import static org.junit.Assert.assertEquals;
+
+import di.enumeration.dataflow.AttributeType;
+import di.enumeration.dbms.DBMS;
+import di.object.dataflow.Attribute;
+import di.object.dataflow.Set;
+import di.object.task.Element;
+import di.object.task.Task;
+import java.util.ArrayList;
+import java.util.Arrays;
+import org.junit.Test;
+
+public class TaskProvenanceTest {
+
+    static Attribute attribute(String name, AttributeType type) {
+        Attribute a = new Attribute();
+        a.name = name;
+        a.type = type;
+        return a;
+    }
+
+    static ArrayList<String> tuples(String... values) {
+        ArrayList<Attribute> attributes = new ArrayList<>(Arrays.asList(
+                attribute("name", AttributeType.TEXT),
+                attribute("path", AttributeType.FILE),
+                attribute("value", AttributeType.NUMERIC)));
+        Task task = new Task();
+        task.ID = 7L;
+        Element element = new Element();
+        element.values.addAll(Arrays.asList(values));
+        return TaskProvenance.getValuesInCSVFormat(null, new Set(), element,
+                attributes, task, DBMS.MONETDB);
+    }
+
+    @Test
+    public void valuesAreQuotedByType() {
+        assertEquals(Arrays.asList("7,'a','/tmp/a',1.5"), tuples("a", "/tmp/a", "1.5"));
+    }
+
+    @Test
+    public void nullValuesAreSqlNull() {
+        assertEquals(Arrays.asList("7,NULL,NULL,NULL"), tuples(null, null, null));
+    }
+}
@@ -0,0 +1,201 @@
+package rest.server;
+
+import static org.junit.Assert.assertEquals;
+import static org.springframework.test.web.servlet.request.MockMvcRequestBuilders.get;
+import static org.springframework.test.web.servlet.request.MockMvcRequestBuilders.post;
+import static org.springframework.test.web.servlet.result.MockMvcResultMatchers.jsonPath;
+import static org.springframework.test.web.servlet.result.MockMvcResultMatchers.status;
+
+import di.object.dataflow.Dataflow;
+import di.object.process.DaemonDI;
+import di.object.process.Transaction;
+import di.object.task.Task;
+import java.util.ArrayList;
+import java.util.Arrays;
+import org.junit.Before;
+import org.junit.Test;
+import org.mockito.Mockito;
+import org.springframework.http.MediaType;
+import org.springframework.test.util.ReflectionTestUtils;
+import org.springframework.test.web.servlet.MockMvc;
+import org.springframework.test.web.servlet.ResultActions;
+import org.springframework.test.web.servlet.setup.MockMvcBuilders;
+import process.background.ProvenanceQueue;
+import rest.config.Dao;
+
+/**
+ * Round trips of the PDE json routes. The queue has no database, so the
+ * transactions are kept in the queue and read back by the tests.
+ */
+public class PDEControllerTest {
+
+    private DaemonDI daemonDI;
+    private Dao dao;
+    private MockMvc mvc;
+
+    @Before
+    public void setUp() {
+        daemonDI = new DaemonDI("target");
+        daemonDI.queue = new ProvenanceQueue(null);
+        dao = Mockito.mock(Dao.class);
+        PDEController controller = new PDEController();
+        ReflectionTestUtils.setField(controller, "daemonDI", daemonDI);
+        ReflectionTestUtils.setField(controller, "dao", dao);
+        mvc = MockMvcBuilders.standaloneSetup(controller).build();
+    }
+
+    static String task(String dataflowTag, String id, String sets) {
+        return "{\"id\":\"" + id + "\",\"dataflow\":\"" + dataflowTag
+                + "\",\"transformation\":\"tf\",\"status\":\"FINISHED\""
+                + ",\"sets\":[" + sets + "]}";
+    }
+
+    static String task(String dataflowTag, String id) {
+        return task(dataflowTag, id, "{\"tag\":\"ia\",\"elements\":[[" + id + ",\"a\"]]}");
+    }
+
+    static String dataflow(String dfTag, boolean delta, String... setTags) {
+        StringBuilder sets = new StringBuilder();
+        for (String tag : setTags) {
+            if (sets.length() > 0) {
+                sets.append(",");
+            }
+            sets.append("{\"tag\":\"").append(tag).append("\",\"type\":\"INPUT\","
+                    + "\"attributes\":[{\"name\":\"a\",\"type\":\"TEXT\"}]}");
+        }
+        return "{\"tag\":\"" + dfTag + "\"" + (delta ? ",\"delta\":true" : "")
+                + ",\"transformations\":[{\"tag\":\"tf\",\"sets\":[" + sets + "]}]}";
+    }
+
+    ResultActions postJSON(String route, String payload) throws Exception {
+        return mvc.perform(post(route)
+                .contentType(MediaType.APPLICATION_JSON)
+                .content(payload));
+    }
+
+    ArrayList<Transaction> queued() {
+        return daemonDI.queue.handleTransaction(
+                ProvenanceQueue.DBOperation.RUN_TRANSACTION, null);
+    }
+
+    @Test
+    public void batchTasksAreQueuedInOrder() throws Exception {
+        postJSON("/pde/task/batch/json", "[" + task("batch", "1") + ","
+                + task("batch", "2") + "]")
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$[0].id").value("1"))
+                .andExpect(jsonPath("$[0].status").value(200))
+                .andExpect(jsonPath("$[1].id").value("2"))
+                .andExpect(jsonPath("$[1].status").value(200));
+
+        ArrayList<Transaction> transactions = queued();
+        assertEquals(2, transactions.size());
+        assertEquals(Long.valueOf(1), ((Task) transactions.get(0).getObjects().get(0)).ID);
+        assertEquals(Long.valueOf(2), ((Task) transactions.get(1).getObjects().get(0)).ID);
+        assertEquals(2, daemonDI.transactionsGenerated);
+    }
+
+    @Test
+    public void invalidBatchTasksAreReported() throws Exception {
+        postJSON("/pde/task/batch/json", "[" + task("batch", "1")
+                + ",{\"tag\":\"no id\"}]")
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$[0].status").value(200))
+                .andExpect(jsonPath("$[1].status").value(400));
+
+        assertEquals(1, queued().size());
+        assertEquals(2, daemonDI.transactionsGenerated);
+    }
+
+    @Test
+    public void batchMustBeAnArray() throws Exception {
+        postJSON("/pde/task/batch/json", task("batch", "1"))
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$[0].error").value("The batch must be a json array of tasks."));
+
+        assertEquals(0, queued().size());
+        assertEquals(1, daemonDI.transactionsGenerated);
+    }
+
+    @Test
+    public void dataflowIsQueued() throws Exception {
+        postJSON("/pde/dataflow/json", dataflow("ctrlfull", false, "ia"))
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$.tag").value("ctrlfull"));
+
+        ArrayList<Transaction> transactions = queued();
+        assertEquals(1, transactions.size());
+        Dataflow df = transactions.get(0).getDataflowFromObjects();
+        assertEquals("ctrlfull", df.dataflowTag);
+        assertEquals(1, df.sets.size());
+    }
+
+    @Test
+    public void deltaIsMergedWithTheStoredDataflow() throws Exception {
+        postJSON("/pde/dataflow/json", dataflow("ctrldelta", false, "ia"))
+                .andExpect(status().isOk());
+        postJSON("/pde/dataflow/json", dataflow("ctrldelta", true, "ib"))
+                .andExpect(status().isOk());
+
+        ArrayList<Transaction> transactions = queued();
+        assertEquals(2, transactions.size());
+        Transaction delta = transactions.get(1);
+        assertEquals(2, delta.getDataflowFromObjects().sets.size());
+        assertEquals(Arrays.asList("tf/ib"), delta.deltaSets);
+        assertEquals(Arrays.asList("ia"), delta.storedSetTags);
+    }
+
+    @Test
+    public void deltaOfUnknownDataflowIsRejected() throws Exception {
+        postJSON("/pde/dataflow/json", dataflow("ctrlunknown", true, "ia"))
+                .andExpect(status().isConflict());
+
+        assertEquals(0, queued().size());
+    }
+
+    @Test
+    public void dataflowStatusTellsWhetherItIsStored() throws Exception {
+        Mockito.when(dao.hasDataflow("ctrlstored")).thenReturn(true);
+
+        mvc.perform(get("/pde/dataflow/CtrlStored"))
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$.tag").value("CtrlStored"))
+                .andExpect(jsonPath("$.delta").value(true));
+        mvc.perform(get("/pde/dataflow/ctrlmissing"))
+                .andExpect(status().isNotFound());
+    }
+
+    @Test
+    public void taskWithUnknownReferenceIsRejected() throws Exception {
+        postJSON("/pde/task/json", task("ctrlref", "1", "{\"tag\":\"meta\",\"ref\":\"unknown\"}"))
+                .andExpect(status().isConflict());
+
+        assertEquals(0, queued().size());
+    }
+
+    @Test
+    public void referencedDatasetIsStoredWithTheTask() throws Exception {
+        postJSON("/pde/task/json", task("ctrlref", "1",
+                "{\"tag\":\"meta\",\"ref\":\"r1\",\"elements\":[[\"host\",1]]}"))
+                .andExpect(status().isOk());
+        postJSON("/pde/task/json", task("ctrlref", "2", "{\"tag\":\"meta\",\"ref\":\"r1\"}"))
+                .andExpect(status().isOk());
+
+        ArrayList<Transaction> transactions = queued();
+        assertEquals(2, transactions.size());
+        Task second = (Task) transactions.get(1).getObjects().get(0);
+        assertEquals(1, second.elements.size());
+        assertEquals("meta", second.elements.get(0).setTag);
+        assertEquals(Arrays.asList("host", "1"), second.elements.get(0).values);
+    }
+
+    @Test
+    public void batchTaskWithUnknownReferenceIsReported() throws Exception {
+        postJSON("/pde/task/batch/json", "[" + task("ctrlbatchref", "1",
+                "{\"tag\":\"meta\",\"ref\":\"unknown\"}") + "]")
+                .andExpect(status().isOk())
+                .andExpect(jsonPath("$[0].status").value(400));
+
+        assertEquals(0, queued().size());
+    }
+}
@@ -0,0 +1,70 @@
+package rest.server;
+
+import static org.junit.Assert.assertFalse;
+import static org.springframework.test.web.servlet.request.MockMvcRequestBuilders.asyncDispatch;
+import static org.springframework.test.web.servlet.request.MockMvcRequestBuilders.get;
+import static org.springframework.test.web.servlet.request.MockMvcRequestBuilders.post;
+import static org.springframework.test.web.servlet.result.MockMvcResultMatchers.content;
+import static org.springframework.test.web.servlet.result.MockMvcResultMatchers.request;
+import static org.springframework.test.web.servlet.result.MockMvcResultMatchers.status;
+
+import di.object.process.DaemonDI;
+import java.io.File;
+import java.nio.file.Files;
+import org.hamcrest.Matchers;
+import org.junit.Before;
+import org.junit.Test;
+import org.mockito.Mockito;
+import org.springframework.http.MediaType;
+import org.springframework.test.util.ReflectionTestUtils;
+import org.springframework.test.web.servlet.MockMvc;
+import org.springframework.test.web.servlet.MvcResult;
+import org.springframework.test.web.servlet.setup.MockMvcBuilders;
+import process.background.ProvenanceQueue;
+import rest.config.QPHandler;
+
+/**
+ * Round trips of the query interface routes, with a mocked query handler.
+ */
+public class QPControllerTest {
+
+    private QPHandler qpHandler;
+    private MockMvc mvc;
+
+    @Before
+    public void setUp() {
+        DaemonDI daemonDI = new DaemonDI("target");
+        daemonDI.queue = new ProvenanceQueue(null);
+        qpHandler = Mockito.mock(QPHandler.class);
+        QPController controller = new QPController();
+        ReflectionTestUtils.setField(controller, "daemonDI", daemonDI);
+        ReflectionTestUtils.setField(controller, "qpHandler", qpHandler);
+        mvc = MockMvcBuilders.standaloneSetup(controller).build();
+    }
+
+    @Test
+    public void csvResultIsStreamedAndDeleted() throws Exception {
+        File result = File.createTempFile("query_result", ".csv");
+        Files.write(result.toPath(), "path\na.png\n".getBytes("UTF-8"));
+        Mockito.when(qpHandler.runQueryToFile("df", 1, "projection(ia.path)"))
+                .thenReturn(result);
+
+        MvcResult started = mvc.perform(post("/query_interface/df/1/csv")
+                .contentType(MediaType.APPLICATION_FORM_URLENCODED)
+                .content("message=projection%28ia.path%29"))
+                .andExpect(request().asyncStarted())
+                .andReturn();
+        mvc.perform(asyncDispatch(started))
+                .andExpect(status().isOk())
+                .andExpect(content().string("path\na.png\n"));
+
+        assertFalse(result.exists());
+    }
+
+    @Test
+    public void versionStartsAtZeroTransactions() throws Exception {
+        mvc.perform(get("/query_interface/df/version"))
+                .andExpect(status().isOk())
+                .andExpect(content().string(Matchers.endsWith("-0")));
+    }
+}
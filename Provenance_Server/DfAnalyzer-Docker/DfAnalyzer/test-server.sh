@@ -0,0 +1,79 @@
+#!/bin/bash
+# Builds DfAnalyzer with its unit tests, starts it on a MonetDB database
+# created with 32-bit task identifiers, checks that the identifiers were
+# migrated to BIGINT and runs the round trips of the Python library
+# (tests/test_server.py) against it. It runs in the DfAnalyzer image,
+# where MonetDB, Maven and the library are installed:
+#
+#   docker build --tag dfanalyzer .
+#   docker run --rm -w /opt/DfAnalyzer dfanalyzer ./test-server.sh
+set -e
+
+SIMULATION_DIR=`pwd`
+DFANALYZER_VERSION=1.0
+DB_FARM=$SIMULATION_DIR/data
+DB=dataflow_analyzer
+SQL_PATH=$SIMULATION_DIR/monetdb/sql
+LIBRARY_DIR=${LIBRARY_DIR:-/dfa-lib-python}
+DFA_TEST_URL=http://localhost:22000
+
+export DOTMONETDBFILE=$SIMULATION_DIR/.monetdb
+printf "user=monetdb\npassword=monetdb\n" > $DOTMONETDBFILE
+
+echo "--------------------------------------------"
+echo "Building DfAnalyzer..."
+mvn -B package
+
+echo "--------------------------------------------"
+echo "Creating a database with 32-bit task identifiers..."
+[ -d $DB_FARM ] || monetdbd create $DB_FARM
+monetdbd start $DB_FARM || true
+monetdb stop $DB || true
+monetdb destroy -f $DB || true
+monetdb create $DB
+monetdb release $DB
+monetdb start $DB
+mclient -p 50000 -d $DB $SQL_PATH/create-schema.sql
+sed 's/identifier BIGINT/identifier INTEGER/' \
+    $SQL_PATH/database-script.sql > database-script-int.sql
+mclient -p 50000 -d $DB database-script-int.sql
+rm database-script-int.sql
+mclient -p 50000 -d $DB -s "SELECT insertDataflowVersion(insertDataflow('legacy'));"
+mclient -p 50000 -d $DB -s "SELECT insertDataTransformation(insertDataflow('legacy'), 'tf');"
+mclient -p 50000 -d $DB -s "SELECT insertTask(1, 'legacy', 'tf', 'RUNNING', '', 'local', '', '');"
+mclient -p 50000 -d $DB -s "SELECT insertTask(2147483647, 'legacy', 'tf', 'FINISHED', '', 'local', '', '');"
+
+echo "--------------------------------------------"
+echo "Starting DfAnalyzer..."
+rm -f DfA.properties
+echo "di_dir="$SIMULATION_DIR >> DfA.properties
+echo "dbms=MONETDB" >> DfA.properties
+echo "db_server=localhost" >> DfA.properties
+echo "db_port=50000" >> DfA.properties
+echo "db_name="$DB >> DfA.properties
+echo "db_user=monetdb" >> DfA.properties
+echo "db_password=monetdb" >> DfA.properties
+rm -rf dataflows
+java -jar target/DfAnalyzer-$DFANALYZER_VERSION.jar > test-server.log 2>&1 &
+SERVER_PID=$!
+trap "kill $SERVER_PID" EXIT
+for i in `seq 1 120`; do
+  if curl -sf $DFA_TEST_URL/api/dataflows/list > /dev/null; then
+    break
+  fi
+  sleep 1
+done
+
+echo "--------------------------------------------"
+echo "Checking the migration of task.identifier..."
+IDENTIFIER_TYPE=`mclient -p 50000 -d $DB -f csv -s "SELECT c.type FROM sys.columns c, sys.tables t WHERE c.table_id = t.id AND t.name = 'task' AND c.name = 'identifier';"`
+LEGACY_TASKS=`mclient -p 50000 -d $DB -f csv -s "SELECT t.identifier, t.status FROM task t, data_transformation dt, dataflow df WHERE t.dt_id = dt.id AND dt.df_id = df.id AND df.tag = 'legacy' ORDER BY t.identifier;" | tr '\n' ' '`
+echo "task.identifier: $IDENTIFIER_TYPE, legacy tasks: $LEGACY_TASKS"
+if [ "$IDENTIFIER_TYPE" != "bigint" ] || [ "$LEGACY_TASKS" != "1,RUNNING 2147483647,FINISHED " ]; then
+  echo "The migration failed, see test-server.log."
+  exit 1
+fi
+
+echo "--------------------------------------------"
+echo "Running the round trips..."
+DFA_TEST_URL=$DFA_TEST_URL python3 -m pytest -v $LIBRARY_DIR/tests/test_server.py
@@ -0,0 +1,222 @@
+"""
+Benchmark of the provenance capture overhead of dfa_lib_python. A stand-in
+of the Dataflow Analyzer API runs in a separate process, with an optional
+injected latency, so the client CPU and memory are measured alone. Three
+workloads are shaped like the evaluation scripts:
+
+    - tiny: many tasks with two small datasets ('3-classificando.py')
+    - huge: one task with one dataset per training image ('5-treinamento.py')
+    - wide: tasks with one dataset per extracted frame ('2-extracao.py')
+
+Every save (begin/end) is timed. The results are printed and written as
+JSON, so they can be compared across releases. With --intern, every
+workload is run again with the repeated datasets interned, and the
+reduction of the request bytes per task is reported.
+
+    $ python benchmarks/capture_benchmark.py --latency 0.001 \
+          --output results.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+import requests
+from datetime import datetime
+from dfa_lib_python import interning
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import HTTPTransport
+
+SYSTEM = ["executor", "/home/executor", "camera-host", "3.8.10"]
+SCRIPT = ["/opt/provincia/script.py", "2025-01-01T10:00:00",
+          "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"]
+
+
+def tiny(transport, size, latencies):
+    """Many tasks with two small datasets, as '3-classificando.py'."""
+    for i in range(1, size + 1):
+        task = Task(i, "classificar_frames", "ClassificarFrames",
+                    transport=transport)
+        timed(task.begin, latencies)
+        task.add_dataset(DataSet("FramesNaoClassificados",
+                                 [Element(["frames/%d.jpg" % i])]))
+        task.add_dataset(DataSet("FramesClassificados",
+                                 [Element(["out/sem_chuva/%d.jpg" % i,
+                                           "sem_chuva"])]))
+        task.add_dataset(DataSet("system_metadata3", [Element(SYSTEM)]))
+        task.add_dataset(DataSet("script_metadata3", [Element(SCRIPT)]))
+        timed(task.end, latencies)
+    return size
+
+
+def huge(transport, size, latencies):
+    """One task with one dataset per training image, as '5-treinamento.py'."""
+    task = Task(1, "treinamento", "TreinarModelo", transport=transport)
+    timed(task.begin, latencies)
+    for i in range(size):
+        task.add_dataset(DataSet("imagens_treinamento", [
+            Element(["train/%d.jpg" % i, "chuva_leve"])]))
+    task.add_dataset(DataSet("modelo_treinado", [Element(["modelo.h5"])]))
+    task.add_dataset(DataSet("system_metadata5", [Element(SYSTEM)]))
+    task.add_dataset(DataSet("script_metadata5", [Element(SCRIPT)]))
+    timed(task.end, latencies)
+    return 1
+
+
+def wide(transport, size, latencies, frames=100):
+    """Tasks with one dataset per extracted frame, as '2-extracao.py'."""
+    for i in range(1, size + 1):
+        task = Task(i, "extracaoframes", "ExtrairFrames", transport=transport)
+        timed(task.begin, latencies)
+        task.add_dataset(DataSet("VideosEntrada",
+                                 [Element(["videos/%d.mp4" % i])]))
+        task.add_dataset(DataSet("system_metadata2", [Element(SYSTEM)]))
+        for frame in range(frames):
+            task.add_dataset(DataSet("FramesGerados", [Element(
+                ["frames/%d_%d.jpg" % (i, frame)])]))
+        task.add_dataset(DataSet("script_metadata2", [Element(SCRIPT)]))
+        timed(task.end, latencies)
+    return size
+
+
+WORKLOADS = {"tiny": tiny, "huge": huge, "wide": wide}
+
+
+def timed(function, latencies):
+    start = time.perf_counter()
+    function()
+    latencies.append(time.perf_counter() - start)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    index = int(round(fraction * (len(values) - 1)))
+    return values[min(len(values) - 1, index)]
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def stats(url):
+    return requests.get(url + "/standin/stats").json()
+
+
+def measure(name, size, url, transport, intern=False):
+    latencies = []
+    if intern:
+        interning.enable()
+    before = stats(url)
+    cpu = cpu_seconds()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tasks = WORKLOADS[name](transport, size, latencies)
+    elapsed = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu
+    interning.disable()
+    after = stats(url)
+    request_bytes = after["bytes_received"] - before["bytes_received"]
+    return {
+        "workload": name,
+        "interned": intern,
+        "size": size,
+        "tasks": tasks,
+        "seconds": elapsed,
+        "tasks_per_sec": tasks / elapsed,
+        "save_p50_ms": percentile(latencies, 0.50) * 1000,
+        "save_p99_ms": percentile(latencies, 0.99) * 1000,
+        "requests": after["requests"] - before["requests"],
+        "request_bytes": request_bytes,
+        "request_bytes_per_task": request_bytes / float(tasks),
+        "client_cpu_sec": cpu,
+        "client_cpu_share": cpu / elapsed,
+        "client_peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--workloads", default="tiny,huge,wide")
+    parser.add_argument("--tasks", type=int, default=1000,
+                        help="tasks of the tiny workload")
+    parser.add_argument("--rows", type=int, default=20000,
+                        help="datasets of the huge workload")
+    parser.add_argument("--videos", type=int, default=50,
+                        help="tasks of the wide workload")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds injected by the stand-in per request")
+    parser.add_argument("--intern", action="store_true",
+                        help="run every workload again with interning")
+    parser.add_argument("--output", default=None,
+                        help="json file the results are written to")
+    args = parser.parse_args()
+    sizes = {"tiny": args.tasks, "huge": args.rows, "wide": args.videos}
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "dfa_lib_python.standin",
+         "--latency", str(args.latency)],
+        stdout=subprocess.PIPE, universal_newlines=True)
+    try:
+        url = server.stdout.readline().strip()
+        transport = HTTPTransport(url)
+        with contextlib.redirect_stdout(io.StringIO()):
+            Dataflow("benchmark", transport=transport, cache=False).save()
+        results = []
+        for name in args.workloads.split(","):
+            results.append(measure(name, sizes[name], url, transport))
+            if args.intern:
+                results.append(measure(name, sizes[name], url, transport,
+                                       intern=True))
+        transport.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "date": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency": args.latency,
+        "results": results,
+    }
+    plain = {}
+    for result in results:
+        print("{workload:5s} {tasks_per_sec:10.1f} tasks/sec  "
+              "p50 {save_p50_ms:8.3f} ms  p99 {save_p99_ms:8.3f} ms  "
+              "{request_bytes:11d} bytes  {request_bytes_per_task:10.1f} "
+              "bytes/task  cpu {client_cpu_share:5.1%}  "
+              "rss {client_peak_rss_bytes:11d}{0}".format(
+                  "  interned" if result["interned"] else "", **result))
+        if not result["interned"]:
+            plain[result["workload"]] = result
+        elif result["workload"] in plain:
+            before = plain[result["workload"]]["request_bytes_per_task"]
+            result["bytes_per_task_reduction"] = \
+                1 - result["request_bytes_per_task"] / before
+            print("{0:5s} interning saves {1:.1%} of the bytes per task"
+                  .format(result["workload"],
+                          result["bytes_per_task_reduction"]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
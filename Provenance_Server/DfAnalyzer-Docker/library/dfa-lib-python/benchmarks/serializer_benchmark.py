@@ -0,0 +1,70 @@
+"""
+Benchmark of task payload serialization, in payloads per second, for a
+task shaped like the ones of '3-classificando.py': two per-frame datasets
+plus the constant system and script metadata datasets.
+
+    $ python benchmarks/serializer_benchmark.py --payloads 50000
+"""
+import argparse
+import json
+import time
+from dfa_lib_python.task import Task
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+
+SYSTEM = DataSet("system_metadata3", [Element(
+    ["executor", "/home/executor", "camera-host", "3.8.10"])])
+SCRIPT = DataSet("script_metadata3", [Element(
+    ["/opt/provincia/3-classificando.py", "2025-01-01T10:00:00",
+     "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"])])
+
+
+def build(i):
+    task = Task(i, "classificar_frames", "ClassificarFrames")
+    task._start()
+    task.add_dataset(DataSet("FramesNaoClassificados",
+                             [Element(["frames/%d.jpg" % i])]))
+    task.add_dataset(DataSet("FramesClassificados",
+                             [Element(["out/sem_chuva/%d.jpg" % i,
+                                       "sem_chuva"])]))
+    task.add_dataset(SYSTEM)
+    task.add_dataset(SCRIPT)
+    task._finish()
+    return task
+
+
+def dumps(task):
+    return json.dumps(task.get_specification()).encode("utf-8")
+
+
+def measure(function, payloads):
+    start = time.perf_counter()
+    for i in range(payloads):
+        function(i)
+    return payloads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--payloads", type=int, default=20000)
+    args = parser.parse_args()
+
+    task = build(0)
+    rows = [
+        ("get_specification", lambda i: task.get_specification()),
+        ("json.dumps(spec)", lambda i: dumps(task)),
+        ("build + json.dumps", lambda i: dumps(build(i))),
+    ]
+    if hasattr(task, "to_json"):
+        rows += [
+            ("to_json", lambda i: task.to_json()),
+            ("build + to_json", lambda i: build(i).to_json()),
+        ]
+    print("payloads: {0}".format(args.payloads))
+    for name, function in rows:
+        print("{0:20}: {1:12.0f} payloads/sec".format(
+            name, measure(function, args.payloads)))
+
+
+if __name__ == "__main__":
+    main()
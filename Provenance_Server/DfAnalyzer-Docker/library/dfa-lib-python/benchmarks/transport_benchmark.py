@@ -0,0 +1,73 @@
+"""
+Micro-benchmark of Task.begin()/end() throughput against a local stand-in
+of '/pde/task/json', comparing one connection per request (the previous
+module-level ``requests.post``) with the pooled :obj:`HTTPTransport` and
+with batched submission through :obj:`TaskBatch`.
+
+    $ python benchmarks/transport_benchmark.py --tasks 2000
+"""
+import argparse
+import contextlib
+import io
+import time
+import requests
+from dfa_lib_python.task import Task
+from dfa_lib_python.batch import TaskBatch
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.standin import StandInServer
+from dfa_lib_python.transport import HTTPTransport
+
+
+class UnpooledTransport(object):
+    """Opens a new connection for every request, as Task.save used to."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def post(self, route, message):
+        return requests.post(self.url + route, data=message,
+                             headers={"Content-Type": "application/json"})
+
+
+def run(transport, tasks):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(1, tasks + 1):
+            task = Task(i, "classificar_frames", "ClassificarFrames",
+                        transport=transport)
+            task.begin()
+            task.add_dataset(DataSet("FramesNaoClassificados",
+                                     [Element(["frames/%d.jpg" % i])]))
+            task.add_dataset(DataSet("FramesClassificados", [
+                Element(["out/%d.jpg" % i, "sem_chuva"])]))
+            task.end()
+        if isinstance(transport, TaskBatch):
+            transport.flush()
+    return tasks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    with StandInServer(latency=args.latency) as server:
+        before = run(UnpooledTransport(server.url), args.tasks)
+        pooled = HTTPTransport(server.url)
+        after = run(pooled, args.tasks)
+        batched = run(TaskBatch(pooled, max_size=args.batch_size), args.tasks)
+        pooled.close()
+
+    print("tasks: {0}".format(args.tasks))
+    print("requests.post    : {0:10.1f} tasks/sec".format(before))
+    print("HTTPTransport    : {0:10.1f} tasks/sec".format(after))
+    print("TaskBatch        : {0:10.1f} tasks/sec".format(batched))
+    print("speedup (pooled) : {0:10.2f}x".format(after / before))
+    print("speedup (batch)  : {0:10.2f}x".format(batched / before))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,51 @@
+import json
+from json.encoder import encode_basestring_ascii
+
+_plans = {}
+_names = {}
+_encoder = json.JSONEncoder(separators=(",", ":"))
+
+
+def _field_plan(cls, prefix):
+    """ Return the (attribute, json name) pairs of the slots of a class
+        whose names start with the prefix, and whether its instances have
+        a __dict__, computed once per class.
+    """
+    plan = _plans.get((cls, prefix))
+    if plan is None:
+        fields = []
+        for klass in reversed(cls.__mro__):
+            slots = klass.__dict__.get("__slots__", ())
+            if isinstance(slots, str):
+                slots = (slots,)
+            for key in slots:
+                if key[0] == prefix:
+                    fields.append((key, key.split(prefix)[1]))
+        plan = (tuple(fields), cls.__dictoffset__ != 0)
+        _plans[(cls, prefix)] = plan
+    return plan
+
+
+def encode_row(values):
+    """ Encode a list of element values as a json array string. Strings
+        are escaped directly, other values go through the json encoder.
+
+    Args:
+        values (list): Element values.
+    """
+    return "[" + ",".join([encode_basestring_ascii(x) if isinstance(x, str)
+                           else _encoder.encode(x) for x in values]) + "]"
+
+
+def dumps(value):
+    """ Encode a value as compact json bytes.
+
+    Args:
+        value: A json serializable value.
+    """
+    return _encoder.encode(value).encode("utf-8")
+
+
 class ProvenanceObject(object):
     """
     This class defines a basic provenance object with
@@ -6,6 +54,7 @@ class ProvenanceObject(object):
     Attributes:
         - tag (str): ProvenanceObject tag.
     """
+    __slots__ = ("_tag",)
 
     def __init__(self, tag):
         self._tag = tag.lower()
@@ -17,14 +66,19 @@ class ProvenanceObject(object):
             prefix (str): A prefix used to define which variables should be used.
         """
         json = {}
-        for key in self.__dict__.keys():
-            if key[0] != prefix:
+        fields, has_dict = _field_plan(type(self), prefix)
+        for key, name in fields:
+            value = getattr(self, key, None)
+            if value:
+                json[name] = value
+        if not has_dict:
+            return json
+        for key, value in self.__dict__.items():
+            if key[0] != prefix or not value:
                 continue
-            name = key.split(prefix)[1]
-            value = self.__dict__[key]
-            if(value is not None):
-                if(len(value) > 0):
-                    json[name] = value
-                    if isinstance(value, str):
-                        json[name] = value
+            name = _names.get((key, prefix))
+            if name is None:
+                name = key.split(prefix)[1]
+                _names[(key, prefix)] = name
+            json[name] = value
         return json
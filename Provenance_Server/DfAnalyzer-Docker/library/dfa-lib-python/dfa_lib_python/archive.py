@@ -0,0 +1,439 @@
+import argparse
+import json
+import os
+from datetime import datetime
+from .batch import DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .dataflow import resolve_sets
+from .spool import read_records
+from .transport import decode_message
+
+try:
+    import pyarrow
+    import pyarrow.compute as compute
+    import pyarrow.dataset as dataset
+    import pyarrow.parquet as parquet
+except ImportError:
+    pyarrow = None
+
+DATAFLOWS_FILE = "dataflows.json"
+PARTITIONS = ("dataflow", "transformation", "day")
+_TIME_FORMATS = ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S')
+_STATUSES = ["FINISHED", "RUNNING", "READY"]
+
+
+def _string():
+    return pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+
+
+def _task_schema():
+    return pyarrow.schema([
+        ("dataflow", pyarrow.string()),
+        ("transformation", pyarrow.string()),
+        ("day", pyarrow.string()),
+        ("task_id", pyarrow.string()),
+        ("sub_id", pyarrow.string()),
+        ("status", _string()),
+        ("workspace", _string()),
+        ("resource", _string()),
+        ("output", pyarrow.string()),
+        ("error", pyarrow.string()),
+        ("dependency", pyarrow.string()),
+        ("starttime", pyarrow.timestamp("us")),
+        ("endtime", pyarrow.timestamp("us")),
+        ("duration", pyarrow.float64()),
+    ])
+
+
+def _element_schema():
+    return pyarrow.schema([
+        ("dataflow", pyarrow.string()),
+        ("transformation", pyarrow.string()),
+        ("day", pyarrow.string()),
+        ("task_id", pyarrow.string()),
+        ("set_tag", _string()),
+        ("set_type", _string()),
+        ("element", pyarrow.int32()),
+        ("position", pyarrow.int32()),
+        ("attribute", _string()),
+        ("value", _string()),
+    ])
+
+
+def _parse_time(value):
+    if not value or value == "null":
+        return None
+    for format in _TIME_FORMATS:
+        try:
+            return datetime.strptime(value, format)
+        except ValueError:
+            pass
+    return None
+
+
+def _task_times(performances):
+    for performance in performances or []:
+        if not performance.get("method"):
+            return (_parse_time(performance.get("startTime")),
+                    _parse_time(performance.get("endTime")))
+    return None, None
+
+
+def _attribute_names(attributes):
+    return [x["name"].lower() for x in attributes]
+
+
+class ProvenanceArchive(object):
+    """
+    This class defines a columnar archive of provenance in Parquet files,
+    partitioned by dataflow tag, transformation and day. Tags, statuses and
+    element values (e.g. paths) are dictionary encoded. It is used as a
+    transport, or filled from spool directories, and answers common audits
+    off-line without querying Dataflow Analyzer. It requires pyarrow.
+
+    Every task message is one row of the ``tasks`` dataset, so a task saved
+    by ``begin()`` and ``end()`` has a RUNNING and a FINISHED row, and every
+    element value is one row of the ``elements`` dataset.
+
+    Attributes:
+        - directory (:obj:`str`): Archive directory.
+        - max_rows (:obj:`int`, optional): Element rows buffered before
+          the buffer is written as new files.
+    """
+    def __init__(self, directory, max_rows=500000):
+        if pyarrow is None:
+            raise ImportError("ProvenanceArchive requires pyarrow.")
+        assert isinstance(max_rows, int) and max_rows > 0, \
+            "The number of buffered rows must be a positive integer."
+        self._directory = directory
+        self._max_rows = max_rows
+        self._tasks = []
+        self._elements = []
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, DATAFLOWS_FILE)
+        self._dataflows = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._dataflows = json.load(f)
+
+    @property
+    def directory(self):
+        """Get the archive directory."""
+        return self._directory
+
+    def post(self, route, message):
+        """ Add a message to the archive.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        message = decode_message(message)
+        if route == DATAFLOW_ROUTE:
+            self._add_dataflow(message)
+        elif route == TASK_ROUTE:
+            self._add_task(message)
+        elif route == BATCH_ROUTE:
+            for task in message:
+                self._add_task(task)
+        if len(self._elements) >= self._max_rows:
+            self.flush()
+        return None
+
+    def write(self, records):
+        """ Add (route, message) pairs to the archive and write them.
+
+        Args:
+            - records: Iterable of (route, message) pairs.
+        """
+        for route, message in records:
+            self.post(route, message)
+        self.flush()
+
+    def write_spool(self, directory):
+        """ Add the records of every segment of a spool directory to the
+            archive and write them. Returns the number of records.
+
+        Args:
+            - directory (:obj:`str`): Spool directory.
+        """
+        count = 0
+        for route, message in read_records(directory):
+            self.post(route, message)
+            count += 1
+        self.flush()
+        return count
+
+    def _add_dataflow(self, message):
+        dataflow = self._dataflows.setdefault(message["tag"], {})
+        if not message.get("delta"):
+            dataflow.clear()
+        known = [(tag, set["attributes"]) for sets in dataflow.values()
+                 for tag, set in sets.items()]
+        for dt_tag, set, attributes in resolve_sets(
+                message, _attribute_names, known):
+            dataflow.setdefault(dt_tag, {})[set["tag"]] = {
+                "type": set["type"], "attributes": attributes}
+        path = os.path.join(self._directory, DATAFLOWS_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._dataflows, f)
+        os.replace(path + ".tmp", path)
+
+    def _get_set(self, dataflow, transformation, tag):
+        set = self._dataflows.get(dataflow, {}).get(transformation, {}).get(
+            tag, {})
+        return set.get("type"), set.get("attributes", [])
+
+    def _add_task(self, task):
+        dataflow, transformation = task["dataflow"], task["transformation"]
+        task_id = str(task["id"])
+        start, end = _task_times(task.get("performances"))
+        day = (start or datetime.now()).strftime("%Y-%m-%d")
+        self._tasks.append({
+            "dataflow": dataflow,
+            "transformation": transformation,
+            "day": day,
+            "task_id": task_id,
+            "sub_id": task.get("sub"),
+            "status": task.get("status"),
+            "workspace": task.get("workspace"),
+            "resource": task.get("resource"),
+            "output": task.get("output"),
+            "error": task.get("error"),
+            "dependency": json.dumps(task["dependency"])
+            if task.get("dependency") else None,
+            "starttime": start,
+            "endtime": end,
+            "duration": (end - start).total_seconds()
+            if start and end else None,
+        })
+        for set in task.get("sets", []):
+            type, attributes = self._get_set(dataflow, transformation,
+                                             set["tag"])
+            for index, values in enumerate(set.get("elements", [])):
+                if not isinstance(values, list):
+                    values = [values]
+                for position, value in enumerate(values):
+                    self._elements.append({
+                        "dataflow": dataflow,
+                        "transformation": transformation,
+                        "day": day,
+                        "task_id": task_id,
+                        "set_tag": set["tag"],
+                        "set_type": type,
+                        "element": index,
+                        "position": position,
+                        "attribute": attributes[position]
+                        if position < len(attributes) else None,
+                        "value": None if value is None else str(value),
+                    })
+
+    def flush(self):
+        """Write the buffered rows as new Parquet files."""
+        for name, rows, schema in (("tasks", self._tasks, _task_schema()),
+                                   ("elements", self._elements,
+                                    _element_schema())):
+            if not rows:
+                continue
+            table = pyarrow.Table.from_pylist(rows, schema=schema)
+            parquet.write_to_dataset(
+                table, os.path.join(self._directory, name),
+                partition_cols=list(PARTITIONS))
+        self._tasks = []
+        self._elements = []
+
+    def close(self):
+        """Write the buffered rows."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def table(self, name, dataflow=None, transformation=None, days=None,
+              columns=None):
+        """ Read the ``tasks`` or ``elements`` dataset as a pyarrow Table,
+            reading only the matching partitions.
+
+        Args:
+            - name (:obj:`str`): 'tasks' or 'elements'.
+            - dataflow (:obj:`str`, optional): Dataflow tag.
+            - transformation (:obj:`str`, optional): Transformation tag.
+            - days (:obj:`list`, optional): Days as 'YYYY-MM-DD' strings.
+            - columns (:obj:`list`, optional): Columns to read.
+        """
+        schema = _task_schema() if name == "tasks" else _element_schema()
+        path = os.path.join(self._directory, name)
+        if not os.path.exists(path):
+            return schema.empty_table().select(columns or schema.names)
+        partitioning = dataset.partitioning(
+            pyarrow.schema([schema.field(x) for x in PARTITIONS]),
+            flavor="hive")
+        source = dataset.dataset(path, schema=schema, format="parquet",
+                                 partitioning=partitioning)
+        filter = None
+        for field, value in (("dataflow", dataflow),
+                             ("transformation", transformation)):
+            if value is not None:
+                expression = dataset.field(field) == value.lower()
+                filter = expression if filter is None else filter & expression
+        if days is not None:
+            expression = dataset.field("day").isin(list(days))
+            filter = expression if filter is None else filter & expression
+        return source.to_table(columns=columns, filter=filter)
+
+    def tasks(self, dataflow=None, transformation=None, days=None):
+        """ Return one row per task with its last status and its start,
+            end and duration in seconds, as a pyarrow Table.
+
+        Args:
+            - dataflow (:obj:`str`, optional): Dataflow tag.
+            - transformation (:obj:`str`, optional): Transformation tag.
+            - days (:obj:`list`, optional): Days as 'YYYY-MM-DD' strings.
+        """
+        table = self.table("tasks", dataflow, transformation, days, [
+            "dataflow", "transformation", "task_id", "status", "starttime",
+            "endtime", "duration"])
+        # the most advanced status wins, whatever the order of the rows
+        table = table.set_column(3, "status", compute.index_in(
+            compute.cast(table["status"], pyarrow.string()),
+            value_set=pyarrow.array(_STATUSES)))
+        table = table.group_by(["dataflow", "transformation", "task_id"]) \
+            .aggregate([("status", "min"), ("starttime", "min"),
+                        ("endtime", "max"), ("duration", "max")]) \
+            .rename_columns(["dataflow", "transformation", "task_id",
+                             "status", "starttime", "endtime", "duration"])
+        return table.set_column(3, "status", compute.take(
+            pyarrow.array(_STATUSES), table["status"]))
+
+    def tasks_per_hour(self, set_tag, attribute, dataflow=None,
+                       transformation=None, days=None):
+        """ Count the tasks per value of an attribute and per hour of their
+            start, e.g. tasks per camera per hour. Returns a list of
+            (value, hour, tasks) tuples sorted by value and hour.
+
+        Args:
+            - set_tag (:obj:`str`): Tag of the set with the attribute.
+            - attribute (:obj:`str` or :obj:`int`): Attribute name or position.
+            - dataflow (:obj:`str`, optional): Dataflow tag.
+            - transformation (:obj:`str`, optional): Transformation tag.
+            - days (:obj:`list`, optional): Days as 'YYYY-MM-DD' strings.
+        """
+        elements = self.table("elements", dataflow, transformation, days, [
+            "dataflow", "transformation", "task_id", "set_tag", "position",
+            "attribute", "value"])
+        mask = compute.equal(compute.cast(elements["set_tag"],
+                                          pyarrow.string()), set_tag.lower())
+        if isinstance(attribute, int):
+            mask = compute.and_(mask, compute.equal(elements["position"],
+                                                    attribute))
+        else:
+            mask = compute.and_(mask, compute.equal(
+                compute.cast(elements["attribute"], pyarrow.string()),
+                attribute.lower()))
+        elements = elements.filter(mask)
+        values = pyarrow.table({
+            "dataflow": elements["dataflow"],
+            "transformation": elements["transformation"],
+            "task_id": elements["task_id"],
+            "value": compute.cast(elements["value"], pyarrow.string())})
+        tasks = self.tasks(dataflow, transformation, days)
+        tasks = tasks.filter(compute.is_valid(tasks["starttime"]))
+        tasks = pyarrow.table({
+            "dataflow": tasks["dataflow"],
+            "transformation": tasks["transformation"],
+            "task_id": tasks["task_id"],
+            "hour": compute.floor_temporal(tasks["starttime"], unit="hour")})
+        joined = values.join(tasks, ["dataflow", "transformation", "task_id"],
+                             join_type="inner")
+        keys = compute.binary_join_element_wise(
+            joined["dataflow"], joined["transformation"], joined["task_id"],
+            "/")
+        joined = joined.append_column("key", keys)
+        counts = joined.group_by(["value", "hour"]).aggregate(
+            [("key", "count_distinct")])
+        return sorted(zip(counts["value"].to_pylist(),
+                          counts["hour"].to_pylist(),
+                          counts["key_count_distinct"].to_pylist()))
+
+    def latency_percentiles(self, quantiles=(0.5, 0.9, 0.99), dataflow=None,
+                            days=None):
+        """ Return the task duration percentiles in seconds per
+            transformation, as {transformation: {quantile: seconds}}.
+
+        Args:
+            - quantiles (:obj:`tuple`, optional): Quantiles between 0 and 1.
+            - dataflow (:obj:`str`, optional): Dataflow tag.
+            - days (:obj:`list`, optional): Days as 'YYYY-MM-DD' strings.
+        """
+        tasks = self.tasks(dataflow, days=days)
+        tasks = tasks.filter(compute.is_valid(tasks["duration"]))
+        result = {}
+        for transformation in compute.unique(
+                tasks["transformation"]).to_pylist():
+            durations = tasks.filter(compute.equal(
+                tasks["transformation"], transformation))["duration"]
+            values = compute.quantile(durations, q=list(quantiles))
+            result[transformation] = dict(zip(quantiles, values.to_pylist()))
+        return result
+
+    def missing_outputs(self, dataflow=None, days=None):
+        """ Return the finished tasks without elements in an output set of
+            their transformation, as a list of (dataflow, transformation,
+            task id, set tag) tuples. Output sets are known from the
+            archived dataflow specifications.
+
+        Args:
+            - dataflow (:obj:`str`, optional): Dataflow tag.
+            - days (:obj:`list`, optional): Days as 'YYYY-MM-DD' strings.
+        """
+        tasks = self.tasks(dataflow, days=days)
+        tasks = tasks.filter(compute.is_valid(tasks["endtime"])) \
+            .select(["dataflow", "transformation", "task_id"])
+        elements = self.table("elements", dataflow, days=days, columns=[
+            "dataflow", "transformation", "task_id", "set_tag"])
+        elements = pyarrow.table({
+            "dataflow": elements["dataflow"],
+            "transformation": elements["transformation"],
+            "task_id": elements["task_id"],
+            "set_tag": compute.cast(elements["set_tag"], pyarrow.string())})
+        keys = ["dataflow", "transformation", "task_id"]
+        missing = []
+        for df_tag, transformations in sorted(self._dataflows.items()):
+            if dataflow is not None and df_tag != dataflow.lower():
+                continue
+            for dt_tag, sets in sorted(transformations.items()):
+                outputs = [tag for tag, set in sorted(sets.items())
+                           if set["type"] == "OUTPUT"]
+                if not outputs:
+                    continue
+                finished = tasks.filter(compute.and_(
+                    compute.equal(tasks["dataflow"], df_tag),
+                    compute.equal(tasks["transformation"], dt_tag)))
+                for tag in outputs:
+                    found = elements.filter(
+                        compute.equal(elements["set_tag"], tag)).select(keys)
+                    rows = finished.join(found, keys, join_type="left anti")
+                    missing.extend((df_tag, dt_tag, x, tag) for x in
+                                   sorted(rows["task_id"].to_pylist()))
+        return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write dfa_lib_python spool directories into a Parquet "
+                    "provenance archive.")
+    parser.add_argument("archive")
+    parser.add_argument("spool", nargs="+")
+    args = parser.parse_args()
+    archive = ProvenanceArchive(args.archive)
+    for directory in args.spool:
+        print("{0}: {1} records".format(directory,
+                                        archive.write_spool(directory)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+from .batch import DATAFLOW_ROUTE
+from .dataflow import Dataflow
+from .hashing import watch_dataflow
+from .async_transport import get_default_async_transport
+
+
+class AsyncDataflow(Dataflow):
+    """
+    This class defines a dataflow stored through an asyncio transport.
+    It takes the same arguments as :obj:`Dataflow` but save() is a
+    coroutine.
+
+    Attributes:
+        - transport (optional): Transport used to send the Dataflow. Defaults
+          to the shared :obj:`AsyncHTTPTransport`.
+    """
+
+    async def save(self):
+        """ Send a post request to the Dataflow Analyzer API to store
+            the dataflow.
+        """
+        transport = self.transport or get_default_async_transport()
+        registration = self._registration(transport)
+        watch_dataflow(registration.specification)
+        get = getattr(transport, "get", None)
+        if registration.entry is not None and get is not None:
+            r = await get(registration.route)
+            registration.check(r.status, await r.json(content_type=None)
+                               if r.status == 200 else None)
+        elif registration.entry is not None:
+            registration.check(None, None)
+        if registration.skip:
+            return None
+        r = None
+        if registration.delta is not None:
+            r = await transport.post(DATAFLOW_ROUTE, registration.delta)
+        if registration.delta is None or (r is not None and r.status == 409):
+            r = await transport.post(DATAFLOW_ROUTE,
+                                     registration.specification)
+        registration.done(None if r is None else r.status)
+        return r
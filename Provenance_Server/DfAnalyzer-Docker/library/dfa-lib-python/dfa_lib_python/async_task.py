@@ -0,0 +1,64 @@
+import time
+from .method_type import MethodType
+from .task import Task
+from .async_transport import get_default_async_transport
+
+
+class AsyncTask(Task):
+    """
+    This class defines a dataflow task recorded through an asyncio
+    transport. It takes the same arguments as :obj:`Task` and builds the
+    same messages, but begin(), end() and save() are coroutines.
+
+    Attributes:
+        - transport (optional): Transport used to send the Task. Defaults
+          to the shared :obj:`AsyncHTTPTransport`.
+    """
+
+    async def begin(self):
+        """ Send a post request to the Dataflow Analyzer API to store the Task.
+        """
+        self._start()
+        return await self.save()
+
+    async def end(self):
+        """ Send a post request to the Dataflow Analyzer API to store the Task.
+        """
+        self._finish()
+        return await self.save()
+
+    async def save(self):
+        """ Send a post request to the Dataflow Analyzer API to store the Task.
+            The datasets are kept for the next save when the request fails.
+        """
+        start, clock = time.time_ns(), time.perf_counter_ns()
+        transport = self.transport or get_default_async_transport()
+        sent = len(self._sets)
+        r = await transport.post('/pde/task/json', self.to_json())
+        if r is None or 200 <= r.status < 300:
+            # datasets added while the request was in flight are kept
+            self._sets = self._sets[sent:]
+        if self.profile_saves:
+            self.add_span(MethodType.PROVENANCE, start,
+                          time.perf_counter_ns() - clock)
+        if self.end_ns is not None:
+            # the save of the end is part of the task duration
+            self.end_ns = time.perf_counter_ns()
+        return r
+
+    async def stream_dataset(self, tag, rows, max_rows=10000,
+                             max_bytes=8 * 1024 * 1024):
+        """ Send the rows of a dataset in chunks while they are produced.
+            See :meth:`Task.stream_dataset`.
+        """
+        transport = self.transport or get_default_async_transport()
+        count = 0
+        for message, size in self._chunk_messages(tag, rows, max_rows,
+                                                  max_bytes):
+            start, clock = time.time_ns(), time.perf_counter_ns()
+            await transport.post('/pde/task/json', message)
+            count += size
+            if self.profile_saves:
+                self.add_span(MethodType.PROVENANCE, start,
+                              time.perf_counter_ns() - clock)
+        return count
@@ -0,0 +1,114 @@
+import asyncio
+from .transport import JSON_HEADERS, dfa_url
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncHTTPTransport(object):
+    """
+    This class defines an asyncio transport to the Dataflow Analyzer API.
+    Requests share a pooled aiohttp session and the number of requests in
+    flight is bounded, so thousands of tasks can record their provenance
+    concurrently without a thread per request. It requires aiohttp.
+
+    Attributes:
+        - url (:obj:`str`, optional): Dataflow Analyzer base url.
+        - limit (:obj:`int`, optional): Connections kept in the pool.
+        - max_concurrency (:obj:`int`, optional): Requests in flight,
+          defaults to limit.
+        - connect_timeout (:obj:`float`, optional): Seconds to wait for a
+          connection.
+        - read_timeout (:obj:`float`, optional): Seconds to wait for an answer.
+    """
+    def __init__(self, url=None, limit=100, max_concurrency=None,
+                 connect_timeout=3.05, read_timeout=30):
+        if aiohttp is None:
+            raise ImportError("AsyncHTTPTransport requires aiohttp.")
+        assert isinstance(limit, int) and limit > 0, \
+            "The pool limit must be a positive integer."
+        self._url = (url or dfa_url).rstrip('/')
+        self._limit = limit
+        self._max_concurrency = max_concurrency or limit
+        self._timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                              sock_read=read_timeout)
+        self._session = None
+        self._semaphore = None
+
+    @property
+    def url(self):
+        """Get the Dataflow Analyzer base url."""
+        return self._url
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self._limit)
+            self._session = aiohttp.ClientSession(connector=connector,
+                                                  timeout=self._timeout)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        return self._session
+
+    async def post(self, route, message):
+        """ Send a post request with a json message to the Dataflow
+            Analyzer API.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict` or :obj:`bytes`): The json message, or
+              the json bytes built by ``to_json()``.
+        """
+        session = self._get_session()
+        if isinstance(message, bytes):
+            request = session.post(self._url + route, data=message,
+                                   headers=JSON_HEADERS)
+        else:
+            request = session.post(self._url + route, json=message)
+        async with self._semaphore:
+            async with request as r:
+                await r.read()
+                return r
+
+    async def get(self, route):
+        """ Send a get request to the Dataflow Analyzer API.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/dataflow/{tag}'.
+        """
+        session = self._get_session()
+        async with self._semaphore:
+            async with session.get(self._url + route) as r:
+                await r.read()
+                return r
+
+    async def close(self):
+        """Close every pooled connection."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_default_transport = None
+
+
+def get_default_async_transport():
+    """ Return the process-wide asyncio transport used by asynchronous
+        tasks and dataflows, creating it on first use.
+    """
+    global _default_transport
+    if _default_transport is None:
+        _default_transport = AsyncHTTPTransport()
+    return _default_transport
+
+
+def set_default_async_transport(transport):
+    """ Replace the process-wide asyncio transport.
+
+    Args:
+        - transport: An object with a ``post(route, message)`` coroutine.
+    """
+    global _default_transport
+    assert hasattr(transport, "post"), \
+        "The transport must have a post method."
+    _default_transport = transport
@@ -10,6 +10,7 @@ class Attribute(ProvenanceObject):
         - name (str): Attribute name.
         - type (:obj:`AttributeType`): Attribute Type.
     """
+    __slots__ = ("_name", "_type")
 
     def __init__(self, tag, type):
         ProvenanceObject.__init__(self, "")
@@ -0,0 +1,175 @@
+import threading
+from .ProvenanceObject import ProvenanceObject
+from .transport import encode_message, get_default_transport
+
+DATAFLOW_ROUTE = '/pde/dataflow/json'
+TASK_ROUTE = '/pde/task/json'
+BATCH_ROUTE = '/pde/task/batch/json'
+
+
+def _http_error(status_code):
+    error = "HTTP {0}".format(status_code)
+    if status_code >= 500:
+        return IOError(error)
+    return error
+
+
+class TaskBatch(object):
+    """
+    This class defines a buffer of task messages sent to the Dataflow
+    Analyzer API in size- or time-bounded batches, one request per batch.
+    It can be used as the transport of many tasks. Messages are sent in
+    the order they were added, so the order per task id is kept.
+
+    Attributes:
+        - transport (optional): Transport used to send the batches. Defaults
+          to the shared :obj:`HTTPTransport`.
+        - max_size (:obj:`int`, optional): Messages per batch.
+        - max_delay (:obj:`float`, optional): Seconds a message may wait in
+          the buffer, None disables the time bound.
+        - route (:obj:`str`, optional): Batch ingestion route.
+        - on_error (optional): Callable receiving (message, error) for every
+          message that was not stored. The error is an exception when the
+          request itself failed (connection errors, HTTP 5xx) and a string
+          when the server rejected the message.
+    """
+    def __init__(self, transport=None, max_size=100, max_delay=1.0,
+                 route=BATCH_ROUTE, on_error=None):
+        assert isinstance(max_size, int) and max_size > 0, \
+            "The batch size must be a positive integer."
+        self._transport = transport
+        self._max_size = max_size
+        self._max_delay = max_delay
+        self._route = route
+        self._on_error = on_error
+        self._buffer = []
+        self._lock = threading.RLock()
+        self._timer = None
+        self._unpack = False
+        self.failures = []
+
+    @property
+    def pending(self):
+        """Get the number of buffered messages."""
+        return len(self._buffer)
+
+    def add(self, task):
+        """ Add a task to the batch.
+
+        Args:
+            - task: A :obj:`Task`, its json specification or its json bytes.
+        """
+        if isinstance(task, ProvenanceObject):
+            task = task.to_json()
+        assert isinstance(task, (dict, bytes)), "The task must be valid."
+        with self._lock:
+            self._buffer.append(task)
+            if len(self._buffer) >= self._max_size:
+                self.flush()
+            elif len(self._buffer) == 1 and self._max_delay is not None:
+                self._timer = threading.Timer(self._max_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def post(self, route, message):
+        """ Buffer task messages, other messages are sent right after the
+            buffered ones.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict` or :obj:`bytes`): The json message.
+        """
+        if route == TASK_ROUTE:
+            self.add(message)
+            return None
+        with self._lock:
+            self.flush()
+            return self._get_transport().post(route, message)
+
+    def _get_transport(self):
+        return self._transport or get_default_transport()
+
+    def flush(self):
+        """ Send the buffered messages.
+
+        Returns a list with a (message, error) pair for every message
+        that was not stored.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            messages, self._buffer = self._buffer, []
+            failures = self.send(messages)
+            for message, error in failures:
+                if self._on_error is not None:
+                    self._on_error(message, error)
+            self.failures.extend(failures)
+        return failures
+
+    def send(self, messages):
+        """ Send a list of task messages right away, bypassing the buffer.
+
+        Args:
+            - messages (:obj:`list`): Task json messages.
+
+        Returns a list with a (message, error) pair for every message
+        that was not stored.
+        """
+        failures = []
+        for start in range(0, len(messages), self._max_size):
+            chunk = messages[start:start + self._max_size]
+            failures.extend(self._send(chunk))
+        return failures
+
+    def _send(self, messages):
+        if not messages:
+            return []
+        transport = self._get_transport()
+        if self._route is not None and not self._unpack:
+            body = b"[" + b",".join([encode_message(x)
+                                     for x in messages]) + b"]"
+            try:
+                r = transport.post(self._route, body)
+            except Exception as e:
+                return [(message, e) for message in messages]
+            if r is None:
+                # the transport defers delivery, e.g. a spool
+                return []
+            if r.status_code == 404:
+                # the server has no batch route, send the tasks one by one
+                self._unpack = True
+            elif r.status_code >= 400:
+                error = _http_error(r.status_code)
+                return [(message, error) for message in messages]
+            else:
+                return self._read_results(messages, r.json())
+        failures = []
+        for message in messages:
+            try:
+                r = transport.post(TASK_ROUTE, message)
+            except Exception as e:
+                failures.append((message, e))
+                continue
+            if r is not None and r.status_code >= 400:
+                failures.append((message, _http_error(r.status_code)))
+        return failures
+
+    def _read_results(self, messages, results):
+        if not isinstance(results, list) or len(results) != len(messages):
+            return [(message, "Invalid batch answer.") for message in messages]
+        failures = []
+        for message, result in zip(messages, results):
+            if result.get("status", 200) >= 400 or "error" in result:
+                failures.append((message, result.get("error", "")))
+        return failures
+
+    def close(self):
+        """Send the buffered messages and stop the delay timer."""
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,48 @@
+import hashlib
+import json
+import os
+
+cache_dir = os.environ.get('DFA_CACHE_DIR', os.path.join(
+    os.path.expanduser("~"), ".cache", "dfa_lib_python"))
+
+
+def fingerprint(value):
+    """ Return a stable sha256 fingerprint of a json value.
+
+    Args:
+        value: A json serializable value.
+    """
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def load(name):
+    """ Return the content of a json cache file, or an empty dict when it
+        does not exist or cannot be read.
+
+    Args:
+        name (str): Cache file name.
+    """
+    try:
+        with open(os.path.join(cache_dir, name)) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def store(name, value):
+    """ Replace the content of a json cache file atomically. Errors are
+        ignored, a missing cache only costs time.
+
+    Args:
+        name (str): Cache file name.
+        value (dict): Cache content.
+    """
+    path = os.path.join(cache_dir, name)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open("{0}.{1}.tmp".format(path, os.getpid()), "w") as f:
+            json.dump(value, f)
+        os.replace("{0}.{1}.tmp".format(path, os.getpid()), path)
+    except (IOError, OSError):
+        pass
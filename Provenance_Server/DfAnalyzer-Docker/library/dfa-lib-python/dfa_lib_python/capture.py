@@ -0,0 +1,305 @@
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from .attribute import Attribute
+from .attribute_type import AttributeType
+from .batch import DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .capture_policy import CapturePolicy
+from .dataflow import Dataflow, resolve_sets
+from .dataset import DataSet
+from .element import Element
+from .performance import Performance
+from .set import Set
+from .set_type import SetType
+from .task import Task
+from .task_status import TaskStatus
+from .transport import decode_message, encode_message, get_default_transport
+
+SUMMARY_SUFFIX = "_summary"
+
+
+def summary_set(transformation_tag):
+    """ Return the output set of the summary tasks of a transformation
+        captured with :obj:`CapturePolicy.AGGREGATE`, to be added to the
+        transformation before the dataflow is saved.
+
+    Args:
+        - transformation_tag (:obj:`str`): Transformation tag.
+    """
+    return Set(transformation_tag.lower() + SUMMARY_SUFFIX, SetType.OUTPUT, [
+        Attribute("window_start", AttributeType.TEXT),
+        Attribute("window_end", AttributeType.TEXT),
+        Attribute("tasks", AttributeType.NUMERIC),
+        Attribute("elements", AttributeType.NUMERIC),
+        Attribute("histograms", AttributeType.TEXT),
+        Attribute("files", AttributeType.TEXT)])
+
+
+def is_sampled(id, every):
+    """ Return whether the task with an id is one of the 1 in ``every``
+        tasks kept by sampling. The choice only depends on the id, so the
+        messages of a task are all kept or all dropped.
+
+    Args:
+        - id: Task id.
+        - every (:obj:`int`): Sampling period.
+    """
+    return zlib.crc32(str(id).encode("utf-8")) % every == 0
+
+
+def compact_paths(paths):
+    """ Return file paths as {"prefix", "names"}, the names relative to
+        their longest common directory.
+
+    Args:
+        - paths (:obj:`list`): File paths.
+    """
+    if not paths:
+        return {"prefix": "", "names": []}
+    try:
+        prefix = os.path.commonpath([os.path.dirname(x) for x in paths])
+    except ValueError:
+        # absolute and relative paths
+        prefix = ""
+    if not prefix:
+        return {"prefix": "", "names": list(paths)}
+    return {"prefix": prefix,
+            "names": [os.path.relpath(x, prefix) for x in paths]}
+
+
+def _convert_attributes(attributes):
+    return [(x["name"].lower(), x["type"]) for x in attributes]
+
+
+class CaptureRule(object):
+    """
+    This class defines how the tasks of a transformation are captured.
+
+    Attributes:
+        - policy (:obj:`CapturePolicy`, optional): Capture policy.
+        - every (:obj:`int`, optional): Sampling period of
+          :obj:`CapturePolicy.SAMPLE`, 1 in ``every`` tasks is kept.
+        - window (:obj:`float`, optional): Seconds summarized by a task of
+          :obj:`CapturePolicy.AGGREGATE`.
+        - histograms (:obj:`list`, optional): Names of the attributes whose
+          values are counted by :obj:`CapturePolicy.AGGREGATE`, e.g.
+          ["predicted_class"].
+    """
+    def __init__(self, policy=CapturePolicy.RECORD_ALL, every=1,
+                 window=60.0, histograms=()):
+        assert isinstance(policy, CapturePolicy), \
+            "The policy must be an instance of CapturePolicy."
+        assert isinstance(every, int) and every > 0, \
+            "The sampling period must be a positive integer."
+        assert window > 0, "The window must be positive."
+        self.policy = policy
+        self.every = every
+        self.window = window
+        self.histograms = [x.lower() for x in histograms]
+
+
+class _Window(object):
+    """
+    This class defines the tasks of a transformation summarized so far.
+    """
+    def __init__(self, dataflow, transformation):
+        self.dataflow = dataflow
+        self.transformation = transformation
+        self.start = datetime.now()
+        self.ids = set()
+        self.elements = 0
+        self.histograms = {}
+        self.files = {}
+
+    def summary(self):
+        end = datetime.now()
+        histograms = dict((name, dict(sorted(counter.items())))
+                          for name, counter in sorted(self.histograms.items()))
+        task = Task(None, self.dataflow, self.transformation)
+        task.add_dataset(DataSet(self.transformation + SUMMARY_SUFFIX, [
+            Element([self.start.isoformat(), end.isoformat(), len(self.ids),
+                     self.elements,
+                     json.dumps(histograms, separators=(",", ":")),
+                     json.dumps(compact_paths(list(self.files)),
+                                separators=(",", ":"))])]))
+        task.set_status(TaskStatus.FINISHED)
+        task._performances = [Performance(
+            self.start.strftime('%Y-%m-%d %H:%M:%S.%f'),
+            end.strftime('%Y-%m-%d %H:%M:%S.%f')).get_specification()]
+        return task.to_json()
+
+
+class CaptureFilter(object):
+    """
+    This class defines a transport applying a :obj:`CaptureRule` per
+    transformation before the messages reach another transport:
+
+        - :obj:`CapturePolicy.RECORD_ALL` forwards every task.
+        - :obj:`CapturePolicy.SAMPLE` forwards the tasks chosen by
+          :func:`is_sampled` from their id, about 1 in ``every``.
+        - :obj:`CapturePolicy.AGGREGATE` forwards a single summary task per
+          window, with the number of tasks and elements, the histograms of
+          the configured attributes and the paths of the FILE values, in
+          the set returned by :func:`summary_set`.
+
+    FILE attributes are known from the dataflows posted through the filter
+    or given to :meth:`register`. Other messages are forwarded as they are.
+
+    Attributes:
+        - transport (optional): Transport the messages are forwarded to.
+          Defaults to the shared :obj:`HTTPTransport`.
+        - rules (:obj:`dict`, optional): :obj:`CaptureRule` by
+          transformation tag.
+        - default (:obj:`CaptureRule`, optional): Rule of the other
+          transformations.
+    """
+    def __init__(self, transport=None, rules=None, default=None):
+        self._transport = transport
+        self._rules = {}
+        self._default = default or CaptureRule()
+        self._lock = threading.RLock()
+        self._attributes = {}
+        self._windows = {}
+        self._timers = {}
+        # messages not forwarded, and tasks summarized
+        self.dropped = 0
+        self.aggregated = 0
+        for tag, rule in (rules or {}).items():
+            self.set_rule(tag, rule)
+
+    def set_rule(self, transformation_tag, rule):
+        """ Set the rule of a transformation.
+
+        Args:
+            - transformation_tag (:obj:`str`): Transformation tag.
+            - rule (:obj:`CaptureRule`): Capture rule.
+        """
+        assert isinstance(rule, CaptureRule), \
+            "The rule must be a CaptureRule object."
+        self._rules[transformation_tag.lower()] = rule
+
+    def register(self, dataflow):
+        """ Learn the FILE attributes of a dataflow that is not posted
+            through the filter, e.g. because it is already registered.
+
+        Args:
+            - dataflow (:obj:`Dataflow`): The dataflow.
+        """
+        assert isinstance(dataflow, Dataflow), "The dataflow must be valid."
+        with self._lock:
+            self._add_dataflow(dataflow.get_specification())
+
+    def _add_dataflow(self, dataflow):
+        known = [(key[2], value) for key, value in self._attributes.items()
+                 if key[0] == dataflow["tag"]]
+        for dt_tag, set, names in resolve_sets(
+                dataflow, _convert_attributes, known):
+            self._attributes[(dataflow["tag"], dt_tag, set["tag"])] = names
+
+    def _get_transport(self):
+        return self._transport or get_default_transport()
+
+    @property
+    def answers(self):
+        """Get whether post() returns the answer of the server."""
+        return getattr(self._get_transport(), "answers", False)
+
+    def post(self, route, message):
+        """ Apply the capture rules to a message and forward what is kept.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        if route == DATAFLOW_ROUTE:
+            with self._lock:
+                self._add_dataflow(decode_message(message))
+        elif route in (TASK_ROUTE, BATCH_ROUTE) and (
+                self._rules or
+                self._default.policy != CapturePolicy.RECORD_ALL):
+            tasks = decode_message(message)
+            if route == TASK_ROUTE:
+                if not self._keep(tasks):
+                    return None
+            else:
+                kept = [x for x in tasks if self._keep(x)]
+                if not kept:
+                    return None
+                if len(kept) < len(tasks):
+                    message = b"[" + b",".join(
+                        [encode_message(x) for x in kept]) + b"]"
+        return self._get_transport().post(route, message)
+
+    def _keep(self, task):
+        rule = self._rules.get(task["transformation"], self._default)
+        if rule.policy == CapturePolicy.RECORD_ALL:
+            return True
+        if rule.policy == CapturePolicy.SAMPLE:
+            if is_sampled(task["id"], rule.every):
+                return True
+        else:
+            self._aggregate(task, rule)
+        with self._lock:
+            self.dropped += 1
+        return False
+
+    def _aggregate(self, task, rule):
+        dataflow, transformation = task["dataflow"], task["transformation"]
+        key = (dataflow, transformation)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _Window(dataflow,
+                                                      transformation)
+                timer = self._timers[key] = threading.Timer(
+                    rule.window, self._flush, (key,))
+                timer.daemon = True
+                timer.start()
+            window.ids.add(task["id"])
+            for set in task.get("sets", []):
+                attributes = self._attributes.get(
+                    (dataflow, transformation, set["tag"]), [])
+                for values in set.get("elements", []):
+                    window.elements += 1
+                    if not isinstance(values, list):
+                        values = [values]
+                    for (name, type), value in zip(attributes, values):
+                        if type == AttributeType.FILE.value:
+                            window.files[str(value)] = None
+                        if name in rule.histograms:
+                            window.histograms.setdefault(
+                                name, Counter())[str(value)] += 1
+
+    def _flush(self, key):
+        with self._lock:
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            window = self._windows.pop(key, None)
+            if window is None:
+                return None
+            self.aggregated += len(window.ids)
+            summary = window.summary()
+        # the tasks of the next window are not held up by the request
+        return self._get_transport().post(TASK_ROUTE, summary)
+
+    def flush(self):
+        """Send the summary tasks of the open windows."""
+        with self._lock:
+            keys = list(self._windows)
+        for key in keys:
+            self._flush(key)
+
+    def close(self):
+        """Send the summary tasks of the open windows."""
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
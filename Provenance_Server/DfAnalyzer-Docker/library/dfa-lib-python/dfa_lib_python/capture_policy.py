@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class CapturePolicy(Enum):
+    """ This class is a enum with all the possibles ways the tasks of a
+        transformation are captured.
+    """
+    RECORD_ALL = 'RECORD_ALL'
+    SAMPLE = 'SAMPLE'
+    AGGREGATE = 'AGGREGATE'
@@ -1,9 +1,134 @@
-import requests
 import os
+from . import cache
 from .ProvenanceObject import ProvenanceObject
+from .batch import DATAFLOW_ROUTE
+from .hashing import watch_dataflow
 from .transformation import Transformation
+from .transport import get_default_transport
 
 dfa_url = os.environ.get('DFA_URL', "http://localhost:22000/")
+CACHE_FILE = "dataflows.json"
+
+
+def _schema(specification):
+    """ Return the fingerprint of every set by transformation tag."""
+    return dict((x["tag"], dict((y["tag"], cache.fingerprint(y))
+                                for y in x.get("sets", [])))
+                for x in specification.get("transformations", []))
+
+
+def _delta(specification, schema):
+    """ Return the specification of the transformations and sets missing
+        from a registered schema, or None when the change is not additive.
+    """
+    transformations = []
+    for transformation in specification.get("transformations", []):
+        known = schema.get(transformation["tag"])
+        if known is None:
+            transformations.append(transformation)
+            continue
+        sets = []
+        for set in transformation.get("sets", []):
+            if set["tag"] not in known:
+                sets.append(set)
+            elif known[set["tag"]] != cache.fingerprint(set):
+                return None
+        if sets:
+            transformations.append({"tag": transformation["tag"],
+                                    "sets": sets})
+    if not transformations:
+        return None
+    return {"tag": specification["tag"], "delta": True,
+            "transformations": transformations}
+
+
+def resolve_sets(specification, convert, known=()):
+    """ Return the sets of a dataflow specification as (transformation
+        tag, set, attributes) triples. Sets with a dependency are declared
+        without attributes and take the attributes of the set with the
+        same tag, in the specification or else in ``known``.
+
+    Args:
+        - specification (:obj:`dict`): Dataflow json specification.
+        - convert: Callable returning the attributes of a set, from their
+          json specification, in the form kept by the caller.
+        - known (optional): (set tag, attributes) pairs of the sets of the
+          dataflow that are already known, in the form kept by the caller.
+    """
+    attributes = {}
+    for transformation in specification.get("transformations", []):
+        for set in transformation.get("sets", []):
+            if set.get("attributes") and set["tag"] not in attributes:
+                attributes[set["tag"]] = convert(set["attributes"])
+    for tag, value in known:
+        if value and tag not in attributes:
+            attributes[tag] = value
+    sets = []
+    for transformation in specification.get("transformations", []):
+        for set in transformation.get("sets", []):
+            value = convert(set["attributes"]) if set.get("attributes") \
+                else attributes.get(set["tag"], [])
+            sets.append((transformation["tag"], set, value))
+    return sets
+
+
+class _Registration(object):
+    """
+    This class defines the registration of a dataflow specification with
+    the registration cache. A cached registration is only trusted once the
+    server answers that it still stores the dataflow, and a registration is
+    only cached once the server confirmed it.
+
+    Attributes:
+        - key (:obj:`str`): Cache key, or None without the cache.
+        - specification (:obj:`dict`): Dataflow specification.
+        - route (:obj:`str`): Route answering whether the server stores
+          the dataflow.
+    """
+    def __init__(self, key, specification, route):
+        self.key = key
+        self.specification = specification
+        self.route = route
+        self.delta = None
+        self.skip = False
+        self._registered = cache.load(CACHE_FILE) if key is not None else {}
+        self._fingerprint = cache.fingerprint(specification)
+        self.entry = self._registered.get(key) if key is not None else None
+
+    def check(self, status_code, answer):
+        """ Use the answer of the server about the dataflow, from
+            '/pde/dataflow/{tag}'. Deltas are only sent to servers that
+            announce them.
+
+        Args:
+            - status_code (:obj:`int`): Status code, or None.
+            - answer (:obj:`dict`): Json answer, or None.
+        """
+        if status_code != 200:
+            # unknown to the server, e.g. after a database reset
+            self.entry = None
+            return
+        if self.entry["fingerprint"] == self._fingerprint:
+            self.skip = True
+        elif (answer or {}).get("delta"):
+            self.delta = _delta(self.specification, self.entry["schema"])
+
+    def done(self, status_code):
+        """ Record the result of the registration.
+
+        Args:
+            - status_code (:obj:`int`): Status code, or None when the
+              delivery was deferred.
+        """
+        if self.key is None:
+            return
+        if status_code is not None and 200 <= status_code < 300:
+            self._registered[self.key] = {
+                "fingerprint": self._fingerprint,
+                "schema": _schema(self.specification)}
+        elif self._registered.pop(self.key, None) is None:
+            return
+        cache.store(CACHE_FILE, self._registered)
 
 
 class Dataflow(ProvenanceObject):
@@ -13,10 +138,19 @@ class Dataflow(ProvenanceObject):
     Attributes:
         - tag (str): Dataflow tag.
         - transformations (list, optional): Dataflow transformations.
+        - transport (optional): Transport used to send the Dataflow. Defaults
+          to the shared :obj:`HTTPTransport`.
+        - cache (bool, optional): Skip the registration when the same
+          specification was already registered, and send only the new
+          transformations and sets when it grows. The server is asked
+          whether it still stores the dataflow first, so the cache needs
+          a transport with a ``get`` method, e.g. :obj:`HTTPTransport`.
     """
-    def __init__(self, tag, transformations=[]):
+    def __init__(self, tag, transformations=[], transport=None, cache=False):
         ProvenanceObject.__init__(self, tag)
         self.transformations = transformations
+        self.transport = transport
+        self.cache = cache
 
     @property
     def transformations(self):
@@ -48,6 +182,40 @@ class Dataflow(ProvenanceObject):
         """ Send a post request to the Dataflow Analyzer API to store
             the dataflow.
         """
-        url = dfa_url + '/pde/dataflow/json'
-        r = requests.post(url, json=self.get_specification())      
-        print(r.status_code)
+        transport = self.transport or get_default_transport()
+        registration = self._registration(transport)
+        watch_dataflow(registration.specification)
+        get = getattr(transport, "get", None)
+        if registration.entry is not None and get is not None:
+            r = get(registration.route)
+            registration.check(r.status_code, r.json()
+                               if r.status_code == 200 else None)
+        elif registration.entry is not None:
+            # a transport that does not answer cannot confirm it
+            registration.check(None, None)
+        if registration.skip:
+            return None
+        r = None
+        if registration.delta is not None:
+            r = self._post(transport, registration.delta)
+        if registration.delta is None or (r is not None and
+                                          r.status_code == 409):
+            # the server does not know the dataflow, register it again
+            r = self._post(transport, registration.specification)
+        registration.done(None if r is None else r.status_code)
+        return r
+
+    def _registration(self, transport):
+        """Return the :obj:`_Registration` of the specification."""
+        key = None
+        if self.cache:
+            key = "{0}|{1}".format(
+                getattr(transport, "url", None) or dfa_url, self._tag)
+        return _Registration(key, self.get_specification(),
+                             '/pde/dataflow/' + self._tag)
+
+    def _post(self, transport, specification):
+        r = transport.post(DATAFLOW_ROUTE, specification)
+        if r is not None:
+            print(r.status_code)
+        return r
@@ -1,5 +1,36 @@
-from .ProvenanceObject import ProvenanceObject
+from math import isfinite
+from json.encoder import encode_basestring_ascii
+from .ProvenanceObject import ProvenanceObject, _encoder, encode_row
+from .attribute_type import AttributeType
 from .element import Element
+from .set import Set
+
+
+def _column_values(column, numeric):
+    """ Return a column as a list of json values, NUMERIC columns keep
+        their native type, with null for NaN and infinity, and the other
+        columns are converted to str.
+    """
+    if hasattr(column, "tolist"):
+        if not numeric and hasattr(column, "astype"):
+            return column.astype(str).tolist()
+        column = column.tolist()
+    if numeric:
+        return [None if isinstance(x, float) and not isfinite(x) else x
+                for x in column]
+    return [x if isinstance(x, str) else str(x) for x in column]
+
+
+def encode_dataset(tag, elements):
+    """ Encode a dataset as json bytes.
+
+    Args:
+        - tag (:obj:`str`): Dataset tag.
+        - elements (:obj:`str`): The json arrays of the elements, joined by
+          commas.
+    """
+    return ('{"tag":' + encode_basestring_ascii(tag) +
+            ',"elements":[' + elements + ']}').encode("ascii")
 
 
 class DataSet(ProvenanceObject):
@@ -10,14 +41,65 @@ class DataSet(ProvenanceObject):
         - tag (str): Dataset tag.
         - elements (:obj:`Element`): Dataset Elements
     """
+    __slots__ = ("_elements", "columns", "cached_json")
 
     def __init__(self, tag, elements):
         ProvenanceObject.__init__(self, tag)
         self.elements = elements
 
+    @classmethod
+    def from_columns(cls, set, columns):
+        """ Build a dataset from column arrays, without creating one
+            :obj:`Element` per row. Columns can be lists, iterables or
+            NumPy arrays, and values of NUMERIC attributes keep their
+            native type.
+
+        Args:
+            - set (:obj:`Set`): The set whose attributes describe the columns.
+            - columns (:obj:`dict` or :obj:`list`): Columns by attribute
+              name, or a list of columns in the order of the attributes.
+        """
+        assert isinstance(set, Set), "The set must be valid."
+        attributes = set.attributes
+        if isinstance(columns, dict):
+            by_name = dict((str(name).lower(), column)
+                           for name, column in columns.items())
+            assert len(by_name) == len(attributes), \
+                "The columns must match the set attributes."
+            try:
+                columns = [by_name[x["name"].lower()] for x in attributes]
+            except KeyError as e:
+                raise AssertionError(
+                    "The column {0} is missing.".format(e.args[0]))
+        assert isinstance(columns, (list, tuple)) and \
+            len(columns) == len(attributes), \
+            "The columns must match the set attributes."
+        values = [_column_values(column, x["type"] ==
+                                 AttributeType.NUMERIC.value)
+                  for column, x in zip(columns, attributes)]
+        assert len(frozenset(len(x) for x in values)) <= 1, \
+            "The columns must have the same length."
+        dataset = cls(set._tag, [])
+        dataset.columns = values
+        return dataset
+
+    @classmethod
+    def from_dataframe(cls, set, frame):
+        """ Build a dataset from a pandas DataFrame, matching its columns
+            to the set attributes by name.
+
+        Args:
+            - set (:obj:`Set`): The set whose attributes describe the columns.
+            - frame (:obj:`pandas.DataFrame`): The dataset rows.
+        """
+        return cls.from_columns(set, dict((name, frame[name].to_numpy())
+                                          for name in frame.columns))
+
     @property
     def elements(self):
         """Get or set elements."""
+        if self.columns is not None:
+            return [list(x) for x in zip(*self.columns)]
         return self._elements
 
     @elements.setter
@@ -29,3 +111,29 @@ class DataSet(ProvenanceObject):
             assert isinstance(element, Element), "The element must be valid."
             result.append(element.values)
         self._elements = result
+        self.columns = None
+        self.cached_json = None
+
+    def get_specification(self, prefix="_"):
+        """ Get the provenance json representation.
+
+        Args:
+            prefix (str): A prefix used to define which variables should be
+                used.
+        """
+        json = ProvenanceObject.get_specification(self, prefix)
+        if self.columns is not None and prefix == "_":
+            json["elements"] = self.elements
+        return json
+
+    def to_json(self):
+        """ Get the dataset json representation as bytes. It is encoded
+            once, so a dataset added to many tasks costs a single encoding.
+        """
+        if self.cached_json is None:
+            if self.columns is not None:
+                elements = _encoder.encode(list(zip(*self.columns)))[1:-1]
+            else:
+                elements = ",".join([encode_row(x) for x in self._elements])
+            self.cached_json = encode_dataset(self._tag, elements)
+        return self.cached_json
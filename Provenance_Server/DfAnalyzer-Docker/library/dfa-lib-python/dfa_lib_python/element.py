@@ -5,6 +5,7 @@ class Element(object):
     Attributes:
         - values (list): Element values.
     """
+    __slots__ = ("_values",)
 
     def __init__(self, values):
         self.values = values
@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class FsyncPolicy(Enum):
+    """ This class is a enum with all the possibles moments a spool forces
+        its records to disk.
+    """
+    ALWAYS = 'ALWAYS'
+    INTERVAL = 'INTERVAL'
+    NEVER = 'NEVER'
@@ -0,0 +1,354 @@
+import atexit
+import hashlib
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from . import cache
+from .attribute import Attribute
+from .attribute_type import AttributeType
+from .dataset import DataSet
+from .element import Element
+from .set import Set
+
+CACHE_FILE = "file_digests.json"
+HASH_SUFFIX = "_hash"
+_hashers = {}
+_watched = {}
+_lock = threading.Lock()
+
+
+def digest(path, algorithm="sha256", chunk_size=1024 * 1024):
+    """ Return the hex digest of a file, without the cache. Files larger
+        than a chunk are memory-mapped, so no chunk is copied and threads
+        hash in parallel.
+
+    Args:
+        - path (:obj:`str`): File path.
+        - algorithm (:obj:`str`, optional): A :mod:`hashlib` algorithm name.
+        - chunk_size (:obj:`int`, optional): Bytes hashed at a time.
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= chunk_size:
+            digest.update(f.read())
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with memoryview(data) as view:
+                for offset in range(0, len(view), chunk_size):
+                    digest.update(view[offset:offset + chunk_size])
+    return digest.hexdigest()
+
+
+class FileHasher(object):
+    """
+    This class defines a cache of file digests computed on a thread pool.
+    Digests are keyed by (device, inode) and kept while the size and the
+    modification time do not change, so an unchanged file is hashed only
+    once, even when it is reached through another path. A file is hashed
+    once at a time, and the cache is written to disk at most every
+    ``store_interval`` seconds and at exit.
+
+    Attributes:
+        - algorithm (:obj:`str`, optional): A :mod:`hashlib` algorithm name.
+        - max_workers (:obj:`int`, optional): Files hashed at a time,
+          defaults to the number of cores.
+        - chunk_size (:obj:`int`, optional): Bytes hashed at a time.
+        - store_interval (:obj:`float`, optional): Seconds between writes
+          of the cache.
+    """
+    def __init__(self, algorithm="sha256", max_workers=None,
+                 chunk_size=1024 * 1024, store_interval=5.0):
+        hashlib.new(algorithm)
+        self._algorithm = algorithm
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._chunk_size = chunk_size
+        self._store_interval = store_interval
+        self._lock = threading.Lock()
+        self._pool = None
+        self._running = {}
+        self._entries = None
+        self._dirty = False
+        self._stored = time.monotonic()
+        atexit.register(self.flush)
+
+    @property
+    def algorithm(self):
+        """Get the hashlib algorithm name."""
+        return self._algorithm
+
+    def _get_entries(self):
+        if self._entries is None:
+            self._entries = cache.load(CACHE_FILE)
+        return self._entries
+
+    def _key(self, stat):
+        return "{0}:{1}:{2}".format(self._algorithm, stat.st_dev,
+                                    stat.st_ino)
+
+    def submit(self, path):
+        """ Return a :obj:`concurrent.futures.Future` of the hex digest of
+            a file. It is already done when the file is in the cache.
+
+        Args:
+            - path (:obj:`str`): File path.
+        """
+        stat = os.stat(path)
+        key = self._key(stat)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        with self._lock:
+            entry = self._get_entries().get(key)
+            if entry is not None and entry[:2] == signature:
+                future = Future()
+                future.set_result(entry[2])
+                return future
+            future = self._running.get(key)
+            if future is not None:
+                return future
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self._max_workers,
+                    thread_name_prefix="dfa-file-hasher")
+            future = self._running[key] = self._pool.submit(
+                self._hash, path, key, signature)
+            return future
+
+    def _hash(self, path, key, signature):
+        try:
+            value = digest(path, self._algorithm, self._chunk_size)
+            stat = os.stat(path)
+        finally:
+            with self._lock:
+                self._running.pop(key, None)
+        # a file changed while it was read is hashed again next time
+        if [stat.st_size, stat.st_mtime_ns] == signature:
+            with self._lock:
+                self._get_entries()[key] = signature + [value]
+                self._dirty = True
+                store = time.monotonic() - self._stored >= \
+                    self._store_interval
+            if store:
+                self.flush()
+        return value
+
+    def file_hash(self, path):
+        """ Return the hex digest of a file.
+
+        Args:
+            - path (:obj:`str`): File path.
+        """
+        return self.submit(path).result()
+
+    def dataset(self, set, elements):
+        """ Build a dataset of a set declared with :func:`hash_attributes`.
+            Elements hold the values of the other attributes, and the
+            digest of every FILE value is added to the hash attribute that
+            follows it. Digests are computed on the thread pool and only
+            waited for when the dataset is encoded. The digest of a file
+            that cannot be read is empty.
+
+        Args:
+            - set (:obj:`Set`): The set.
+            - elements (:obj:`list`): :obj:`Element` objects or lists of
+              values.
+        """
+        assert isinstance(set, Set), "The set must be valid."
+        hashed = hash_positions(set.attributes)
+        assert hashed, "The set has no hash attributes."
+        return self._dataset(set._tag, set.attributes, hashed, elements)
+
+    def _dataset(self, tag, attributes, hashed, elements):
+        rows = []
+        for element in elements:
+            if isinstance(element, Element):
+                element = element.values
+            assert isinstance(element, list) and \
+                len(element) == len(attributes) - len(hashed), \
+                "The element must have a value per attribute, " \
+                "without the hash attributes."
+            row = []
+            for value in element:
+                value = str(value)
+                hash = len(row) in hashed
+                row.append(value)
+                if hash:
+                    try:
+                        row.append(self.submit(value))
+                    except OSError:
+                        row.append("")
+            rows.append(row)
+        return _HashedDataSet.from_rows(tag, rows)
+
+    def flush(self):
+        """ Write the cache to disk, if it changed. Digests stored by other
+            processes meanwhile are kept.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = dict(self._entries)
+            self._dirty = False
+            self._stored = time.monotonic()
+        stored = cache.load(CACHE_FILE)
+        stored.update(entries)
+        cache.store(CACHE_FILE, stored)
+
+    def close(self):
+        """Wait for the running digests and write the cache to disk."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        self.flush()
+        atexit.unregister(self.flush)
+
+
+class _HashedDataSet(DataSet):
+    """
+    This class defines a dataset whose hash values are resolved when it
+    is encoded.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_rows(cls, tag, rows):
+        dataset = cls(tag, [])
+        dataset._elements = rows
+        return dataset
+
+    def _resolve(self):
+        for row in self._elements:
+            for position, value in enumerate(row):
+                if isinstance(value, Future):
+                    try:
+                        row[position] = value.result()
+                    except OSError:
+                        row[position] = ""
+
+    @property
+    def elements(self):
+        """Get or set elements."""
+        self._resolve()
+        return self._elements
+
+    @elements.setter
+    def elements(self, elements):
+        DataSet.elements.fset(self, elements)
+
+    def get_specification(self, prefix="_"):
+        self._resolve()
+        return DataSet.get_specification(self, prefix)
+
+    def to_json(self):
+        self._resolve()
+        return DataSet.to_json(self)
+
+
+def hash_attributes(attributes):
+    """ Return the attributes of a set with a TEXT attribute named
+        '<name>_hash' after every FILE attribute, to hold the digest of
+        the file.
+
+    Args:
+        - attributes (:obj:`list`): :obj:`Attribute` objects.
+    """
+    result = []
+    for attribute in attributes:
+        result.append(attribute)
+        if attribute.type == AttributeType.FILE.value:
+            result.append(Attribute(attribute.name + HASH_SUFFIX,
+                                    AttributeType.TEXT))
+    return result
+
+
+def hash_positions(attributes):
+    """ Return the positions of the FILE attributes of a set followed by
+        their hash attribute.
+
+    Args:
+        - attributes (:obj:`list`): Attribute specifications of the set.
+    """
+    return [position for position, x in enumerate(attributes[:-1])
+            if x["type"] == AttributeType.FILE.value and
+            attributes[position + 1]["name"] == x["name"] + HASH_SUFFIX]
+
+
+def get_hasher(algorithm="sha256"):
+    """ Return the process-wide :obj:`FileHasher` of an algorithm.
+
+    Args:
+        - algorithm (:obj:`str`, optional): A :mod:`hashlib` algorithm name.
+    """
+    hasher = _hashers.get(algorithm)
+    if hasher is None:
+        with _lock:
+            hasher = _hashers.get(algorithm)
+            if hasher is None:
+                hasher = _hashers[algorithm] = FileHasher(algorithm)
+    return hasher
+
+
+def file_hash(path, algorithm="sha256"):
+    """ Return the hex digest of a file, cached by the process-wide
+        :obj:`FileHasher` of the algorithm.
+
+    Args:
+        - path (:obj:`str`): File path.
+        - algorithm (:obj:`str`, optional): A :mod:`hashlib` algorithm name.
+    """
+    return get_hasher(algorithm).file_hash(path)
+
+
+def watch(dataflow_tag, set):
+    """ Hash the FILE values of the datasets of a set declared with
+        :func:`hash_attributes` when they are added to a task of the
+        dataflow. :meth:`Dataflow.save` and :meth:`AsyncDataflow.save`
+        watch the sets of the dataflow, so this is only needed where tasks
+        are recorded by a process that does not save the dataflow.
+
+    Args:
+        - dataflow_tag (:obj:`str`): Dataflow tag.
+        - set (:obj:`Set`): The set.
+    """
+    assert isinstance(set, Set), "The set must be valid."
+    assert hash_positions(set.attributes), "The set has no hash attributes."
+    _watched[(dataflow_tag.lower(), set._tag)] = set.attributes
+
+
+def watch_dataflow(specification):
+    """ Watch the sets declared with :func:`hash_attributes` of a dataflow.
+
+    Args:
+        - specification (:obj:`dict`): Dataflow specification.
+    """
+    for transformation in specification.get("transformations", []):
+        for set in transformation.get("sets", []):
+            attributes = set.get("attributes", [])
+            if hash_positions(attributes):
+                _watched[(specification["tag"], set["tag"])] = attributes
+
+
+def hashed_dataset(dataflow_tag, dataset):
+    """ Return the dataset with the digests of its FILE values added, if
+        its set is watched and its elements leave out the hash attributes.
+        Otherwise return the dataset itself.
+
+    Args:
+        - dataflow_tag (:obj:`str`): Dataflow tag, in lower case.
+        - dataset (:obj:`DataSet`): The dataset.
+    """
+    if not _watched or isinstance(dataset, _HashedDataSet):
+        return dataset
+    attributes = _watched.get((dataflow_tag, dataset._tag))
+    if attributes is None:
+        return dataset
+    hashed = hash_positions(attributes)
+    elements = dataset.elements
+    if not elements or any(len(x) != len(attributes) - len(hashed)
+                           for x in elements):
+        # the digests are already there
+        return dataset
+    return get_hasher()._dataset(dataset._tag, attributes, hashed,
+                                 [list(x) for x in elements])
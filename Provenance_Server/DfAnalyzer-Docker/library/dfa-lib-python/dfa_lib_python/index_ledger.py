@@ -0,0 +1,201 @@
+import fnmatch
+import os
+import sqlite3
+import threading
+import time
+from .hashing import digest
+from .rde_batch import RDEBatch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    tag TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    indexed_at REAL NOT NULL,
+    PRIMARY KEY (tag, path)
+) WITHOUT ROWID;
+"""
+
+
+class IndexLedger(object):
+    """
+    This class defines a ledger of the files indexed by every extractor,
+    with their (path, size, mtime, content hash). A file whose size and
+    mtime did not change is not read again; a file whose mtime changed is
+    hashed and only counts as changed if its content did.
+
+    Attributes:
+        - path (:obj:`str`): Ledger database file.
+        - algorithm (:obj:`str`, optional): A :mod:`hashlib` algorithm name.
+    """
+    def __init__(self, path, algorithm="sha256"):
+        self._path = path
+        self._algorithm = algorithm
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(SCHEMA)
+        self._entries = {}
+        for tag, path, size, mtime_ns, hash in self._connection.execute(
+                "SELECT tag, path, size, mtime_ns, hash FROM ledger"):
+            self._entries[(tag, path)] = (size, mtime_ns, hash)
+
+    @property
+    def path(self):
+        """Get the ledger database file."""
+        return self._path
+
+    def __len__(self):
+        return len(self._entries)
+
+    def changes(self, tag, paths):
+        """ Return the (path, size, mtime_ns, hash) of the files that are
+            new or changed since they were indexed by an extractor. Files
+            only touched are updated in the ledger.
+
+        Args:
+            - tag (:obj:`str`): Extractor tag.
+            - paths (:obj:`list`): File paths.
+        """
+        changed = []
+        touched = []
+        for path in paths:
+            path = os.path.abspath(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = self._entries.get((tag, path))
+            if entry is not None and entry[:2] == \
+                    (stat.st_size, stat.st_mtime_ns):
+                continue
+            hash = digest(path, self._algorithm)
+            if entry is not None and entry[2] == hash:
+                touched.append((tag, path, stat.st_size, stat.st_mtime_ns,
+                                hash))
+                continue
+            changed.append((path, stat.st_size, stat.st_mtime_ns, hash))
+        if touched:
+            self._store(touched)
+        return changed
+
+    def record(self, tag, changes):
+        """ Record files as indexed by an extractor.
+
+        Args:
+            - tag (:obj:`str`): Extractor tag.
+            - changes (:obj:`list`): (path, size, mtime_ns, hash) tuples as
+              returned by :meth:`changes`.
+        """
+        self._store([(tag,) + tuple(x) for x in changes])
+
+    def _store(self, rows):
+        now = time.time()
+        with self._lock:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO ledger VALUES (?, ?, ?, ?, ?, ?)",
+                    [x + (now,) for x in rows])
+            for tag, path, size, mtime_ns, hash in rows:
+                self._entries[(tag, path)] = (size, mtime_ns, hash)
+
+    def forget(self, tag, path):
+        """ Remove a file from the ledger, so it is indexed again.
+
+        Args:
+            - tag (:obj:`str`): Extractor tag.
+            - path (:obj:`str`): File path.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM ledger WHERE tag = ? AND path = ?",
+                    (tag, path))
+            self._entries.pop((tag, path), None)
+
+    def close(self):
+        """Close the ledger."""
+        self._connection.close()
+
+
+class IncrementalIndexer(object):
+    """
+    This class defines an incremental mode of a :obj:`RawDataIndexer`: only
+    the files that are new or changed since the last run are indexed, in
+    parallel with an :obj:`RDEBatch`, and recorded in an
+    :obj:`IndexLedger` when RDE succeeds. Files that failed are indexed
+    again on the next run.
+
+    Attributes:
+        - indexer (:obj:`RawDataIndexer`): The indexer to run per file.
+        - ledger (:obj:`IndexLedger`): The ledger of indexed files.
+        - pattern (:obj:`str`, optional): Pattern of the file names to index.
+        - settle (:obj:`float`, optional): Seconds a file must be left
+          unmodified before it is indexed, so files still being written
+          are skipped.
+        - task (:obj:`Task`, optional): Task the runs are recorded in.
+        - max_workers (:obj:`int`, optional): RDE processes run at a time.
+    """
+    def __init__(self, indexer, ledger, pattern="*", settle=1.0, task=None,
+                 max_workers=None):
+        assert isinstance(ledger, IndexLedger), \
+            "The ledger must be an IndexLedger object."
+        self.indexer = indexer
+        self.ledger = ledger
+        self._pattern = pattern
+        self._settle = settle
+        self._batch = RDEBatch(task=task, max_workers=max_workers)
+        self._stopped = threading.Event()
+
+    def _scan(self, directory):
+        now = time.time()
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(fnmatch.filter(files, self._pattern)):
+                path = os.path.join(root, name)
+                try:
+                    if now - os.path.getmtime(path) < self._settle:
+                        continue
+                except OSError:
+                    continue
+                yield path
+
+    def run(self, directory):
+        """ Index the new or changed files of a directory tree and return
+            the :obj:`RDEResult` of every run.
+
+        Args:
+            - directory (:obj:`str`): Directory with the extracted data files.
+        """
+        tag = self.indexer.tag
+        changes = self.ledger.changes(tag, self._scan(directory))
+        for path, size, mtime_ns, hash in changes:
+            self._batch.add(self.indexer, path)
+        results = self._batch.run()
+        self.ledger.record(tag, [change for change, result
+                                 in zip(changes, results) if result.ok])
+        return results
+
+    def watch(self, directory, poll_interval=1.0, on_results=None):
+        """ Index the files of a directory tree as they land, until
+            :meth:`stop` is called.
+
+        Args:
+            - directory (:obj:`str`): Directory with the extracted data files.
+            - poll_interval (:obj:`float`, optional): Seconds between scans.
+            - on_results (optional): Callable receiving the results of every
+              scan that indexed files.
+        """
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            results = self.run(directory)
+            if results and on_results is not None:
+                on_results(results)
+            self._stopped.wait(poll_interval)
+
+    def stop(self):
+        """Stop watching."""
+        self._stopped.set()
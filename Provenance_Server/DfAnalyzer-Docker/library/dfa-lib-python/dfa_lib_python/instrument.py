@@ -0,0 +1,358 @@
+import functools
+import inspect
+import itertools
+import os
+import threading
+import time
+from .dataflow import Dataflow
+from .dataset import DataSet
+from .element import Element
+from .hashing import get_hasher, hash_positions
+from .method_type import MethodType
+from .set import Set
+from .set_type import SetType
+from .task import Task
+
+_enabled = os.environ.get("DFA_PROVENANCE", "1").lower() not in \
+    ("0", "false", "off", "no")
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def enable():
+    """Capture the tasks of instrumented functions and blocks."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """ Run instrumented functions and blocks without capturing their
+        tasks. Capture is also disabled by DFA_PROVENANCE=0.
+    """
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    """Return whether the tasks of instrumented code are captured."""
+    return _enabled
+
+
+def next_id(dataflow_tag, transformation_tag):
+    """ Return the next task id of a transformation in this process,
+        starting at 1.
+
+    Args:
+        - dataflow_tag (:obj:`str`): Dataflow tag.
+        - transformation_tag (:obj:`str`): Transformation tag.
+    """
+    key = (dataflow_tag, transformation_tag)
+    counter = _counters.get(key)
+    if counter is None:
+        with _counters_lock:
+            counter = _counters.setdefault(key, itertools.count(1))
+    return next(counter)
+
+
+class _Layout(object):
+    """
+    This class defines the attributes of a set that receive values, the
+    hash attributes excluded.
+    """
+    __slots__ = ("set", "tag", "names", "hashed")
+
+    def __init__(self, set):
+        assert isinstance(set, Set), "The set must be valid."
+        attributes = set.attributes
+        positions = hash_positions(attributes)
+        hashes = frozenset(x + 1 for x in positions)
+        self.set = set
+        self.tag = set._tag
+        self.names = [x["name"].lower() for position, x
+                      in enumerate(attributes) if position not in hashes]
+        self.hashed = bool(positions)
+
+    def dataset(self, rows):
+        if self.hashed:
+            return get_hasher().dataset(self.set, rows)
+        return DataSet(self.tag, [Element(x) for x in rows])
+
+
+class TaskScope(object):
+    """
+    This class defines the capture of one task of an instrumented function
+    or block. The RUNNING task is saved when the block starts; values are
+    only kept until the block exits, and the datasets are built then and
+    sent with the end of the task.
+
+    Attributes:
+        - owner (:obj:`ProvenanceTask`): The instrumentation.
+        - task (:obj:`Task`): The captured task.
+    """
+    def __init__(self, owner, task):
+        self.owner = owner
+        self.task = task
+        self._rows = {}
+        self._start = None
+        self._clock = None
+
+    def _add(self, layouts, values):
+        values = dict((name.lower(), value) for name, value in values.items())
+        for layout in layouts:
+            present = [name in values for name in layout.names]
+            if not any(present):
+                continue
+            assert all(present), "The set {0} requires the values {1}." \
+                .format(layout.tag, ", ".join(layout.names))
+            self._rows.setdefault(layout.tag, (layout, []))[1].append(
+                [values[name] for name in layout.names])
+
+    def inputs(self, **values):
+        """ Add an element to every input set whose attributes are all
+            given, by attribute name.
+        """
+        self._add(self.owner._inputs, values)
+
+    def outputs(self, **values):
+        """ Add an element to every output set whose attributes are all
+            given, by attribute name.
+        """
+        self._add(self.owner._outputs, values)
+
+    def add(self, tag, values):
+        """ Add an element to a set.
+
+        Args:
+            - tag (:obj:`str`): Set tag.
+            - values (:obj:`list` or :obj:`dict`): Element values, in the
+              order of the attributes or by attribute name.
+        """
+        tag = tag.lower()
+        layout = self.owner._layouts.get(tag)
+        assert layout is not None, \
+            "The set {0} is not declared.".format(tag)
+        if isinstance(values, dict):
+            values = dict((k.lower(), v) for k, v in values.items())
+            values = [values[name] for name in layout.names]
+        assert len(values) == len(layout.names), \
+            "The set {0} requires the values {1}.".format(
+                tag, ", ".join(layout.names))
+        self._rows.setdefault(tag, (layout, []))[1].append(list(values))
+
+    def _begin(self):
+        try:
+            if self.owner._context:
+                from .run_context import get_run_context
+                get_run_context().attach(self.task)
+            self.task.begin()
+        except Exception as e:
+            # the capture never changes the outcome of the code
+            self.owner._failure(e)
+        self._start = time.time_ns()
+        self._clock = time.perf_counter_ns()
+
+    def _end(self, error=None):
+        self.task.add_span(MethodType.COMPUTATION, self._start,
+                           time.perf_counter_ns() - self._clock)
+        if error is not None:
+            self.task._error = "{0}: {1}".format(type(error).__name__, error)
+        try:
+            for layout, rows in self._rows.values():
+                self.task.add_dataset(layout.dataset(rows))
+            self._rows = {}
+            self.task.end()
+        except Exception as e:
+            self.owner._failure(e)
+
+
+class _NullScope(object):
+    """
+    This class defines the scope of a block run while capture is disabled.
+    """
+    task = None
+
+    def inputs(self, **values):
+        pass
+
+    def outputs(self, **values):
+        pass
+
+    def add(self, tag, values):
+        pass
+
+
+_null_scope = _NullScope()
+
+
+class ProvenanceTask(object):
+    """
+    This class defines the instrumentation of a transformation. Used as a
+    decorator, every call of the function is captured as a task: the
+    arguments named as the attributes of the input sets are their values,
+    and the return value gives the values of the output sets. Used as a
+    context manager, the block is captured as a task and the values are
+    given to the :obj:`TaskScope` it returns. Task ids are given by
+    ``ids``, or by ``Task.ids``, unique across processes and hosts.
+
+    While capture is disabled (see :func:`disable`), the function or the
+    block runs without building anything. A task that cannot be saved
+    (e.g. the server is unreachable) neither stops the function nor hides
+    its result or exception; it is counted in ``failed`` and the exception
+    is kept in ``last_error``.
+
+    Attributes:
+        - transformation (:obj:`str`): Transformation tag.
+        - dataflow (:obj:`str` or :obj:`Dataflow`): The dataflow.
+        - inputs (:obj:`list`, optional): Input :obj:`Set` objects.
+        - outputs (:obj:`list`, optional): Output :obj:`Set` objects.
+        - arguments (:obj:`dict`, optional): Argument name of attributes
+          whose name is not an argument name, e.g. {"frame_path": "path"}.
+        - ids (optional): Callable returning the id of a new task, e.g.
+          ``functools.partial(next_id, dataflow, transformation)`` to
+          number the tasks of the transformation in this process.
+        - transport (optional): Transport used to send the tasks.
+        - context (:obj:`bool`, optional): Reference the :obj:`RunContext`
+          of the process from every task.
+    """
+    def __init__(self, transformation, dataflow, inputs=(), outputs=(),
+                 arguments=None, ids=None, transport=None, context=False):
+        self.transformation = transformation.lower()
+        self.dataflow = dataflow._tag if isinstance(dataflow, Dataflow) \
+            else dataflow.lower()
+        self._inputs = [_Layout(x) for x in inputs]
+        self._outputs = [_Layout(x) for x in outputs]
+        assert all(x.set.type == SetType.INPUT.value for x in self._inputs), \
+            "The input sets must be of type INPUT."
+        assert all(x.set.type == SetType.OUTPUT.value
+                   for x in self._outputs), \
+            "The output sets must be of type OUTPUT."
+        self._layouts = dict((x.tag, x) for x in self._inputs + self._outputs)
+        self._arguments = dict((k.lower(), v)
+                               for k, v in (arguments or {}).items())
+        self._ids = ids
+        self._transport = transport
+        self._context = context
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.failed = 0
+        self.last_error = None
+
+    def _failure(self, error):
+        with self._lock:
+            self.failed += 1
+            self.last_error = error
+
+    def _new_scope(self):
+        id = self._ids() if self._ids is not None else None
+        return TaskScope(self, Task(id, self.dataflow, self.transformation,
+                                    transport=self._transport))
+
+    def __enter__(self):
+        if not _enabled:
+            scope = _null_scope
+        else:
+            scope = self._new_scope()
+            scope._begin()
+        stack = getattr(self._local, "scopes", None)
+        if stack is None:
+            stack = self._local.scopes = []
+        stack.append(scope)
+        return scope
+
+    def __exit__(self, type, value, traceback):
+        scope = self._local.scopes.pop()
+        if scope is not _null_scope:
+            scope._end(value)
+        return False
+
+    def _getters(self, function):
+        # the position and default of every argument of the input sets,
+        # resolved once per function
+        parameters = list(inspect.signature(function).parameters.values())
+        positions = {}
+        for position, parameter in enumerate(parameters):
+            if parameter.kind in (parameter.POSITIONAL_ONLY,
+                                  parameter.POSITIONAL_OR_KEYWORD):
+                positions[parameter.name] = (position, parameter.default)
+            elif parameter.kind == parameter.KEYWORD_ONLY:
+                positions[parameter.name] = (None, parameter.default)
+        getters = []
+        for layout in self._inputs:
+            for name in layout.names:
+                argument = self._arguments.get(name, name)
+                assert argument in positions, \
+                    "The attribute {0} of {1} is not an argument of {2}." \
+                    .format(name, layout.tag, function.__name__)
+                getters.append((name, argument) + positions[argument])
+        return getters
+
+    def _outputs_of(self, result):
+        if result is None:
+            return {}
+        if isinstance(result, dict):
+            return result
+        names = [name for layout in self._outputs for name in layout.names]
+        if len(names) == 1:
+            return {names[0]: result}
+        assert isinstance(result, (tuple, list)) and \
+            len(result) == len(names), \
+            "The return value must be a dict or a tuple of {0}.".format(
+                ", ".join(names))
+        return dict(zip(names, result))
+
+    def __call__(self, function):
+        getters = self._getters(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            scope = self._new_scope()
+            scope._begin()
+            values = {}
+            for name, argument, position, default in getters:
+                if argument in kwargs:
+                    values[name] = kwargs[argument]
+                elif position is not None and position < len(args):
+                    values[name] = args[position]
+                else:
+                    values[name] = default
+            scope.inputs(**values)
+            try:
+                result = function(*args, **kwargs)
+            except BaseException as e:
+                scope._end(e)
+                raise
+            try:
+                scope.outputs(**self._outputs_of(result))
+            except AssertionError as e:
+                # the function succeeded, only its outputs are not captured
+                scope.task._output = "Outputs not captured: {0}".format(e)
+            scope._end()
+            return result
+        return wrapper
+
+
+def provenance_task(transformation, dataflow, inputs=(), outputs=(),
+                    arguments=None, ids=None, transport=None,
+                    context=False):
+    """ Return a :obj:`ProvenanceTask`, to be used as a decorator or as a
+        context manager::
+
+            @provenance_task("classificarframes", "classificar_frames",
+                             inputs=[input_set], outputs=[output_set])
+            def classify(frame_path):
+                ...
+                return destination_path, predicted_class
+
+            with provenance_task("classificarframes", "classificar_frames",
+                                 inputs=[input_set],
+                                 outputs=[output_set]) as scope:
+                scope.inputs(frame_path=frame_path)
+                ...
+                scope.outputs(frame_path=destination, predicted_class=c)
+
+        See :obj:`ProvenanceTask` for the arguments.
+    """
+    return ProvenanceTask(transformation, dataflow, inputs, outputs,
+                          arguments, ids, transport, context)
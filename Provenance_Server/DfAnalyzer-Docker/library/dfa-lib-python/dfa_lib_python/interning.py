@@ -0,0 +1,131 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from .task import Task
+
+ELEMENTS = b',"elements":'
+
+
+class DatasetInterner(object):
+    """
+    This class defines the interning of datasets repeated across the tasks
+    of a dataflow, e.g. system and script metadata. The first time a
+    dataset is seen it is sent as it is. The second time it is sent with a
+    reference, which Dataflow Analyzer stores, and afterwards only the
+    reference is sent. Datasets smaller than ``min_bytes`` are not
+    interned, and at most ``max_entries`` datasets are remembered.
+
+    When Dataflow Analyzer rejects a task with an unknown reference (e.g.
+    after a restart), :meth:`clear` is called and the task is sent again
+    in full. This needs the answer of the server, so datasets are only
+    interned by :meth:`Task.save` through transports that answer right
+    away, i.e. those with a true ``answers`` attribute such as
+    :obj:`HTTPTransport`. Through deferred transports (batches, the
+    background shipper, spools, the sidecar) datasets are sent in full.
+
+    Attributes:
+        - max_entries (:obj:`int`, optional): Datasets remembered.
+        - min_bytes (:obj:`int`, optional): Size of the smallest interned
+          dataset.
+    """
+    def __init__(self, max_entries=10000, min_bytes=64):
+        self._max_entries = max_entries
+        self._min_bytes = min_bytes
+        self._lock = threading.Lock()
+        # reference -> whether Dataflow Analyzer was sent the elements
+        self._seen = OrderedDict()
+        self.interned = 0
+        self.saved_bytes = 0
+
+    def intern(self, dataflow_tag, dataset):
+        """ Return the json bytes to send for a dataset of a task.
+
+        Args:
+            - dataflow_tag (:obj:`str`): Dataflow tag.
+            - dataset (:obj:`bytes`): Dataset json bytes, as built by
+              :meth:`DataSet.to_json`.
+        """
+        if len(dataset) < self._min_bytes:
+            return dataset
+        position = dataset.find(ELEMENTS)
+        if position < 0:
+            return dataset
+        key = hashlib.sha1(dataflow_tag.encode("utf-8") + b"\0" +
+                           dataset).hexdigest()[:20]
+        with self._lock:
+            sent = self._seen.get(key)
+            if sent is None:
+                self._seen[key] = False
+                if len(self._seen) > self._max_entries:
+                    self._seen.popitem(last=False)
+                return dataset
+            self._seen.move_to_end(key)
+            reference = b',"ref":"' + key.encode("ascii") + b'"'
+            if not sent:
+                self._seen[key] = True
+                return dataset[:position] + reference + dataset[position:]
+            self.interned += 1
+            self.saved_bytes += len(dataset) - position - len(reference) - 1
+        return dataset[:position] + reference + b"}"
+
+    def clear(self):
+        """Forget every dataset, so they are sent in full again."""
+        with self._lock:
+            self._seen.clear()
+
+
+class DatasetReferences(object):
+    """
+    This class defines the expansion of interned datasets done by Dataflow
+    Analyzer, for local stand-ins and proxies of its API.
+
+    Attributes:
+        - max_entries (:obj:`int`, optional): References kept.
+    """
+    def __init__(self, max_entries=10000):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._references = OrderedDict()
+
+    def expand(self, task):
+        """ Store and expand the dataset references of a task, in place.
+            Raises a :obj:`KeyError` for an unknown reference.
+
+        Args:
+            - task (:obj:`dict`): Task json.
+        """
+        with self._lock:
+            for set in task.get("sets", []):
+                reference = set.pop("ref", None)
+                if reference is None:
+                    continue
+                key = (task.get("dataflow"), set.get("tag"), reference)
+                if "elements" in set:
+                    self._references[key] = set["elements"]
+                    if len(self._references) > self._max_entries:
+                        self._references.popitem(last=False)
+                    continue
+                if key not in self._references:
+                    raise KeyError("Unknown dataset reference {0}.".format(
+                        "/".join(map(str, key))))
+                self._references.move_to_end(key)
+                set["elements"] = self._references[key]
+        return task
+
+
+def enable(max_entries=10000, min_bytes=64):
+    """ Intern the repeated datasets of every task and return the
+        :obj:`DatasetInterner`.
+
+    Args:
+        - max_entries (:obj:`int`, optional): Datasets remembered.
+        - min_bytes (:obj:`int`, optional): Size of the smallest interned
+          dataset.
+    """
+    Task.interner = DatasetInterner(max_entries, min_bytes)
+    return Task.interner
+
+
+def disable():
+    """Send every dataset in full."""
+    Task.interner = None
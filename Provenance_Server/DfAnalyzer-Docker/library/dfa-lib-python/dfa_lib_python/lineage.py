@@ -0,0 +1,355 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from .batch import DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .dataflow import resolve_sets
+from .spool import read_records
+from .transport import decode_message
+
+INPUT, OUTPUT = 0, 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS data_set (
+    dataflow TEXT NOT NULL,
+    transformation TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    type TEXT NOT NULL,
+    attributes TEXT NOT NULL,
+    PRIMARY KEY (dataflow, transformation, tag)
+);
+CREATE TABLE IF NOT EXISTS task (
+    id INTEGER PRIMARY KEY,
+    dataflow TEXT NOT NULL,
+    transformation TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    UNIQUE (dataflow, transformation, identifier)
+);
+CREATE TABLE IF NOT EXISTS artifact (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS edge (
+    artifact_id INTEGER NOT NULL,
+    role INTEGER NOT NULL,
+    task_id INTEGER NOT NULL,
+    PRIMARY KEY (artifact_id, role, task_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS edge_task ON edge(task_id, role, artifact_id);
+"""
+
+
+def _convert_attributes(attributes):
+    return [[x["name"].lower(), x["type"]] for x in attributes]
+
+
+class LineageIndex(object):
+    """
+    This class defines a persistent index from artifacts (values of FILE
+    attributes) to the tasks that produced them (output sets) and consumed
+    them (input sets), across dataflows. It is built incrementally from
+    captured tasks and answers backward and forward lineage of one
+    artifact with indexed lookups.
+
+    It is used as a transport, optionally in front of another transport
+    that still receives every message, or filled from spool directories.
+    Dataflows must be registered through the index (or be in the spool)
+    so the set types and attribute types are known.
+
+    Attributes:
+        - path (:obj:`str`): Index database file.
+        - transport (optional): Transport the messages are forwarded to.
+        - attributes (:obj:`list`, optional): Names of other attributes
+          holding paths, e.g. TEXT attributes used for paths.
+        - batch_size (:obj:`int`, optional): Messages per transaction.
+    """
+    def __init__(self, path, transport=None, attributes=(), batch_size=500):
+        self._path = path
+        self.transport = transport
+        self._attributes = set(x.lower() for x in attributes)
+        self._batch_size = batch_size
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._sets = {}
+        for dataflow, transformation, tag, type, attributes in \
+                self._connection.execute("SELECT * FROM data_set"):
+            self._sets[(dataflow, transformation, tag)] = \
+                (type, json.loads(attributes))
+
+    @property
+    def path(self):
+        """Get the index database file."""
+        return self._path
+
+    def post(self, route, message):
+        """ Index a message and forward it to the transport, if any.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        self.add(route, message)
+        if self.transport is not None:
+            return self.transport.post(route, message)
+        return None
+
+    def add(self, route, message):
+        """ Index a message. A message that cannot be indexed is rolled
+            back alone and the error is raised.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        if route not in (DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE):
+            return
+        message = decode_message(message)
+        with self._lock:
+            db = self._connection
+            if self._pending == 0:
+                db.execute("BEGIN")
+            db.execute("SAVEPOINT message")
+            sets = dict(self._sets)
+            try:
+                if route == DATAFLOW_ROUTE:
+                    self._add_dataflow(message)
+                elif route == TASK_ROUTE:
+                    self._add_task(message)
+                else:
+                    for task in message:
+                        self._add_task(task)
+            except Exception:
+                db.execute("ROLLBACK TO message")
+                db.execute("RELEASE message")
+                self._sets = sets
+                if self._pending == 0:
+                    db.execute("ROLLBACK")
+                raise
+            db.execute("RELEASE message")
+            self._pending += 1
+            if self._pending >= self._batch_size:
+                self._commit()
+
+    def add_spool(self, directory):
+        """ Index every record of a spool directory. Returns the number
+            of records.
+
+        Args:
+            - directory (:obj:`str`): Spool directory.
+        """
+        count = 0
+        for route, message in read_records(directory):
+            self.add(route, message)
+            count += 1
+        self.flush()
+        return count
+
+    def _add_dataflow(self, dataflow):
+        known = [(key[2], value[1]) for key, value in self._sets.items()
+                 if key[0] == dataflow["tag"]]
+        for dt_tag, set, attributes in resolve_sets(
+                dataflow, _convert_attributes, known):
+            key = (dataflow["tag"], dt_tag, set["tag"])
+            self._sets[key] = (set["type"], attributes)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO data_set VALUES (?, ?, ?, ?, ?)",
+                key + (set["type"], json.dumps(attributes)))
+
+    def _get_id(self, table, columns, values):
+        db = self._connection
+        where = " AND ".join("{0} = ?".format(x) for x in columns)
+        row = db.execute("SELECT id FROM {0} WHERE {1}".format(table, where),
+                         values).fetchone()
+        if row is not None:
+            return row[0]
+        return db.execute("INSERT INTO {0} ({1}) VALUES ({2})".format(
+            table, ", ".join(columns), ", ".join("?" * len(values))),
+            values).lastrowid
+
+    def _add_task(self, task):
+        dataflow, transformation = task["dataflow"], task["transformation"]
+        task_id = None
+        for set in task.get("sets", []):
+            type, attributes = self._sets.get(
+                (dataflow, transformation, set["tag"]), (None, []))
+            if type not in ("INPUT", "OUTPUT"):
+                continue
+            positions = [position for position, (name, kind)
+                         in enumerate(attributes)
+                         if kind == "FILE" or name in self._attributes]
+            if not positions:
+                continue
+            if task_id is None:
+                task_id = self._get_id(
+                    "task", ("dataflow", "transformation", "identifier"),
+                    (dataflow, transformation, str(task["id"])))
+            role = OUTPUT if type == "OUTPUT" else INPUT
+            for values in set.get("elements", []):
+                if not isinstance(values, list):
+                    values = [values]
+                for position in positions:
+                    if position >= len(values) or values[position] is None:
+                        continue
+                    artifact = self._get_id(
+                        "artifact", ("path",),
+                        (os.path.normpath(str(values[position])),))
+                    self._connection.execute(
+                        "INSERT OR IGNORE INTO edge VALUES (?, ?, ?)",
+                        (artifact, role, task_id))
+
+    def _commit(self):
+        if self._pending:
+            self._connection.execute("COMMIT")
+            self._pending = 0
+
+    def flush(self):
+        """Commit the pending messages."""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        """Commit the pending messages and close the index."""
+        with self._lock:
+            self._commit()
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _query(self, sql, parameters):
+        with self._lock:
+            self._commit()
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _tasks(self, path, role):
+        return [tuple(x) for x in self._query(
+            "SELECT t.dataflow, t.transformation, t.identifier "
+            "FROM artifact a "
+            "JOIN edge e ON e.artifact_id = a.id AND e.role = ? "
+            "JOIN task t ON t.id = e.task_id WHERE a.path = ? ORDER BY t.id",
+            (role, os.path.normpath(path)))]
+
+    def producers(self, path):
+        """ Return the (dataflow, transformation, task id) of the tasks that
+            produced an artifact.
+
+        Args:
+            - path (:obj:`str`): Artifact path.
+        """
+        return self._tasks(path, OUTPUT)
+
+    def consumers(self, path):
+        """ Return the (dataflow, transformation, task id) of the tasks that
+            consumed an artifact.
+
+        Args:
+            - path (:obj:`str`): Artifact path.
+        """
+        return self._tasks(path, INPUT)
+
+    def _walk(self, path, role, max_depth):
+        # from an artifact, follow the tasks where it has the role to the
+        # artifacts these tasks have in the other role
+        other = INPUT if role == OUTPUT else OUTPUT
+        seen = set([os.path.normpath(path)])
+        frontier = [os.path.normpath(path)]
+        steps = []
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for artifact in frontier:
+                rows = self._query(
+                    "SELECT t.dataflow, t.transformation, t.identifier, "
+                    "n.path FROM artifact a "
+                    "JOIN edge e ON e.artifact_id = a.id AND e.role = ? "
+                    "JOIN task t ON t.id = e.task_id "
+                    "LEFT JOIN edge o ON o.task_id = t.id AND o.role = ? "
+                    "LEFT JOIN artifact n ON n.id = o.artifact_id "
+                    "WHERE a.path = ? ORDER BY t.id, n.id",
+                    (role, other, artifact))
+                for dataflow, transformation, identifier, path in rows:
+                    steps.append((depth, artifact, (dataflow, transformation,
+                                                    identifier), path))
+                    if path is not None and path not in seen:
+                        seen.add(path)
+                        next_frontier.append(path)
+            frontier = next_frontier
+        return steps
+
+    def backward(self, path, max_depth=None):
+        """ Return the backward lineage of an artifact as (depth, artifact,
+            (dataflow, transformation, task id), input) steps: the task
+            produced the artifact from the input, which is None for tasks
+            without indexed inputs.
+
+        Args:
+            - path (:obj:`str`): Artifact path.
+            - max_depth (:obj:`int`, optional): Tasks to go back.
+        """
+        return self._walk(path, OUTPUT, max_depth)
+
+    def forward(self, path, max_depth=None):
+        """ Return the forward lineage of an artifact as (depth, artifact,
+            (dataflow, transformation, task id), output) steps: the task
+            consumed the artifact and produced the output, which is None for
+            tasks without indexed outputs.
+
+        Args:
+            - path (:obj:`str`): Artifact path.
+            - max_depth (:obj:`int`, optional): Tasks to go forward.
+        """
+        return self._walk(path, INPUT, max_depth)
+
+    def sources(self, path):
+        """ Return the artifacts at the start of the backward lineage of
+            an artifact, which no indexed input was used to produce, e.g.
+            the camera videos of a training image.
+
+        Args:
+            - path (:obj:`str`): Artifact path.
+        """
+        steps = self.backward(path)
+        derived = set(x[1] for x in steps if x[3] is not None)
+        artifacts = set(x[1] for x in steps) | \
+            set(x[3] for x in steps if x[3] is not None)
+        return sorted(artifacts - derived)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index dfa_lib_python spool directories and query the "
+                    "lineage of an artifact.")
+    parser.add_argument("index")
+    parser.add_argument("--spool", action="append", default=[])
+    parser.add_argument("--attribute", action="append", default=[],
+                        help="other attribute holding paths")
+    parser.add_argument("--backward", default=None)
+    parser.add_argument("--forward", default=None)
+    args = parser.parse_args()
+    index = LineageIndex(args.index, attributes=args.attribute)
+    for directory in args.spool:
+        print("{0}: {1} records".format(directory, index.add_spool(directory)))
+    for path, steps in ((args.backward, index.backward),
+                        (args.forward, index.forward)):
+        if path is not None:
+            for depth, artifact, task, other in steps(path):
+                print("{0}\t{1}\t{2}\t{3}".format(
+                    depth, artifact, "/".join(task), other or ""))
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
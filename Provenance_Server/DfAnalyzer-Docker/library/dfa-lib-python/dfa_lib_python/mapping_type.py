@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class MappingType(Enum):
+    """ This class is a enum with all the possibles attribute mappings of
+        the query interface.
+    """
+    PHYSICAL = 'PHYSICAL'
+    LOGICAL = 'LOGICAL'
+    HYBRID = 'HYBRID'
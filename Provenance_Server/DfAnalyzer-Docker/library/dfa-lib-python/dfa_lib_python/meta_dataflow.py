@@ -0,0 +1,330 @@
+import argparse
+import json
+import os
+import threading
+import zlib
+from .batch import DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .dataflow import resolve_sets
+from .spool import read_records
+from .transport import decode_message
+
+STATE_FILE = "state.json"
+INPUT, OUTPUT = 0, 1
+
+
+def _attribute_names(attributes):
+    return [x["name"].lower() for x in attributes]
+
+
+class MetaDataflow(object):
+    """
+    This class defines a correlation engine that ties independent dataflows
+    into a meta-dataflow. Elements of output sets are joined with elements
+    of input sets, of any dataflow, on the values of declared key
+    attributes (e.g. video_path, frame_path, path_final). The result is a
+    combined DAG whose edges link the transformation producing a set to the
+    transformations consuming it.
+
+    The join is a symmetric hash join run incrementally as tasks arrive,
+    over hash partitions of the key values. When more than ``max_records``
+    records are held in memory, the largest partitions are spilled to disk;
+    records of spilled partitions are appended to disk and joined one
+    partition at a time by :meth:`reconcile`, so memory stays bounded.
+
+    Attributes:
+        - directory (:obj:`str`): Directory of the engine state and spills.
+        - keys (:obj:`list`): Names of the key attributes.
+        - transport (optional): Transport the messages are forwarded to.
+        - partitions (:obj:`int`, optional): Number of hash partitions.
+        - max_records (:obj:`int`, optional): Records held in memory.
+        - normalize (optional): Callable applied to every key value, e.g.
+          ``os.path.normpath``.
+    """
+    def __init__(self, directory, keys, transport=None, partitions=64,
+                 max_records=1000000, normalize=None):
+        assert keys, "At least one key attribute is required."
+        assert isinstance(partitions, int) and partitions > 0, \
+            "The number of partitions must be a positive integer."
+        self._directory = directory
+        self._keys = set(x.lower() for x in keys)
+        self.transport = transport
+        self._partitions = partitions
+        self._max_records = max_records
+        self._normalize = normalize
+        self._lock = threading.Lock()
+        # a port is a (dataflow, transformation, set, attribute, role)
+        self._ports = []
+        self._port_ids = {}
+        self._sets = {}
+        self._edges = {}
+        self._spilled = set()
+        self._tables = {}
+        self._sizes = {}
+        self._records = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def directory(self):
+        """Get the directory of the engine state and spills."""
+        return self._directory
+
+    def _load(self):
+        path = os.path.join(self._directory, STATE_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            state = json.load(f)
+        assert state["partitions"] == self._partitions, \
+            "The state was built with {0} partitions.".format(
+                state["partitions"])
+        self._ports = [tuple(x) for x in state["ports"]]
+        self._port_ids = dict((x, i) for i, x in enumerate(self._ports))
+        self._sets = dict(((x[0], x[1], x[2]), (x[3], x[4]))
+                          for x in state["sets"])
+        self._edges = dict(((x[0], x[1]), x[2]) for x in state["edges"])
+        # the records of the previous runs are on disk
+        self._spilled = set(range(self._partitions))
+
+    def _store(self):
+        state = {
+            "partitions": self._partitions,
+            "ports": self._ports,
+            "sets": [list(k) + list(v) for k, v in self._sets.items()],
+            "edges": [[k[0], k[1], v] for k, v in self._edges.items()],
+        }
+        path = os.path.join(self._directory, STATE_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+
+    def post(self, route, message):
+        """ Add a message to the engine and forward it to the transport,
+            if any.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        self.add(route, message)
+        if self.transport is not None:
+            return self.transport.post(route, message)
+        return None
+
+    def add(self, route, message):
+        """ Add a message to the engine.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        if route not in (DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE):
+            return
+        message = decode_message(message)
+        with self._lock:
+            if route == DATAFLOW_ROUTE:
+                self._add_dataflow(message)
+            elif route == TASK_ROUTE:
+                self._add_task(message)
+            else:
+                for task in message:
+                    self._add_task(task)
+
+    def add_spool(self, directory):
+        """ Add every record of a spool directory. Returns the number of
+            records.
+
+        Args:
+            - directory (:obj:`str`): Spool directory.
+        """
+        count = 0
+        for route, message in read_records(directory):
+            self.add(route, message)
+            count += 1
+        return count
+
+    def _add_dataflow(self, dataflow):
+        known = [(key[2], value[1]) for key, value in self._sets.items()
+                 if key[0] == dataflow["tag"]]
+        for dt_tag, set, attributes in resolve_sets(
+                dataflow, _attribute_names, known):
+            key = (dataflow["tag"], dt_tag, set["tag"])
+            self._sets[key] = (set["type"], attributes)
+
+    def _get_port(self, port):
+        id = self._port_ids.get(port)
+        if id is None:
+            id = self._port_ids[port] = len(self._ports)
+            self._ports.append(port)
+        return id
+
+    def _add_task(self, task):
+        dataflow, transformation = task["dataflow"], task["transformation"]
+        for set in task.get("sets", []):
+            type, attributes = self._sets.get(
+                (dataflow, transformation, set["tag"]), (None, []))
+            if type not in ("INPUT", "OUTPUT"):
+                continue
+            role = OUTPUT if type == "OUTPUT" else INPUT
+            ports = [(position, self._get_port(
+                (dataflow, transformation, set["tag"], name, role)))
+                for position, name in enumerate(attributes)
+                if name in self._keys]
+            for values in set.get("elements", []):
+                if not isinstance(values, list):
+                    values = [values]
+                for position, port in ports:
+                    if position < len(values) and values[position] is not None:
+                        self._add_record(str(values[position]), port, role)
+
+    def _partition(self, value):
+        return zlib.crc32(value.encode("utf-8")) % self._partitions
+
+    def _path(self, kind, partition):
+        return os.path.join(self._directory,
+                            "{0}-{1:04d}.jsonl".format(kind, partition))
+
+    def _add_record(self, value, port, role):
+        if self._normalize is not None:
+            value = self._normalize(value)
+        partition = self._partition(value)
+        if partition in self._spilled:
+            with open(self._path("pending", partition), "a") as f:
+                f.write(json.dumps([value, port, role]) + "\n")
+            return
+        tables = self._tables.get(partition)
+        if tables is None:
+            tables = self._tables[partition] = ({}, {})
+        self._join(tables, value, port, role)
+        self._sizes[partition] = self._sizes.get(partition, 0) + 1
+        self._records += 1
+        while self._records > self._max_records and self._tables:
+            self._spill(max(self._sizes, key=self._sizes.get))
+
+    def _join(self, tables, value, port, role):
+        # probe the table of the other role, then insert into our own
+        for other in tables[1 - role].get(value, ()):
+            key = (other, port) if role == INPUT else (port, other)
+            self._edges[key] = self._edges.get(key, 0) + 1
+        tables[role].setdefault(value, []).append(port)
+
+    def _spill(self, partition):
+        tables = self._tables.pop(partition)
+        with open(self._path("joined", partition), "a") as f:
+            for role, table in enumerate(tables):
+                for value, ports in table.items():
+                    for port in ports:
+                        f.write(json.dumps([value, port, role]) + "\n")
+        self._records -= self._sizes.pop(partition)
+        self._spilled.add(partition)
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def reconcile(self):
+        """ Join the records appended to spilled partitions, one partition
+            at a time.
+        """
+        with self._lock:
+            for partition in sorted(self._spilled):
+                pending = self._path("pending", partition)
+                if not os.path.exists(pending):
+                    continue
+                tables = ({}, {})
+                for value, port, role in self._read(
+                        self._path("joined", partition)):
+                    tables[role].setdefault(value, []).append(port)
+                with open(self._path("joined", partition), "a") as f:
+                    for value, port, role in self._read(pending):
+                        self._join(tables, value, port, role)
+                        f.write(json.dumps([value, port, role]) + "\n")
+                os.remove(pending)
+            self._store()
+
+    def dag(self):
+        """ Return the combined DAG as {"nodes", "edges"}. Nodes are
+            "dataflow/transformation" names and every edge links the port
+            (dataflow, transformation, set, attribute) of an output set to
+            the port of an input set, with the number of joined values.
+        """
+        self.reconcile()
+        with self._lock:
+            nodes = set()
+            edges = []
+            for (producer, consumer), count in sorted(self._edges.items()):
+                source, target = self._ports[producer], self._ports[consumer]
+                nodes.add("/".join(source[:2]))
+                nodes.add("/".join(target[:2]))
+                edges.append({
+                    "from": dict(zip(("dataflow", "transformation", "set",
+                                      "attribute"), source[:4])),
+                    "to": dict(zip(("dataflow", "transformation", "set",
+                                    "attribute"), target[:4])),
+                    "count": count})
+            return {"nodes": sorted(nodes), "edges": edges}
+
+    def to_dot(self):
+        """Return the combined DAG in the Graphviz dot language."""
+        dag = self.dag()
+        lines = ["digraph meta_dataflow {"]
+        for node in dag["nodes"]:
+            lines.append('    "{0}";'.format(node))
+        for edge in dag["edges"]:
+            lines.append('    "{0}/{1}" -> "{2}/{3}" [label="{4} ({5})"];'
+                         .format(edge["from"]["dataflow"],
+                                 edge["from"]["transformation"],
+                                 edge["to"]["dataflow"],
+                                 edge["to"]["transformation"],
+                                 edge["from"]["set"], edge["count"]))
+        lines.append("}")
+        return "\n".join(lines)
+
+    def close(self):
+        """Spill the records held in memory and store the engine state."""
+        with self._lock:
+            for partition in list(self._tables):
+                self._spill(partition)
+        self.reconcile()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the meta-dataflow of dfa_lib_python spool "
+                    "directories by joining key attributes.")
+    parser.add_argument("directory")
+    parser.add_argument("spool", nargs="+")
+    parser.add_argument("--key", action="append", required=True,
+                        help="key attribute, e.g. --key video_path")
+    parser.add_argument("--partitions", type=int, default=64)
+    parser.add_argument("--max-records", type=int, default=1000000)
+    parser.add_argument("--dot", action="store_true",
+                        help="print the DAG in the dot language")
+    args = parser.parse_args()
+    engine = MetaDataflow(args.directory, args.key,
+                          partitions=args.partitions,
+                          max_records=args.max_records,
+                          normalize=os.path.normpath)
+    for directory in args.spool:
+        engine.add_spool(directory)
+    engine.close()
+    if args.dot:
+        print(engine.to_dot())
+    else:
+        print(json.dumps(engine.dag(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
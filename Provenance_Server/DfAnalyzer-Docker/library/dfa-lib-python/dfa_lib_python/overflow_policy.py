@@ -0,0 +1,10 @@
+from enum import Enum
+
+
+class OverflowPolicy(Enum):
+    """ This class is a enum with all the possibles behaviors of a full
+        background shipping queue.
+    """
+    BLOCK = 'BLOCK'
+    DROP_OLDEST = 'DROP_OLDEST'
+    SPILL = 'SPILL'
@@ -12,6 +12,8 @@ class Performance(ProvenanceObject):
         - method (:obj:`MethodType`, optional): method use to measure
         - description (:obj:`str`, optional): description of the performance measure
     """
+    __slots__ = ("_startTime", "_endTime", "_method", "_description")
+
     def __init__(self, start_time, end_time, method="", description=""):
         ProvenanceObject.__init__(self, "")
         self._startTime = start_time
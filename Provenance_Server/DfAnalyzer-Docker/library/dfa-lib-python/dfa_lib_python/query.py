@@ -0,0 +1,338 @@
+import csv
+import glob
+import os
+import tempfile
+import requests
+from . import cache
+from .mapping_type import MappingType
+from .transport import dfa_url
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+QUERY_DIR = "queries"
+
+
+class Query(object):
+    """
+    This class defines a query specification of the Dataflow Analyzer
+    query interface. Every method returns the query, so calls can be
+    chained.
+
+    Attributes:
+        - mapping (:obj:`MappingType`, optional): Attribute mapping.
+    """
+    def __init__(self, mapping=None):
+        self._mapping = None
+        self._clauses = {}
+        if mapping is not None:
+            self.mapping(mapping)
+
+    def mapping(self, mapping):
+        """ Set the attribute mapping.
+
+        Args:
+            - mapping (:obj:`MappingType`): Attribute mapping.
+        """
+        assert isinstance(mapping, MappingType), \
+            "The mapping must be a MappingType object."
+        self._mapping = mapping.value
+        return self
+
+    def _add(self, clause, values):
+        assert all(isinstance(x, str) for x in values), \
+            "The {0} arguments must be strings.".format(clause)
+        self._clauses.setdefault(clause, []).extend(values)
+        return self
+
+    def source(self, *tags):
+        """Add source datasets."""
+        return self._add("source", tags)
+
+    def target(self, *tags):
+        """Add target datasets."""
+        return self._add("target", tags)
+
+    def include(self, *tags):
+        """Add datasets that must be in the dataflow paths."""
+        return self._add("include", tags)
+
+    def exclude(self, *tags):
+        """Add datasets that must not be in the dataflow paths."""
+        return self._add("exclude", tags)
+
+    def projection(self, *attributes):
+        """Add projected attributes, e.g. 'oextract_data.x'."""
+        return self._add("projection", attributes)
+
+    def selection(self, *conditions):
+        """Add conditions, e.g. 'oextract_data.u > 0.01'."""
+        return self._add("selection", conditions)
+
+    @property
+    def projections(self):
+        """Get the projected attributes."""
+        return list(self._clauses.get("projection", []))
+
+    def to_message(self):
+        """Get the query specification sent to the query interface."""
+        lines = []
+        if self._mapping is not None:
+            lines.append("mapping({0})".format(self._mapping.lower()))
+        for clause in ("source", "target", "include", "exclude",
+                       "projection", "selection"):
+            if clause in self._clauses:
+                lines.append("{0}({1})".format(
+                    clause, ";".join(self._clauses[clause])))
+        return "\n".join(lines)
+
+
+def _numeric(value):
+    if value == "" or value.lower() == "null":
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() and "." not in value \
+        and "e" not in value.lower() else number
+
+
+class QueryResult(object):
+    """
+    This class defines the result of a query. Rows are read incrementally
+    from the server answer (or from the local cache) as they are iterated,
+    with NUMERIC attributes converted to numbers. A result can be read
+    only once.
+
+    Attributes:
+        - columns (:obj:`list`): Column names.
+        - types (:obj:`list`): Attribute type of every column, or None.
+        - lines: Iterator over the CSV lines of the result.
+        - header (:obj:`list`, optional): Header row to skip.
+        - on_complete (optional): Callable run after the last line.
+    """
+    def __init__(self, columns, types, lines, header=None, on_complete=None):
+        self.columns = columns
+        self.types = types
+        self._lines = lines
+        self._header = header
+        self._on_complete = on_complete
+
+    def __iter__(self):
+        header = self._header
+        for values in csv.reader(self._lines, delimiter=";", quotechar='"'):
+            if header is not None and values == header:
+                # the header is a row of the result union
+                header = None
+                continue
+            if not self.columns:
+                self.columns = ["column_{0}".format(x)
+                                for x in range(len(values))]
+                self.types = [None] * len(values)
+            yield tuple(_numeric(value) if type == "NUMERIC" else value
+                        for value, type in zip(values, self.types))
+        if self._on_complete is not None:
+            self._on_complete()
+
+    def batches(self, size=10000):
+        """ Yield the result as typed columns, {column: values}, of at
+            most size rows.
+
+        Args:
+            - size (:obj:`int`, optional): Rows per batch.
+        """
+        rows = []
+        for row in self:
+            rows.append(row)
+            if len(rows) >= size:
+                yield dict(zip(self.columns, map(list, zip(*rows))))
+                rows = []
+        if rows:
+            yield dict(zip(self.columns, map(list, zip(*rows))))
+
+    def to_columns(self):
+        """Read the whole result as typed columns, {column: values}."""
+        columns = None
+        for batch in self.batches():
+            if columns is None:
+                columns = batch
+            else:
+                for name, values in batch.items():
+                    columns[name].extend(values)
+        return columns or dict((x, []) for x in self.columns)
+
+    def to_dataframe(self):
+        """Read the whole result as a pandas DataFrame."""
+        if pandas is None:
+            raise ImportError("QueryResult.to_dataframe requires pandas.")
+        columns = self.to_columns()
+        return pandas.DataFrame(columns, columns=self.columns)
+
+
+class QueryClient(object):
+    """
+    This class defines a client of the Dataflow Analyzer query interface
+    and dataflow API. Results are cached on disk, keyed on the dataflow,
+    the query and the version of the dataflow data, which the server
+    changes whenever it stores a task, so repeated queries do not reach
+    the database until new provenance arrives.
+
+    Attributes:
+        - url (:obj:`str`, optional): Dataflow Analyzer base url.
+        - cache (:obj:`bool`, optional): Cache the query results.
+        - connect_timeout (:obj:`float`, optional): Seconds to wait for a
+          connection.
+        - read_timeout (:obj:`float`, optional): Seconds to wait for an answer.
+    """
+    def __init__(self, url=None, cache=True, connect_timeout=3.05,
+                 read_timeout=300):
+        self._url = (url or dfa_url).rstrip('/')
+        self._cache = cache
+        self._timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+        self._dataflows = {}
+
+    @property
+    def url(self):
+        """Get the Dataflow Analyzer base url."""
+        return self._url
+
+    def _get(self, route):
+        r = self._session.get(self._url + route, timeout=self._timeout)
+        r.raise_for_status()
+        return r
+
+    def dataflows(self):
+        """Return the stored dataflows as a list of {"id", "tag"} dicts."""
+        return self._get('/api/dataflows/list').json()
+
+    def dataflow(self, df_id):
+        """ Return the graph and the attributes of a dataflow, as answered
+            by '/api/dataflows/{dfId}'.
+
+        Args:
+            - df_id (:obj:`int`): Dataflow id.
+        """
+        key = int(df_id)
+        if key not in self._dataflows:
+            self._dataflows[key] = self._get(
+                '/api/dataflows/{0}'.format(key)).json()
+        return self._dataflows[key]
+
+    def get_id(self, df_tag):
+        """ Return the id of the latest dataflow with a tag.
+
+        Args:
+            - df_tag (:obj:`str`): Dataflow tag.
+        """
+        ids = [x["id"] for x in self.dataflows()
+               if x["tag"] == df_tag.lower()]
+        assert ids, "The dataflow {0} is not stored.".format(df_tag)
+        return max(ids)
+
+    def version(self, df_tag):
+        """ Return the version of the data of a dataflow, or None when
+            the server does not report it.
+
+        Args:
+            - df_tag (:obj:`str`): Dataflow tag.
+        """
+        try:
+            r = self._session.get(
+                self._url + '/query_interface/{0}/version'.format(
+                    df_tag.lower()), timeout=self._timeout)
+        except requests.RequestException:
+            return None
+        return r.text if r.status_code == 200 else None
+
+    def _get_types(self, df_id, query):
+        attributes = {}
+        for dataset in self.dataflow(df_id).get("allAttrsMap", {}).values():
+            for attribute in dataset["atts"]:
+                attributes["{0}.{1}".format(dataset["name"],
+                                            attribute["name"])] = \
+                    attribute["type"]
+        return [attributes.get(x.lower().replace(" ", "")) for x in
+                query.projections]
+
+    def run(self, df_tag, query, df_id=None):
+        """ Run a query and return a :obj:`QueryResult` that streams its
+            rows.
+
+        Args:
+            - df_tag (:obj:`str`): Dataflow tag.
+            - query (:obj:`Query`): Query specification.
+            - df_id (:obj:`int`, optional): Dataflow id, defaults to the
+              latest dataflow with the tag.
+        """
+        assert isinstance(query, Query), \
+            "The query must be a Query object."
+        df_tag = df_tag.lower()
+        df_id = self.get_id(df_tag) if df_id is None else int(df_id)
+        message = query.to_message()
+        projections = query.projections
+        columns = [x.split(".")[-1].strip() for x in projections]
+        types = self._get_types(df_id, query)
+        header = columns if projections else None
+
+        version = self.version(df_tag) if self._cache else None
+        if version is None:
+            return QueryResult(columns, types,
+                               self._stream(df_tag, df_id, message),
+                               header)
+        key = cache.fingerprint([self._url, df_tag, df_id, message])
+        directory = os.path.join(cache.cache_dir, QUERY_DIR)
+        path = os.path.join(directory, "{0}-{1}.csv".format(
+            key, cache.fingerprint(version)[:16]))
+        if os.path.exists(path):
+            return QueryResult(columns, types, self._read(path), header)
+
+        def lines():
+            # the result is written to a temporary file while it is read,
+            # and only cached when it was read to the end
+            os.makedirs(directory, exist_ok=True)
+            f = tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp",
+                                            newline="", delete=False)
+            cached = False
+            try:
+                with f:
+                    for line in self._stream(df_tag, df_id, message):
+                        f.write(line + "\n")
+                        yield line
+                for old in glob.glob(os.path.join(directory, key + "-*.csv")):
+                    os.remove(old)
+                os.replace(f.name, path)
+                cached = True
+            finally:
+                if not cached and os.path.exists(f.name):
+                    os.remove(f.name)
+        return QueryResult(columns, types, lines(), header)
+
+    def _stream(self, df_tag, df_id, message):
+        r = self._session.post(
+            self._url + '/query_interface/{0}/{1}/csv'.format(df_tag, df_id),
+            data={"message": message}, stream=True, timeout=self._timeout)
+        with r:
+            r.raise_for_status()
+            r.encoding = r.encoding or "utf-8"
+            for line in r.iter_lines(decode_unicode=True):
+                if line:
+                    yield line
+
+    def _read(self, path):
+        with open(path, newline="") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+    def clear_cache(self):
+        """Remove every cached query result."""
+        pattern = os.path.join(cache.cache_dir, QUERY_DIR, "*.csv")
+        for path in glob.glob(pattern):
+            os.remove(path)
+
+    def close(self):
+        """Close every pooled connection."""
+        self._session.close()
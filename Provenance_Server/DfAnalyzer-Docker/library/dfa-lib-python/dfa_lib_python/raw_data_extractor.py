@@ -1,4 +1,5 @@
 import os
+import shlex
 import subprocess
 from .extractor_cartridge import ExtractorCartridge
 
@@ -48,6 +49,27 @@ class RawDataExtractor(object):
                                                               command,
                                                               attributes)
 
+    def get_arguments(self, file=None):
+        """ Return the argument vector to execute RDE without a shell.
+
+        Args:
+            - file (:obj:`str`, optional): File to extract from, added as
+              the last argument of the command line.
+        """
+        dfanalyzer_dir = os.environ.get('DFANALYZER_DIR')
+        command = self._command
+        if file is not None:
+            # RDE runs the command, so the file is one of its arguments
+            command = "{0} {1}".format(command, shlex.quote(file))
+        # RDE takes the command wrapped in backslashes, as in
+        # get_command_line()
+        return ["{0}/bin/RDE".format(dfanalyzer_dir),
+                "{0}:{1}".format(self._cartridge, self._method),
+                self._tag,
+                self._path,
+                "\\{0}\\".format(command),
+                self.get_attributes()]
+
     def run(self):
         """Execute the RDE."""
-        subprocess.call(self.get_command_line())
\ No newline at end of file
+        return subprocess.call(self.get_arguments())
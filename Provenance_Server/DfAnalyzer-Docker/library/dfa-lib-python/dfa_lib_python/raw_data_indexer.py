@@ -1,4 +1,5 @@
 import os
+import shlex
 import subprocess
 from .extractor_cartridge import ExtractorCartridge
 
@@ -30,6 +31,11 @@ class RawDataIndexer(object):
         self._file_name_with_extracted_data = file_name_with_extracted_data
         self._extra_arguments = extra_arguments
 
+    @property
+    def tag(self):
+        """Get the extractor tag."""
+        return self._tag
+
     def get_attributes(self):
         s = ","
         r = [str(x) for x in self._attributes]
@@ -57,6 +63,21 @@ class RawDataIndexer(object):
                             attributes,
                             extra_arguments)
 
+    def get_arguments(self, file=None):
+        """ Return the argument vector to execute RDI without a shell.
+
+        Args:
+            - file (:obj:`str`, optional): File with the extracted data,
+              instead of file_name_with_extracted_data.
+        """
+        dfanalyzer_dir = os.environ.get('DFANALYZER_DIR')
+        return ["{0}/bin/RDE".format(dfanalyzer_dir),
+                "{0}:{1}".format(self._cartridge, self._method),
+                self._tag,
+                self._path,
+                self._file_name_with_extracted_data if file is None else file,
+                self.get_attributes()] + shlex.split(self._extra_arguments)
+
     def run(self):
         """Execute the RDI."""
-        subprocess.call(self.get_command_line())
\ No newline at end of file
+        return subprocess.call(self.get_arguments())
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .method_type import MethodType
+from .raw_data_extractor import RawDataExtractor
+from .raw_data_indexer import RawDataIndexer
+
+
+class RDEResult(object):
+    """
+    This class defines the result of one RDE run of a batch.
+
+    Attributes:
+        - runner: The :obj:`RawDataExtractor` or :obj:`RawDataIndexer`.
+        - file (:obj:`str`): The file of the job, or None.
+        - arguments (:obj:`list`): The argument vector that was executed.
+        - method (:obj:`MethodType`): EXTRACTION or INDEXING.
+    """
+    def __init__(self, runner, file, arguments, method):
+        self.runner = runner
+        self.file = file
+        self.arguments = arguments
+        self.method = method
+        self.returncode = None
+        self.stdout = None
+        self.stderr = None
+        self.error = None
+        self.start = None
+        self.duration = None
+
+    @property
+    def ok(self):
+        """Whether RDE ran and exited with 0."""
+        return self.returncode == 0
+
+
+class RDEBatch(object):
+    """
+    This class defines a batch of RDE runs, each an (extractor or indexer,
+    file) job, executed by at most ``max_workers`` RDE processes at a time.
+    Processes receive argument vectors, never a shell string. The exit
+    code, output and timing of every job is collected, and every run is
+    recorded as an EXTRACTION or INDEXING span of the task, if any.
+
+    Attributes:
+        - task (:obj:`Task`, optional): Task the runs are recorded in.
+        - max_workers (:obj:`int`, optional): RDE processes run at a time,
+          defaults to the number of cores.
+        - timeout (:obj:`float`, optional): Seconds a run may take.
+    """
+    def __init__(self, task=None, max_workers=None, timeout=None):
+        self.task = task
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self._timeout = timeout
+        self._jobs = []
+
+    def add(self, runner, file=None):
+        """ Add a job.
+
+        Args:
+            - runner: A :obj:`RawDataExtractor` or :obj:`RawDataIndexer`.
+            - file (:obj:`str`, optional): File to extract from, added to
+              the command of an extractor, or with the extracted data to
+              index, instead of the one of an indexer.
+        """
+        assert isinstance(runner, (RawDataExtractor, RawDataIndexer)), \
+            "The runner must be a RawDataExtractor or a RawDataIndexer."
+        method = MethodType.INDEXING if isinstance(runner, RawDataIndexer) \
+            else MethodType.EXTRACTION
+        self._jobs.append(RDEResult(runner, file,
+                                    runner.get_arguments(file), method))
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _run(self, result):
+        result.start = time.time_ns()
+        clock = time.perf_counter_ns()
+        try:
+            process = subprocess.run(result.arguments, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE,
+                                     universal_newlines=True,
+                                     timeout=self._timeout)
+            result.returncode = process.returncode
+            result.stdout = process.stdout
+            result.stderr = process.stderr
+        except subprocess.TimeoutExpired as e:
+            result.error = "Timed out after {0} seconds.".format(e.timeout)
+            result.stdout, result.stderr = e.stdout, e.stderr
+        except OSError as e:
+            result.error = str(e)
+        result.duration = time.perf_counter_ns() - clock
+        return result
+
+    def run(self):
+        """ Run the jobs added since the last run and return their
+            :obj:`RDEResult` in the order they were added.
+        """
+        jobs, self._jobs = self._jobs, []
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            results = list(pool.map(self._run, jobs))
+        if self.task is not None:
+            for result in results:
+                self.task.add_span(result.method, result.start,
+                                   result.duration)
+        return results
@@ -0,0 +1,142 @@
+import getpass
+import os
+import platform
+import socket
+import sys
+import threading
+from datetime import datetime
+from .attribute import Attribute
+from .attribute_type import AttributeType
+from .dataset import DataSet
+from .dependency import Dependency
+from .element import Element
+from .hashing import file_hash
+from .set import Set
+from .set_type import SetType
+from .task import Task
+from .task_status import TaskStatus
+from .transformation import Transformation
+
+RUN_CONTEXT_TAG = "run_context"
+
+
+class RunContext(object):
+    """
+    This class defines the context of a script run: who ran it, where,
+    with which Python, and the path, modification time and hash of the
+    script. It is computed once per process and registered once per
+    dataflow as a task of the 'run_context' transformation, which every
+    task of the run references as a dependency.
+
+    Attributes:
+        - script (:obj:`str`, optional): Script path. Defaults to the
+          running script.
+        - id (:obj:`int`, optional): Run id, the id of the context task.
+          Defaults to a new id of ``Task.ids``.
+        - algorithm (:obj:`str`, optional): Algorithm of the script hash.
+    """
+    def __init__(self, script=None, id=None, algorithm="sha256"):
+        script = script or getattr(sys.modules.get("__main__"), "__file__",
+                                   None) or sys.argv[0]
+        self.id = str(id if id is not None else Task.ids())
+        self.executed_by = getpass.getuser()
+        self.cwd = os.getcwd()
+        self.hostname = socket.gethostname()
+        self.python_version = platform.python_version()
+        self.script_path = os.path.abspath(script)
+        self.script_last_modified = datetime.fromtimestamp(
+            os.path.getmtime(script)).isoformat()
+        self.script_hash = file_hash(script, algorithm)
+        self._registered = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def set_tags(dataflow_tag):
+        """ Return the tags of the system and script metadata sets of
+            a dataflow.
+
+        Args:
+            - dataflow_tag (:obj:`str`): Dataflow tag.
+        """
+        dataflow_tag = dataflow_tag.lower()
+        return (dataflow_tag + "_system_metadata",
+                dataflow_tag + "_script_metadata")
+
+    def add_to(self, dataflow):
+        """ Add the 'run_context' transformation to a dataflow, before
+            it is saved.
+
+        Args:
+            - dataflow (:obj:`Dataflow`): The dataflow.
+        """
+        system_tag, script_tag = self.set_tags(dataflow._tag)
+        dataflow.add_transformation(Transformation(RUN_CONTEXT_TAG, [
+            Set(system_tag, SetType.OUTPUT, [
+                Attribute("executed_by", AttributeType.TEXT),
+                Attribute("cwd", AttributeType.TEXT),
+                Attribute("hostname", AttributeType.TEXT),
+                Attribute("python_version", AttributeType.TEXT)]),
+            Set(script_tag, SetType.OUTPUT, [
+                Attribute("script_path", AttributeType.TEXT),
+                Attribute("script_last_modified", AttributeType.TEXT),
+                Attribute("script_hash", AttributeType.TEXT)])]))
+
+    def register(self, dataflow_tag, transport=None):
+        """ Store the context as a task of a dataflow, once per run.
+
+        Args:
+            - dataflow_tag (:obj:`str`): Dataflow tag.
+            - transport (optional): Transport used to send the task.
+        """
+        dataflow_tag = dataflow_tag.lower()
+        with self._lock:
+            if dataflow_tag in self._registered:
+                return
+            system_tag, script_tag = self.set_tags(dataflow_tag)
+            task = Task(self.id, dataflow_tag, RUN_CONTEXT_TAG,
+                        transport=transport)
+            task.add_dataset(DataSet(system_tag, [Element(
+                [self.executed_by, self.cwd, self.hostname,
+                 self.python_version])]))
+            task.add_dataset(DataSet(script_tag, [Element(
+                [self.script_path, self.script_last_modified,
+                 self.script_hash])]))
+            task.set_status(TaskStatus.FINISHED)
+            task.save()
+            self._registered.add(dataflow_tag)
+
+    def attach(self, task):
+        """ Reference the context from a task, registering the context
+            first if needed. Other dependencies of the task are kept.
+
+        Args:
+            - task (:obj:`Task`): The task.
+        """
+        assert isinstance(task, Task), "The task must be valid."
+        self.register(task._dataflow, task.transport)
+        dependency = task._dependency
+        if not dependency:
+            task.add_dependency(Dependency([RUN_CONTEXT_TAG], [self.id]))
+            return
+        if {"tag": RUN_CONTEXT_TAG} in dependency["tags"]:
+            return
+        task._dependency = {
+            "tags": dependency["tags"] + [{"tag": RUN_CONTEXT_TAG}],
+            "ids": [{"id": "{0},{1}".format(x["id"], self.id)}
+                    for x in dependency["ids"]]}
+
+
+_run_context = None
+_run_context_lock = threading.Lock()
+
+
+def get_run_context():
+    """ Return the process-wide :obj:`RunContext`, computing it on
+        first use.
+    """
+    global _run_context
+    if _run_context is None:
+        with _run_context_lock:
+            if _run_context is None:
+                _run_context = RunContext()
+    return _run_context
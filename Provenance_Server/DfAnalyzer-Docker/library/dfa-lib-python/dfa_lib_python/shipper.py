@@ -0,0 +1,292 @@
+import atexit
+import json
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from .overflow_policy import OverflowPolicy
+from .spool import encode_record
+from .transport import get_default_transport
+
+
+class BackgroundShipper(object):
+    """
+    This class defines a transport that ships messages from a background
+    thread. ``post`` only appends the message to a bounded in-process
+    queue, so the caller never waits for the Dataflow Analyzer answer.
+    Messages are sent in the order they were posted.
+
+    A message that cannot be sent (connection errors, HTTP 5xx) is tried
+    again ``retries`` times, waiting ``backoff`` seconds and twice as long
+    after every attempt. With a spill path, a message that still fails is
+    moved to the spill file with the messages queued after it, and the
+    file is tried again with the same backoff; what is left in it at close
+    is sent by the next shipper of the spill path. Without one, the
+    message is counted as failed.
+
+    Attributes:
+        - transport (optional): Transport used by the worker thread. Defaults
+          to the shared :obj:`HTTPTransport`.
+        - maxsize (:obj:`int`, optional): Maximum number of queued messages.
+        - overflow (:obj:`OverflowPolicy`, optional): Behavior when the
+          queue is full.
+        - spill_path (:obj:`str`, optional): File used by
+          :obj:`OverflowPolicy.SPILL` and by the messages that could not be
+          sent.
+        - retries (:obj:`int`, optional): Attempts after the first one.
+        - backoff (:obj:`float`, optional): Seconds before the first retry.
+    """
+    def __init__(self, transport=None, maxsize=10000,
+                 overflow=OverflowPolicy.BLOCK, spill_path=None, retries=3,
+                 backoff=0.5):
+        assert isinstance(maxsize, int) and maxsize > 0, \
+            "The queue size must be a positive integer."
+        assert isinstance(overflow, OverflowPolicy), \
+            "The overflow must be an instance of OverflowPolicy."
+        assert overflow != OverflowPolicy.SPILL or spill_path, \
+            "A spill path is required by the SPILL policy."
+        self._transport = transport
+        self._maxsize = maxsize
+        self._overflow = overflow
+        self._spill_path = spill_path
+        self._retries = retries
+        self._backoff = backoff
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        # the spill files are only written under _spill_lock, never under
+        # _lock, and _spill_writers counts the posts about to write
+        self._spill_lock = threading.Lock()
+        self._spill_writers = 0
+        self._spilling = spill_path is not None and (
+            os.path.exists(spill_path) or
+            os.path.exists(spill_path + ".draining"))
+        self._retry_at = 0
+        self._drain_failures = 0
+        self._busy = False
+        self._closing = False
+        self._closed = False
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self._thread = threading.Thread(target=self._run,
+                                        name="dfa-background-shipper")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def post(self, route, message):
+        """ Enqueue a message to be posted by the worker thread.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`): The json message.
+        """
+        record = (route, message)
+        with self._lock:
+            assert not self._closed, "The shipper is closed."
+            if not self._spilling and len(self._queue) >= self._maxsize:
+                if self._overflow == OverflowPolicy.BLOCK:
+                    # the queue is also emptied when it moves to the spill
+                    while len(self._queue) >= self._maxsize:
+                        self._not_full.wait()
+                elif self._overflow == OverflowPolicy.DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    self._spilling = True
+            if not self._spilling:
+                self._queue.append(record)
+                self._not_empty.notify()
+                return None
+            self._spill_writers += 1
+        try:
+            with self._spill_lock:
+                self._append(self._spill_path, [record])
+        finally:
+            with self._lock:
+                self._spill_writers -= 1
+                self._not_empty.notify()
+        return None
+
+    def _append(self, path, records):
+        with open(path, "ab") as f:
+            for record in records:
+                f.write(encode_record(*record))
+        self.spilled += len(records)
+
+    def _keep(self, record):
+        # the message failed after its retries, it is sent again from the
+        # spill file before the messages queued after it, and before the
+        # messages posted from now on, which are spilled
+        if self._spill_path is None:
+            self.failed += 1
+            return
+        with self._lock:
+            records = [record] + list(self._queue)
+            self._queue.clear()
+            self._not_full.notify_all()
+            self._spilling = True
+            self._delay_drain()
+        draining = self._spill_path + ".draining"
+        with self._spill_lock:
+            if not os.path.exists(draining):
+                self._append(draining, records)
+                return
+            with open(draining + ".tmp", "wb") as g:
+                for record in records:
+                    g.write(encode_record(*record))
+                with open(draining, "rb") as f:
+                    shutil.copyfileobj(f, g)
+            os.replace(draining + ".tmp", draining)
+            self.spilled += len(records)
+
+    def _delay_drain(self):
+        self._retry_at = time.time() + self._backoff * \
+            2 ** min(self._drain_failures, 6)
+        self._drain_failures += 1
+
+    def _take_spill(self):
+        draining = self._spill_path + ".draining"
+        with self._spill_lock:
+            if not os.path.exists(draining):
+                if not os.path.exists(self._spill_path):
+                    return None
+                os.rename(self._spill_path, draining)
+        return draining
+
+    def _drain(self, draining):
+        # send the spilled messages, keeping those after a failure
+        offset = 0
+        with open(draining, "rb") as f:
+            for line in f:
+                record = json.loads(line.decode("utf-8"))
+                if not self._send(record["route"], record["message"]):
+                    break
+                offset += len(line)
+            else:
+                offset = None
+        if offset is None:
+            os.remove(draining)
+            return True
+        with open(draining, "rb") as f, open(draining + ".tmp", "wb") as g:
+            f.seek(offset)
+            shutil.copyfileobj(f, g)
+        os.replace(draining + ".tmp", draining)
+        return False
+
+    def _pending(self):
+        if self._queue or self._busy:
+            return True
+        # at close, a spill waiting for its retry is left to the next shipper
+        return self._spilling and not (
+            self._closing and self._retry_at > time.time())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while True:
+                    record = draining = None
+                    if self._queue:
+                        record = self._queue.popleft()
+                        self._not_full.notify()
+                        break
+                    delay = None
+                    if self._spilling:
+                        delay = self._retry_at - time.time()
+                        if delay <= 0:
+                            break
+                    self._busy = False
+                    self._idle.notify_all()
+                    if self._closed:
+                        return
+                    self._not_empty.wait(None if self._closing else delay)
+                self._busy = True
+            if record is not None:
+                if not self._send(*record):
+                    self._keep(record)
+                continue
+            draining = self._take_spill()
+            drained = draining is None or self._drain(draining)
+            with self._lock:
+                if drained:
+                    self._drain_failures = 0
+                    while draining is None and self._spill_writers > 0:
+                        # a post is about to write the spill file, the
+                        # file is taken on the next loop
+                        self._not_empty.wait(0.1)
+                    self._spilling = self._spill_writers > 0 or \
+                        os.path.exists(self._spill_path)
+                else:
+                    self._delay_drain()
+
+    def _send(self, route, message):
+        """ Send a message, trying again on connection errors and HTTP
+            5xx. Returns False when every attempt failed.
+        """
+        transport = self._transport or get_default_transport()
+        delay = self._backoff
+        for attempt in range(self._retries + 1):
+            if attempt:
+                if self._closing:
+                    # at close, every message is tried once
+                    break
+                time.sleep(delay)
+                delay *= 2
+            try:
+                r = transport.post(route, message)
+            except Exception:
+                continue
+            if r is not None and r.status_code >= 500:
+                continue
+            if r is not None and r.status_code >= 400:
+                # rejected by the server, sending it again does not help
+                self.failed += 1
+            else:
+                self.sent += 1
+            return True
+        return False
+
+    def flush(self, timeout=None):
+        """ Wait until every queued message has been sent. While Dataflow
+            Analyzer cannot be reached, spilled messages keep it waiting.
+
+        Args:
+            - timeout (:obj:`float`, optional): Maximum seconds to wait.
+
+        Returns True when the queue was drained.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._pending():
+                if not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else \
+                    deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """ Drain the queue and stop the worker thread. Every message is
+            tried once; spilled messages that cannot be sent are left in
+            the spill file.
+
+        Args:
+            - timeout (:obj:`float`, optional): Maximum seconds to wait.
+        """
+        if self._closed:
+            return
+        with self._lock:
+            self._closing = True
+            self._not_empty.notify()
+        self.flush(timeout)
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify()
+        atexit.unregister(self.close)
@@ -0,0 +1,284 @@
+import argparse
+import hashlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+from .batch import DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .spool import Spool, SpoolReplayer, encode_record
+from .transport import HTTPTransport, decode_message, encode_message
+
+# a frame is a route code and a payload length, then the json payload
+ROUTES = (DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE)
+HEADER = struct.Struct("!BI")
+socket_path = os.environ.get('DFA_SIDECAR_SOCKET', "/tmp/dfa-sidecar.sock")
+
+
+class SidecarTransport(object):
+    """
+    This class defines a transport to a local :obj:`Sidecar`. A message
+    costs one write of a frame on a Unix domain socket; delivery to
+    Dataflow Analyzer is done by the sidecar, so ``post`` returns None.
+
+    Attributes:
+        - path (:obj:`str`, optional): Socket path of the sidecar.
+        - fallback (optional): Transport used while the sidecar cannot be
+          reached, e.g. a :obj:`Spool`. Without one, the error is raised.
+    """
+    def __init__(self, path=None, fallback=None):
+        self._path = path or socket_path
+        self._fallback = fallback
+        self._lock = threading.Lock()
+        self._socket = None
+        self._pid = None
+
+    @property
+    def path(self):
+        """Get the socket path of the sidecar."""
+        return self._path
+
+    def _connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self._path)
+        except OSError:
+            connection.close()
+            raise
+        self._socket = connection
+        self._pid = os.getpid()
+
+    def post(self, route, message):
+        """ Send a message to the sidecar.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        payload = encode_message(message)
+        frame = HEADER.pack(ROUTES.index(route), len(payload)) + payload
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is None or self._pid != os.getpid():
+                        # a forked process opens its own connection
+                        self._connect()
+                    self._socket.sendall(frame)
+                    return None
+                except OSError:
+                    self._close()
+                    if attempt == 0:
+                        continue
+                    if self._fallback is None:
+                        raise
+        return self._fallback.post(route, message)
+
+    def _close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def close(self):
+        """Close the connection to the sidecar."""
+        with self._lock:
+            self._close()
+
+
+class _FrameHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            header = self.rfile.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            code, length = HEADER.unpack(header)
+            payload = self.rfile.read(length)
+            if len(payload) < length or code >= len(ROUTES):
+                return
+            self.server.sidecar.receive(ROUTES[code], payload)
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Sidecar(object):
+    """
+    This class defines a local provenance aggregation daemon. Processes of
+    the host send task and dataflow messages with a
+    :obj:`SidecarTransport`. Messages are buffered for ``max_delay``
+    seconds, during which exact duplicates are dropped and the messages of
+    the same task (e.g. begin and end) are coalesced into one. They are
+    then appended to a :obj:`Spool` and forwarded by a
+    :obj:`SpoolReplayer` in batches over pooled connections, so they
+    survive a restart of the sidecar or of Dataflow Analyzer.
+
+    Attributes:
+        - spool_directory (:obj:`str`): Spool directory.
+        - path (:obj:`str`, optional): Socket path.
+        - transport (optional): Transport used to forward the messages.
+          Defaults to an :obj:`HTTPTransport`.
+        - max_delay (:obj:`float`, optional): Seconds messages are buffered.
+        - batch_size (:obj:`int`, optional): Task messages per request.
+        - poll_interval (:obj:`float`, optional): Seconds between polls of
+          the spool by the replayer.
+    """
+    def __init__(self, spool_directory, path=None, transport=None,
+                 max_delay=0.1, batch_size=500, poll_interval=0.2):
+        self._path = path or socket_path
+        self._transport = transport or HTTPTransport()
+        self._max_delay = max_delay
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._spool = Spool(spool_directory)
+        self._replayer = SpoolReplayer(spool_directory, self._transport,
+                                       batch_size=batch_size)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._entries = []
+        self._tasks = {}
+        self._payloads = set()
+        self._dataflows = set()
+        self._stopped = threading.Event()
+        self._server = None
+        self._threads = []
+        self.received = 0
+        self.duplicates = 0
+        self.coalesced = 0
+
+    @property
+    def path(self):
+        """Get the socket path."""
+        return self._path
+
+    def receive(self, route, payload):
+        """ Buffer a message received from a process.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - payload (:obj:`bytes`): The json message.
+        """
+        with self._lock:
+            self.received += 1
+            if route == DATAFLOW_ROUTE:
+                # a dataflow is registered once per sidecar run
+                fingerprint = hashlib.sha1(payload).digest()
+                if fingerprint in self._dataflows:
+                    self.duplicates += 1
+                    return
+                self._dataflows.add(fingerprint)
+                self._entries.append((route, payload))
+                return
+            if payload in self._payloads:
+                self.duplicates += 1
+                return
+            self._payloads.add(payload)
+            tasks = decode_message(payload)
+            for task in tasks if route == BATCH_ROUTE else [tasks]:
+                self._add_task(task)
+
+    def _add_task(self, task):
+        key = (task.get("dataflow"), task.get("transformation"),
+               task.get("id"), task.get("sub"))
+        entry = self._tasks.get(key)
+        if entry is None:
+            self._tasks[key] = entry = [TASK_ROUTE, task]
+            self._entries.append(entry)
+            return
+        # the later message updates the task, and the sets of both are kept
+        merged = entry[1]
+        sets = merged.get("sets", []) + task.get("sets", [])
+        merged.update(task)
+        if sets:
+            merged["sets"] = sets
+        self.coalesced += 1
+
+    def flush(self):
+        """Append the buffered messages to the spool."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+                self._tasks = {}
+                self._payloads = set()
+            for route, message in entries:
+                self._spool.write(encode_record(route, message))
+            if entries:
+                # the replayer only forwards sealed segments
+                self._spool.seal()
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self._max_delay):
+            self.flush()
+
+    def start(self):
+        """Listen on the socket and forward from background threads."""
+        if os.path.exists(self._path):
+            os.remove(self._path)
+        self._server = _UnixServer(self._path, _FrameHandler)
+        self._server.sidecar = self
+        for target in (self._server.serve_forever, self._flush_periodically):
+            thread = threading.Thread(target=target, name="dfa-sidecar")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        self._replayer.start(self._poll_interval)
+        return self
+
+    def stop(self):
+        """ Stop listening, spool the buffered messages and forward what
+            is left in the spool.
+        """
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            if os.path.exists(self._path):
+                os.remove(self._path)
+        self.flush()
+        self._spool.close()
+        self._replayer.stop()
+        SpoolReplayer(self._spool.directory, self._transport,
+                      batch_size=self._batch_size).run()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Aggregate the provenance of the local processes and "
+                    "forward it to Dataflow Analyzer.")
+    parser.add_argument("spool")
+    parser.add_argument("--socket", default=None)
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--max-delay", type=float, default=0.1,
+                        help="seconds messages are buffered")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    sidecar = Sidecar(args.spool, args.socket, HTTPTransport(args.url),
+                      args.max_delay, args.batch_size)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopped.set())
+    sidecar.start()
+    print(sidecar.path, flush=True)
+    try:
+        while not stopped.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sidecar.stop()
+    print(json.dumps({"received": sidecar.received,
+                      "duplicates": sidecar.duplicates,
+                      "coalesced": sidecar.coalesced}))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,48 @@
+import time
+from contextlib import ContextDecorator
+from datetime import datetime
+from .method_type import MethodType
+
+
+def format_ns(timestamp):
+    """ Format a time.time_ns() timestamp with nanosecond resolution.
+
+    Args:
+        - timestamp (:obj:`int`): Nanoseconds since the epoch.
+    """
+    seconds, nanoseconds = divmod(timestamp, 1000000000)
+    return "{0}.{1:09d}".format(
+        datetime.fromtimestamp(seconds).strftime('%Y-%m-%d %H:%M:%S'),
+        nanoseconds)
+
+
+class Span(ContextDecorator):
+    """
+    This class defines a timed span of a task, measured with a monotonic
+    nanosecond clock. It is used as a context manager or as a decorator.
+
+    Attributes:
+        - task (:obj:`Task`): The task the span belongs to.
+        - method (:obj:`MethodType`, optional): What the span measures.
+    """
+    def __init__(self, task, method=MethodType.COMPUTATION):
+        assert isinstance(method, MethodType), \
+            "The span method must be a MethodType object."
+        self.task = task
+        self.method = method
+        self.start = None
+        self.clock = None
+
+    def _recreate_cm(self):
+        # every decorated call gets its own span
+        return Span(self.task, self.method)
+
+    def __enter__(self):
+        self.start = time.time_ns()
+        self.clock = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.task.add_span(self.method, self.start,
+                           time.perf_counter_ns() - self.clock)
+        return False
@@ -0,0 +1,425 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+from .batch import TaskBatch, TASK_ROUTE
+from .fsync_policy import FsyncPolicy
+from .transport import HTTPTransport, encode_message, get_default_transport
+
+# a segment is written as .open by a single spool, and renamed to .jsonl
+# (sealed) when it is complete; with delete=False a replayed segment is
+# renamed to .replayed
+OPEN_SUFFIX = ".open"
+SEGMENT_SUFFIX = ".jsonl"
+REPLAYED_SUFFIX = ".replayed"
+CHECKPOINT_FILE = "checkpoint.json"
+REJECTED_FILE = "rejected.jsonl"
+_writers = itertools.count()
+
+
+def encode_record(route, message):
+    """ Encode a (route, message) pair as one spool line.
+
+    Args:
+        - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+        - message (:obj:`dict` or :obj:`bytes`): The json message.
+    """
+    return b'{"route":' + encode_message(route) + b',"message":' + \
+        encode_message(message) + b"}\n"
+
+
+def _segments(directory, suffixes):
+    segments = []
+    for suffix in suffixes:
+        for segment in glob.glob(os.path.join(directory, "*" + suffix)):
+            name = os.path.basename(segment)
+            if name != REJECTED_FILE:
+                segments.append((name[:-len(suffix)], segment))
+    return [segment for name, segment in sorted(segments)]
+
+
+def _is_running(pid):
+    if os.name != "posix":
+        # without signal 0, every writer is taken as running
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def seal_orphans(directory):
+    """ Seal the segments left open by processes of this host that are no
+        longer running, so they are replayed. Returns their number.
+
+    Args:
+        - directory (:obj:`str`): Spool directory.
+    """
+    count = 0
+    for segment in glob.glob(os.path.join(directory, "*" + OPEN_SUFFIX)):
+        try:
+            pid = int(os.path.basename(segment).split("-")[1])
+        except (IndexError, ValueError):
+            continue
+        if pid == os.getpid() or _is_running(pid):
+            continue
+        try:
+            os.replace(segment, segment[:-len(OPEN_SUFFIX)] + SEGMENT_SUFFIX)
+        except FileNotFoundError:
+            # sealed by another replayer
+            continue
+        count += 1
+    return count
+
+
+def read_records(directory):
+    """ Yield the (route, message) pairs of every sealed or replayed
+        segment of a spool directory, oldest first. A partial last line is
+        skipped.
+
+    Args:
+        - directory (:obj:`str`): Spool directory.
+    """
+    for segment in _segments(directory, (SEGMENT_SUFFIX, REPLAYED_SUFFIX)):
+        with open(segment, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    continue
+                yield record["route"], record["message"]
+
+
+class Spool(object):
+    """
+    This class defines a file-backed, append-only write-ahead spool. It is
+    used as a transport: every message is appended to the current segment
+    of a directory of JSONL files, so capturing provenance never depends on
+    the Dataflow Analyzer being up. A :obj:`SpoolReplayer` later sends the
+    spooled messages.
+
+    Many processes can share a directory: every spool writes segments of
+    its own, named after its process, and seals a segment by renaming it
+    when the segment is full, old or closed. Only sealed segments are
+    replayed, so :meth:`close` must be called for the last one. Segments
+    left open by processes that died are sealed by :func:`seal_orphans`,
+    which new spools and replayers run on the directory.
+
+    Attributes:
+        - directory (:obj:`str`): Spool directory.
+        - segment_size (:obj:`int`, optional): Bytes after which a new
+          segment starts.
+        - fsync (:obj:`FsyncPolicy`, optional): When records are forced to
+          disk.
+        - fsync_interval (:obj:`float`, optional): Seconds between fsyncs with
+          :obj:`FsyncPolicy.INTERVAL`.
+        - segment_age (:obj:`float`, optional): Seconds after which a new
+          segment starts, None disables the time bound.
+    """
+    def __init__(self, directory, segment_size=64 * 1024 * 1024,
+                 fsync=FsyncPolicy.INTERVAL, fsync_interval=1.0,
+                 segment_age=60.0):
+        assert isinstance(fsync, FsyncPolicy), \
+            "The fsync must be an instance of FsyncPolicy."
+        self._directory = directory
+        self._segment_size = segment_size
+        self._fsync = fsync
+        self._fsync_interval = fsync_interval
+        self._segment_age = segment_age
+        self._lock = threading.Lock()
+        self._writer = next(_writers)
+        self._file = None
+        self._path = None
+        self._pid = None
+        self._size = 0
+        self._opened = None
+        self._last_sync = time.time()
+        os.makedirs(directory, exist_ok=True)
+        seal_orphans(directory)
+
+    @property
+    def directory(self):
+        """Get the spool directory."""
+        return self._directory
+
+    def _open_segment(self):
+        self._seal()
+        name = "{0:016d}-{1}-{2}{3}".format(int(time.time() * 1e6),
+                                            os.getpid(), self._writer,
+                                            OPEN_SUFFIX)
+        self._path = os.path.join(self._directory, name)
+        self._file = open(self._path, "ab")
+        self._pid = os.getpid()
+        self._size = 0
+        self._opened = time.time()
+
+    def _seal(self):
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._file = None
+        os.replace(self._path, self._path[:-len(OPEN_SUFFIX)] +
+                   SEGMENT_SUFFIX)
+
+    def _sync(self):
+        self._file.flush()
+        if self._fsync != FsyncPolicy.NEVER:
+            os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+    def post(self, route, message):
+        """ Append a message to the spool.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict` or :obj:`bytes`): The json message.
+        """
+        self.write(encode_record(route, message))
+
+    def write(self, line):
+        """ Append an already encoded spool line.
+
+        Args:
+            - line (:obj:`bytes`): A line built by :func:`encode_record`.
+        """
+        with self._lock:
+            if self._file is not None and self._pid != os.getpid():
+                # a forked process writes segments of its own
+                self._file.close()
+                self._file = None
+            if self._file is None or self._size >= self._segment_size or (
+                    self._segment_age is not None and
+                    time.time() - self._opened >= self._segment_age):
+                self._open_segment()
+            self._file.write(line)
+            self._size += len(line)
+            if self._fsync == FsyncPolicy.ALWAYS:
+                self._sync()
+            elif self._fsync == FsyncPolicy.INTERVAL and \
+                    time.time() - self._last_sync >= self._fsync_interval:
+                self._sync()
+            else:
+                self._file.flush()
+
+    def seal(self):
+        """ Seal the current segment, so it can be replayed. The next
+            message starts a new segment.
+        """
+        with self._lock:
+            self._seal()
+
+    def close(self):
+        """Force the current segment to disk and seal it."""
+        self.seal()
+
+
+class SpoolReplayer(object):
+    """
+    This class defines a replayer that streams the sealed segments of a
+    spool to the Dataflow Analyzer API, oldest first. Task messages are
+    grouped in batches and the position reached is checkpointed after
+    every batch, so an interrupted replay resumes where it stopped.
+    Messages rejected by the server are moved to a 'rejected.jsonl' file.
+
+    Attributes:
+        - directory (:obj:`str`): Spool directory.
+        - transport (optional): Transport used to send the messages. Defaults
+          to the shared :obj:`HTTPTransport`.
+        - rate (:obj:`float`, optional): Maximum messages per second, None
+          replays at bulk speed.
+        - batch_size (:obj:`int`, optional): Task messages per request.
+        - delete (:obj:`bool`, optional): Remove fully replayed segments,
+          else they are renamed with the '.replayed' suffix.
+    """
+    def __init__(self, directory, transport=None, rate=None, batch_size=500,
+                 delete=True):
+        self._directory = directory
+        self._transport = transport
+        self._rate = rate
+        self._batch_size = batch_size
+        self._delete = delete
+        self._stopped = threading.Event()
+        self._thread = None
+        self._started = None
+        self._replayed_at_start = 0
+        self.replayed = 0
+        self.rejected = 0
+
+    def segments(self):
+        """Return the sealed segments left to replay, oldest first."""
+        return _segments(self._directory, (SEGMENT_SUFFIX,))
+
+    def _read_checkpoint(self):
+        path = os.path.join(self._directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return None, 0
+        with open(path) as f:
+            checkpoint = json.load(f)
+        return checkpoint["segment"], checkpoint["offset"]
+
+    def _write_checkpoint(self, segment, offset):
+        path = os.path.join(self._directory, CHECKPOINT_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"segment": os.path.basename(segment),
+                       "offset": offset}, f)
+        os.replace(path + ".tmp", path)
+
+    def _reject(self, failures):
+        with open(os.path.join(self._directory, REJECTED_FILE), "ab") as f:
+            for message, error in failures:
+                f.write(encode_record(TASK_ROUTE, message))
+        self.rejected += len(failures)
+
+    def run(self, follow=False, poll_interval=1.0):
+        """ Replay the spool from the last checkpoint.
+
+        Args:
+            - follow (:obj:`bool`, optional): Keep waiting for new records.
+            - poll_interval (:obj:`float`, optional): Seconds between polls
+              when following.
+
+        Returns False when the replay stopped because the server could not
+        be reached, True otherwise.
+        """
+        transport = self._transport or get_default_transport()
+        self._started = time.time()
+        self._replayed_at_start = self.replayed
+        while not self._stopped.is_set():
+            reachable = self._replay_once(transport)
+            if not follow:
+                return reachable
+            self._stopped.wait(poll_interval)
+        return True
+
+    def _replay_once(self, transport):
+        seal_orphans(self._directory)
+        name, offset = self._read_checkpoint()
+        for segment in self.segments():
+            start = offset if os.path.basename(segment) == name else 0
+            if not self._replay_segment(transport, segment, start):
+                return False
+            if self._stopped.is_set():
+                return True
+            # a sealed segment is complete, it is not replayed again
+            if self._delete:
+                os.remove(segment)
+            else:
+                os.replace(segment, segment[:-len(SEGMENT_SUFFIX)] +
+                           REPLAYED_SUFFIX)
+        return True
+
+    def _replay_segment(self, transport, segment, offset):
+        pending = []
+        position = offset
+        with open(segment, "rb") as f:
+            f.seek(offset)
+            while not self._stopped.is_set():
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # the last line of a process that died while writing
+                    break
+                try:
+                    record = json.loads(line.decode("utf-8"))
+                except ValueError:
+                    record = None
+                if record is not None and record["route"] == TASK_ROUTE:
+                    pending.append(record["message"])
+                elif record is not None:
+                    if not self._send_tasks(transport, pending, segment,
+                                            position):
+                        return False
+                    pending = []
+                    if not self._send(transport, record):
+                        return False
+                position += len(line)
+                if not pending or len(pending) >= self._batch_size:
+                    if not self._send_tasks(transport, pending, segment,
+                                            position):
+                        return False
+                    pending = []
+        return self._send_tasks(transport, pending, segment, position)
+
+    def _send(self, transport, record):
+        self._throttle(1)
+        try:
+            r = transport.post(record["route"], record["message"])
+        except Exception:
+            return False
+        if r is not None and r.status_code >= 500:
+            return False
+        self.replayed += 1
+        return True
+
+    def _send_tasks(self, transport, messages, segment, position):
+        if messages:
+            self._throttle(len(messages))
+            batch = TaskBatch(transport, max_size=self._batch_size,
+                              max_delay=None)
+            failures = batch.send(messages)
+            if any(isinstance(error, Exception)
+                   for message, error in failures):
+                return False
+            if failures:
+                self._reject(failures)
+            self.replayed += len(messages) - len(failures)
+        self._write_checkpoint(segment, position)
+        return True
+
+    def _throttle(self, count):
+        if not self._rate:
+            return
+        sent = self.replayed - self._replayed_at_start + count
+        delay = sent / self._rate - (time.time() - self._started)
+        if delay > 0:
+            self._stopped.wait(delay)
+
+    def start(self, poll_interval=1.0):
+        """ Follow the spool from a background thread.
+
+        Args:
+            - poll_interval (:obj:`float`, optional): Seconds between polls.
+        """
+        self._thread = threading.Thread(target=self.run,
+                                        args=(True, poll_interval))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop replaying after the current batch."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a dfa_lib_python spool to Dataflow Analyzer.")
+    parser.add_argument("directory")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--rate", type=float, default=None,
+                        help="maximum messages per second")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--follow", action="store_true")
+    parser.add_argument("--keep", action="store_true",
+                        help="keep fully replayed segments")
+    args = parser.parse_args()
+    replayer = SpoolReplayer(args.directory, HTTPTransport(args.url),
+                             args.rate, args.batch_size, not args.keep)
+    reachable = replayer.run(follow=args.follow)
+    print("replayed: {0} rejected: {1}".format(replayer.replayed,
+                                               replayer.rejected))
+    return 0 if reachable else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,380 @@
+import argparse
+import json
+import sqlite3
+import threading
+from .batch import TaskBatch, DATAFLOW_ROUTE, TASK_ROUTE, BATCH_ROUTE
+from .transport import HTTPTransport, decode_message, encode_message, \
+    get_default_transport
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS message (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    route TEXT NOT NULL,
+    body BLOB NOT NULL,
+    exported INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dataflow (
+    tag TEXT PRIMARY KEY,
+    specification TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transformation (
+    dataflow TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (dataflow, tag)
+);
+CREATE TABLE IF NOT EXISTS data_set (
+    dataflow TEXT NOT NULL,
+    transformation TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    type TEXT NOT NULL,
+    dependency TEXT,
+    PRIMARY KEY (dataflow, transformation, tag)
+);
+CREATE TABLE IF NOT EXISTS attribute (
+    dataflow TEXT NOT NULL,
+    set_tag TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (dataflow, set_tag, position)
+);
+CREATE TABLE IF NOT EXISTS task (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dataflow TEXT NOT NULL,
+    transformation TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    sub_id TEXT,
+    status TEXT,
+    workspace TEXT,
+    resource TEXT,
+    output TEXT,
+    error TEXT,
+    dependency TEXT,
+    performances TEXT,
+    UNIQUE (dataflow, transformation, identifier)
+);
+CREATE TABLE IF NOT EXISTS element (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id INTEGER NOT NULL REFERENCES task(id),
+    set_tag TEXT NOT NULL,
+    "values" TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS file_value (
+    element_id INTEGER NOT NULL REFERENCES element(id),
+    attribute TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS task_identifier ON task(identifier);
+CREATE INDEX IF NOT EXISTS element_set_tag ON element(set_tag, task_id);
+CREATE INDEX IF NOT EXISTS file_value_path ON file_value(path);
+CREATE INDEX IF NOT EXISTS message_exported ON message(exported, seq);
+"""
+
+_TASK_FIELDS = ("sub", "status", "workspace", "resource", "output", "error")
+
+
+class SQLiteBackend(object):
+    """
+    This class defines a transport that stores provenance in a local SQLite
+    database instead of sending it to Dataflow Analyzer. Messages are kept
+    in arrival order for a later export and mirrored into dataflow,
+    transformation, set, attribute, task and element tables, so lineage
+    questions can be answered locally. Values of FILE attributes are
+    indexed by path.
+
+    The database uses WAL mode and messages are written in batched
+    transactions: a batch is committed every ``batch_size`` messages,
+    ``commit_interval`` seconds after its first message, or on
+    :meth:`flush`. A message that cannot be stored is rolled back alone
+    and the error is raised.
+
+    Attributes:
+        - path (:obj:`str`): Database file.
+        - batch_size (:obj:`int`, optional): Messages per transaction.
+        - commit_interval (:obj:`float`, optional): Seconds a message may
+          wait for its commit, None disables the time bound.
+    """
+    def __init__(self, path, batch_size=500, commit_interval=1.0):
+        assert isinstance(batch_size, int) and batch_size > 0, \
+            "The batch size must be a positive integer."
+        self._path = path
+        self._batch_size = batch_size
+        self._commit_interval = commit_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._timer = None
+        self._connection = sqlite3.connect(path, check_same_thread=False,
+                                           isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+        self._file_attributes = {}
+
+    @property
+    def path(self):
+        """Get the database file."""
+        return self._path
+
+    def post(self, route, message):
+        """ Store a message in the database.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict`, :obj:`list` or :obj:`bytes`): The json
+              message.
+        """
+        body = message if isinstance(message, bytes) else \
+            encode_message(message)
+        message = decode_message(body)
+        with self._lock:
+            db = self._connection
+            if self._pending == 0:
+                db.execute("BEGIN")
+            db.execute("SAVEPOINT message")
+            try:
+                if route == BATCH_ROUTE:
+                    for task in message:
+                        self._store(TASK_ROUTE, encode_message(task), task)
+                else:
+                    self._store(route, body, message)
+            except Exception:
+                db.execute("ROLLBACK TO message")
+                db.execute("RELEASE message")
+                self._file_attributes = {}
+                if self._pending == 0:
+                    db.execute("ROLLBACK")
+                raise
+            db.execute("RELEASE message")
+            self._pending += 1
+            if self._pending >= self._batch_size:
+                self._commit()
+            elif self._pending == 1 and self._commit_interval is not None:
+                self._timer = threading.Timer(self._commit_interval,
+                                              self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return None
+
+    def _store(self, route, body, message):
+        self._connection.execute(
+            "INSERT INTO message (route, body) VALUES (?, ?)",
+            (route, body))
+        if route == DATAFLOW_ROUTE:
+            self._store_dataflow(message)
+        elif route == TASK_ROUTE:
+            self._store_task(message)
+
+    def _store_dataflow(self, dataflow):
+        db = self._connection
+        tag = dataflow["tag"]
+        if not dataflow.get("delta"):
+            db.execute("INSERT OR REPLACE INTO dataflow VALUES (?, ?)",
+                       (tag, json.dumps(dataflow)))
+        for transformation in dataflow.get("transformations", []):
+            db.execute("INSERT OR IGNORE INTO transformation VALUES (?, ?)",
+                       (tag, transformation["tag"]))
+            for set in transformation.get("sets", []):
+                db.execute(
+                    "INSERT OR IGNORE INTO data_set VALUES (?, ?, ?, ?, ?)",
+                    (tag, transformation["tag"], set["tag"], set["type"],
+                     set.get("dependency")))
+                for position, attribute in enumerate(
+                        set.get("attributes", [])):
+                    db.execute(
+                        "INSERT OR REPLACE INTO attribute "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (tag, set["tag"], position,
+                         attribute["name"].lower(), attribute["type"]))
+        self._file_attributes = {}
+
+    def _get_file_attributes(self, dataflow, set_tag):
+        key = (dataflow, set_tag)
+        attributes = self._file_attributes.get(key)
+        if attributes is None:
+            attributes = self._connection.execute(
+                "SELECT position, name FROM attribute WHERE dataflow = ? "
+                "AND set_tag = ? AND type = 'FILE'", key).fetchall()
+            self._file_attributes[key] = attributes
+        return attributes
+
+    def _store_task(self, task):
+        db = self._connection
+        dataflow = task["dataflow"]
+        key = (dataflow, task["transformation"], task["id"])
+        fields = [task.get(x) for x in _TASK_FIELDS]
+        dependency = json.dumps(task["dependency"]) \
+            if task.get("dependency") else None
+        row = db.execute("SELECT id, performances FROM task "
+                         "WHERE dataflow = ? AND transformation = ? "
+                         "AND identifier = ?", key).fetchone()
+        if row is None:
+            task_id = db.execute(
+                "INSERT INTO task (dataflow, transformation, identifier, "
+                "sub_id, status, workspace, resource, output, error, "
+                "dependency, performances) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                key + tuple(fields) + (
+                    dependency,
+                    json.dumps(task.get("performances", [])))).lastrowid
+        else:
+            task_id = row[0]
+            performances = json.loads(row[1] or "[]")
+            performances.extend(x for x in task.get("performances", [])
+                                if x not in performances)
+            db.execute(
+                "UPDATE task SET sub_id = ?, status = ?, workspace = ?, "
+                "resource = ?, output = ?, error = ?, "
+                "dependency = COALESCE(?, dependency), performances = ? "
+                "WHERE id = ?",
+                tuple(fields) + (dependency, json.dumps(performances),
+                                 task_id))
+        for set in task.get("sets", []):
+            files = self._get_file_attributes(dataflow, set["tag"])
+            for values in set.get("elements", []):
+                if not isinstance(values, list):
+                    values = [values]
+                element_id = db.execute(
+                    "INSERT INTO element (task_id, set_tag, \"values\") "
+                    "VALUES (?, ?, ?)",
+                    (task_id, set["tag"], json.dumps(values))).lastrowid
+                if files:
+                    db.executemany(
+                        "INSERT INTO file_value VALUES (?, ?, ?)",
+                        [(element_id, name, str(values[position]))
+                         for position, name in files
+                         if position < len(values)])
+
+    def _commit(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending:
+            self._connection.execute("COMMIT")
+            self._pending = 0
+
+    def flush(self):
+        """Commit the pending messages."""
+        with self._lock:
+            self._commit()
+
+    def close(self):
+        """Commit the pending messages and close the database."""
+        with self._lock:
+            self._commit()
+            self._connection.close()
+
+    def query(self, sql, parameters=()):
+        """ Run a read query on the database and return its rows.
+
+        Args:
+            - sql (:obj:`str`): The SQL query.
+            - parameters (:obj:`tuple`, optional): Query parameters.
+        """
+        with self._lock:
+            self._commit()
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def file_lineage(self, path):
+        """ Return the tasks that used or produced a file, as
+            (dataflow, transformation, task id, set tag, set type, status)
+            rows in the order they were stored.
+
+        Args:
+            - path (:obj:`str`): The value of a FILE attribute.
+        """
+        return self.query(
+            "SELECT t.dataflow, t.transformation, t.identifier, e.set_tag, "
+            "s.type, t.status FROM file_value f "
+            "JOIN element e ON e.id = f.element_id "
+            "JOIN task t ON t.id = e.task_id "
+            "LEFT JOIN data_set s ON s.dataflow = t.dataflow "
+            "AND s.transformation = t.transformation AND s.tag = e.set_tag "
+            "WHERE f.path = ? ORDER BY e.id", (path,))
+
+    def export(self, transport=None, batch_size=500):
+        """ Push the messages not exported yet to Dataflow Analyzer, in
+            the order they were stored. Task messages are sent in batches.
+
+        Args:
+            - transport (optional): Transport used to send the messages.
+              Defaults to the shared :obj:`HTTPTransport`.
+            - batch_size (:obj:`int`, optional): Task messages per request.
+
+        Returns an (exported, rejected) pair. Export stops at the first
+        message that cannot be delivered (server unreachable or HTTP 5xx),
+        which is retried by the next export.
+        """
+        transport = transport or get_default_transport()
+        batch = TaskBatch(transport, max_size=batch_size, max_delay=None)
+        exported = rejected = 0
+        while True:
+            rows = self.query("SELECT seq, route, body FROM message "
+                              "WHERE exported = 0 ORDER BY seq LIMIT ?",
+                              (batch_size,))
+            if not rows:
+                return exported, rejected
+            tasks = []
+            for seq, route, body in rows:
+                if route == TASK_ROUTE:
+                    tasks.append((seq, bytes(body)))
+                    continue
+                if tasks:
+                    break
+                try:
+                    r = transport.post(route, bytes(body))
+                except Exception:
+                    return exported, rejected
+                if r is not None and r.status_code >= 500:
+                    return exported, rejected
+                self._mark([seq], 1 if r is None or r.status_code < 400
+                           else 2)
+                exported += 1
+            if not tasks:
+                continue
+            failures = batch.send([x[1] for x in tasks])
+            if any(isinstance(e, Exception) for message, e in failures):
+                return exported, rejected
+            failed = set(id(message) for message, error in failures)
+            self._mark([seq for seq, body in tasks if id(body) not in failed],
+                       1)
+            self._mark([seq for seq, body in tasks if id(body) in failed], 2)
+            exported += len(tasks) - len(failures)
+            rejected += len(failures)
+
+    def _mark(self, seqs, state):
+        if not seqs:
+            return
+        with self._lock:
+            self._commit()
+            self._connection.executemany(
+                "UPDATE message SET exported = ? WHERE seq = ?",
+                [(state, x) for x in seqs])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a dfa_lib_python SQLite database to Dataflow "
+                    "Analyzer.")
+    parser.add_argument("database")
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    backend = SQLiteBackend(args.database)
+    exported, rejected = backend.export(HTTPTransport(args.url),
+                                        args.batch_size)
+    pending = backend.query("SELECT COUNT(*) FROM message WHERE exported = 0")
+    backend.close()
+    print("exported: {0} rejected: {1} pending: {2}".format(
+        exported, rejected, pending[0][0]))
+    return 0 if not pending[0][0] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,200 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from .interning import DatasetReferences
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length)
+        status, body = self.server.standin.handle(self.path, payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        status, body = self.server.standin.stats(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(object):
+    """
+    This class defines an in-process stand-in for the Dataflow Analyzer
+    ingestion API. It answers '/pde/dataflow/json', '/pde/dataflow/{tag}'
+    and '/pde/task/json' like the real server, without a database, and
+    keeps request counters so client-side overheads can be measured.
+    Batches posted to '/pde/task/batch/json' are unpacked into single
+    tasks, interned datasets are expanded, and the counters are served on
+    '/standin/stats'.
+
+    Attributes:
+        - host (:obj:`str`, optional): Interface to bind.
+        - port (:obj:`int`, optional): Port to bind, 0 picks a free port.
+        - latency (:obj:`float`, optional): Seconds injected before each
+          answer.
+        - store (:obj:`bool`, optional): Keep every received message.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, store=False):
+        self.latency = latency
+        self.store = store
+        self.dataflows = []
+        self.dataflow_tags = set()
+        self.tasks = []
+        self.requests = 0
+        self.bytes_received = 0
+        self.references = DatasetReferences()
+        self._lock = threading.Lock()
+        self._server = _ThreadingHTTPServer((host, port), _StandInHandler)
+        self._server.standin = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """Get the base url the stand-in answers on."""
+        host, port = self._server.server_address[:2]
+        return "http://{0}:{1}".format(host, port)
+
+    def handle(self, route, payload):
+        """ Answer a request, returning the (status, body) pair.
+
+        Args:
+            - route (:obj:`str`): Requested route.
+            - payload (:obj:`bytes`): Request body.
+        """
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(payload)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        route = "/" + route.lstrip("/")
+        if route == "/pde/task/json":
+            if b'"ref":"' in payload:
+                try:
+                    self._record(self.tasks, None, self.references.expand(
+                        json.loads(payload.decode("utf-8"))))
+                except KeyError as e:
+                    return 409, json.dumps(e.args[0]).encode("utf-8")
+                return 200, b"{}"
+            self._record(self.tasks, payload)
+        elif route == "/pde/dataflow/json":
+            dataflow = json.loads(payload.decode("utf-8"))
+            with self._lock:
+                if dataflow.get("delta") and \
+                        dataflow["tag"] not in self.dataflow_tags:
+                    return 409, b"{}"
+                self.dataflow_tags.add(dataflow["tag"])
+            self._record(self.dataflows, None, dataflow)
+        elif route == "/pde/task/batch/json":
+            return 200, self._unpack(payload)
+        else:
+            return 404, b"{}"
+        return 200, b"{}"
+
+    def stats(self, route):
+        """ Answer a '/standin/stats' request with the request counters, or
+            a '/pde/dataflow/{tag}' request for a registered dataflow,
+            returning the (status, body) pair.
+
+        Args:
+            - route (:obj:`str`): Requested route.
+        """
+        if route.startswith("/pde/dataflow/"):
+            tag = route[len("/pde/dataflow/"):]
+            with self._lock:
+                if tag not in self.dataflow_tags:
+                    return 404, b"{}"
+            return 200, json.dumps({"tag": tag, "delta": True}).encode(
+                "utf-8")
+        if route.rstrip("/") != "/standin/stats":
+            return 404, b"{}"
+        with self._lock:
+            counters = {"requests": self.requests,
+                        "bytes_received": self.bytes_received}
+        return 200, json.dumps(counters).encode("utf-8")
+
+    def _unpack(self, payload):
+        results = []
+        for message in json.loads(payload.decode("utf-8")):
+            if not isinstance(message, dict) or "id" not in message:
+                results.append({"status": 400, "error": "Invalid task."})
+                continue
+            try:
+                self.references.expand(message)
+            except KeyError as e:
+                results.append({"id": message["id"], "status": 400,
+                                "error": e.args[0]})
+                continue
+            if self.store:
+                with self._lock:
+                    self.tasks.append(message)
+            results.append({"id": message["id"], "status": 200})
+        return json.dumps(results).encode("utf-8")
+
+    def _record(self, target, payload, message=None):
+        if self.store:
+            if message is None:
+                message = json.loads(payload.decode("utf-8"))
+            with self._lock:
+                target.append(message)
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a stand-in of the Dataflow Analyzer API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds injected before each answer")
+    args = parser.parse_args()
+    server = StandInServer(args.host, args.port, args.latency)
+    print(server.url, flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
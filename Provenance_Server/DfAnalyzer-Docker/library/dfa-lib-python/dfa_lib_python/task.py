@@ -1,13 +1,66 @@
-import requests
 import os
-from .ProvenanceObject import ProvenanceObject
+import time
+from .ProvenanceObject import ProvenanceObject, _field_plan, dumps, encode_row
 from .dependency import Dependency
 from .task_status import TaskStatus
-from .dataset import DataSet
+from .dataset import DataSet, encode_dataset
+from .element import Element
+from .hashing import hashed_dataset
 from .performance import Performance
+from .method_type import MethodType
+from .span import Span, format_ns
+from .transport import get_default_transport
+from .shipper import BackgroundShipper
+from .overflow_policy import OverflowPolicy
+from .task_id import next_id
 from datetime import datetime
 
 dfa_url = os.environ.get('DFA_URL',"http://localhost:22000/")
+_shipper = None
+_heads = {}
+_variable_plans = {}
+
+
+def enable_async(maxsize=10000, overflow=OverflowPolicy.BLOCK,
+                 spill_path=None, transport=None):
+    """ Ship every Task without an explicit transport from a background
+        thread. Task.begin() and Task.end() then only enqueue their message.
+
+    Args:
+        - maxsize (:obj:`int`, optional): Maximum number of queued messages.
+        - overflow (:obj:`OverflowPolicy`, optional): Behavior when the
+          queue is full.
+        - spill_path (:obj:`str`, optional): File used by
+          :obj:`OverflowPolicy.SPILL`.
+        - transport (optional): Transport used by the background thread.
+    """
+    global _shipper
+    disable_async()
+    _shipper = BackgroundShipper(transport, maxsize, overflow, spill_path)
+    return _shipper
+
+
+def disable_async(timeout=None):
+    """ Drain the background queue and go back to synchronous saves.
+
+    Args:
+        - timeout (:obj:`float`, optional): Maximum seconds to wait.
+    """
+    global _shipper
+    if _shipper is not None:
+        _shipper.close(timeout)
+        _shipper = None
+
+
+def flush(timeout=None):
+    """ Wait until every Task queued by the asynchronous mode was sent.
+
+    Args:
+        - timeout (:obj:`float`, optional): Maximum seconds to wait.
+    """
+    if _shipper is None:
+        return True
+    return _shipper.flush(timeout)
 
 
 class Task(ProvenanceObject):
@@ -15,7 +68,9 @@ class Task(ProvenanceObject):
     This class defines a dataflow task.
 
     Attributes:
-        - id (:obj:`str`): Task Id.
+        - id (:obj:`str`): Task Id. When None, an id is given by
+          ``Task.ids``, by default the 64-bit ids of :func:`task_id.next_id`,
+          unique across threads, processes and hosts.
         - dataflow_tag (:obj:`str`): Dataflow tag.
         - transformation_tag (:obj:`str`): Transformation tag.
         - sub_id (:obj:`str`, optional): Task Sub Id.
@@ -24,10 +79,23 @@ class Task(ProvenanceObject):
         - resource (:obj:`str`, optional): Task resource.
         - output (:obj:`str`, optional): Task output.
         - error (:obj:`str`, optional): Task error.
+        - transport (optional): Transport used to send the Task. Defaults
+          to the shared :obj:`HTTPTransport`.
     """
+    __slots__ = ("_workspace", "_resource", "_dependency", "_output",
+                 "_error", "_sets", "_status", "_dataflow", "_transformation",
+                 "_id", "_sub_id", "_performances", "dfa_url", "transport",
+                 "start_time", "end_time", "start_ns", "end_ns", "spans")
+    # time the save calls as PROVENANCE spans
+    profile_saves = True
+    # DatasetInterner of the repeated datasets, see interning.enable()
+    interner = None
+    # callable giving the id of a task created without one
+    ids = staticmethod(next_id)
+
     def __init__(self, id, dataflow_tag, transformation_tag,
                  sub_id="", dependency=None, workspace="", resource="",
-                 output="", error=""):
+                 output="", error="", transport=None):
         ProvenanceObject.__init__(self, transformation_tag)
         self._workspace = workspace
         self._resource = resource
@@ -38,12 +106,16 @@ class Task(ProvenanceObject):
         self._status = TaskStatus.READY.value
         self._dataflow = dataflow_tag.lower()
         self._transformation = transformation_tag.lower()
-        self._id = str(id)
+        self._id = str(id if id is not None else self.ids())
         self._sub_id = sub_id
         self._performances = []
         self.dfa_url = dfa_url
+        self.transport = transport
         self.start_time = None
         self.end_time = None
+        self.start_ns = None
+        self.end_ns = None
+        self.spans = {}
         if isinstance(dependency, Task):
             dependency = Dependency([dependency._tag], [dependency._id])
             self._dependency = dependency.get_specification()
@@ -71,13 +143,120 @@ class Task(ProvenanceObject):
             self.add_dataset(dataset)
 
     def add_dataset(self, dataset):
-        """ Add a dataset to the Task.
+        """ Add a dataset to the Task. The digests of the FILE values of
+            a set declared with :func:`hashing.hash_attributes` are added
+            when the dataset leaves them out.
 
         Args:
             - dataset (:obj:`DataSet`): A :obj:`DataSet` object.
         """
         assert isinstance(dataset, DataSet), "The dataset must be valid."
-        self._sets.append(dataset.get_specification())
+        self._sets.append(hashed_dataset(self._dataflow, dataset))
+
+    def stream_dataset(self, tag, rows, max_rows=10000,
+                       max_bytes=8 * 1024 * 1024):
+        """ Send the rows of a dataset in chunks while they are produced.
+            Every chunk is stored as the same dataset of this task, so the
+            memory used does not depend on the number of rows.
+
+        Args:
+            - tag (:obj:`str`): Dataset tag.
+            - rows: An iterable (e.g. a generator) of :obj:`Element` objects
+              or lists of values.
+            - max_rows (:obj:`int`, optional): Rows per chunk.
+            - max_bytes (:obj:`int`, optional): Encoded bytes per chunk.
+
+        Returns the number of rows sent.
+        """
+        transport = self.transport or _shipper or get_default_transport()
+        count = 0
+        for message, size in self._chunk_messages(tag, rows, max_rows,
+                                                  max_bytes):
+            start, clock = time.time_ns(), time.perf_counter_ns()
+            r = transport.post('/pde/task/json', message)
+            if r is not None:
+                print(r.status_code)
+            count += size
+            if self.profile_saves:
+                self.add_span(MethodType.PROVENANCE, start,
+                              time.perf_counter_ns() - clock)
+        return count
+
+    def _chunk_messages(self, tag, rows, max_rows, max_bytes):
+        assert isinstance(max_rows, int) and max_rows > 0, \
+            "The chunk size must be a positive integer."
+        tag = tag.lower()
+        chunk = []
+        size = 0
+        for row in rows:
+            if isinstance(row, Element):
+                row = row.values
+            assert isinstance(row, list), "The row must be valid."
+            row = encode_row(row)
+            if chunk and size + len(row) >= max_bytes:
+                yield self._chunk_message(tag, chunk), len(chunk)
+                chunk = []
+                size = 0
+            chunk.append(row)
+            size += len(row) + 1
+            if len(chunk) >= max_rows:
+                yield self._chunk_message(tag, chunk), len(chunk)
+                chunk = []
+                size = 0
+        if chunk:
+            yield self._chunk_message(tag, chunk), len(chunk)
+
+    def _chunk_message(self, tag, rows):
+        # the chunk is sent alone, the pending datasets and the
+        # performances are kept for the next save
+        dataset = DataSet(tag, [])
+        dataset.cached_json = encode_dataset(tag, ",".join(rows))
+        sets, performances = self._sets, self._performances
+        self._sets, self._performances = [dataset], []
+        try:
+            return self.to_json()
+        finally:
+            self._sets, self._performances = sets, performances
+
+    def span(self, method=MethodType.COMPUTATION):
+        """ Return a span timing a block or a function, to be used as
+            a context manager or as a decorator::
+
+                with task.span(MethodType.COMPUTATION):
+                    ...
+
+        Args:
+            - method (:obj:`MethodType`, optional): What the span measures.
+        """
+        return Span(self, method)
+
+    def add_span(self, method, start, duration):
+        """ Add a measured span. Spans are summed by method and sent as
+            one :obj:`Performance` per method when the task ends.
+
+        Args:
+            - method (:obj:`MethodType`): What the span measured.
+            - start (:obj:`int`): Start time, in nanoseconds since the epoch.
+            - duration (:obj:`int`): Duration in nanoseconds.
+        """
+        total = self.spans.get(method.value)
+        if total is None:
+            self.spans[method.value] = [start, start + duration, duration, 1]
+        else:
+            total[1] = max(total[1], start + duration)
+            total[2] += duration
+            total[3] += 1
+
+    def overhead(self):
+        """ Return the fraction of the task duration spent in PROVENANCE
+            spans, or None before the task ends.
+        """
+        if self.start_ns is None or self.end_ns is None or \
+                self.end_ns <= self.start_ns:
+            return None
+        total = self.spans.get(MethodType.PROVENANCE.value)
+        provenance = total[2] if total is not None else 0
+        return provenance / float(self.end_ns - self.start_ns)
 
     def set_status(self, status):
         """ Change the Task Status.
@@ -91,25 +270,111 @@ class Task(ProvenanceObject):
 
     def begin(self):
         """ Send a post request to the Dataflow Analyzer API to store the Task.
-        """        
-        self.set_status(TaskStatus.RUNNING)
-        self.start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        self.save()      
+        """
+        self._start()
+        self.save()
 
     def end(self):
         """ Send a post request to the Dataflow Analyzer API to store the Task.
         """
+        self._finish()
+        self.save()
+
+    def _start(self):
+        self.set_status(TaskStatus.RUNNING)
+        self.start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        self.start_ns = time.perf_counter_ns()
+
+    def _finish(self):
         self.set_status(TaskStatus.FINISHED)
-        self.end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        performance = Performance(self.start_time, self.end_time)
-        self._performances.append(performance.get_specification())
-        self.save()   
-        
+        self.end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        self.end_ns = time.perf_counter_ns()
+        performances = [Performance(self.start_time, self.end_time)]
+        for method, (start, end, duration, count) in sorted(
+                self.spans.items()):
+            performances.append(Performance(
+                format_ns(start), format_ns(end), method,
+                "duration_ns={0};spans={1}".format(duration, count)))
+        self._performances = self._performances + \
+            [x.get_specification() for x in performances]
+
+    def get_specification(self, prefix="_"):
+        """ Get the provenance json representation.
+
+        Args:
+            prefix (str): A prefix used to define which variables should be
+                used.
+        """
+        json = ProvenanceObject.get_specification(self, prefix)
+        if "sets" in json:
+            json["sets"] = [x.get_specification() for x in self._sets]
+        return json
+
+    def to_json(self, intern=False):
+        """ Get the Task json representation as bytes. The tag, dataflow
+            and transformation part is encoded once per transformation and
+            each dataset is encoded once, so only the task state and the new
+            datasets are encoded on every call.
+
+        Args:
+            - intern (:obj:`bool`, optional): Intern the datasets with
+              ``Task.interner``, only for transports answering right away.
+        """
+        key = (self._tag, self._dataflow, self._transformation)
+        head = _heads.get(key)
+        if head is None:
+            constant = {"tag": self._tag, "dataflow": self._dataflow,
+                        "transformation": self._transformation}
+            head = dumps(dict((k, v) for k, v in constant.items() if v))
+            head = _heads[key] = head[1:-1]
+        fragments = [head] if head else []
+        if self._sets:
+            sets = [x.to_json() for x in self._sets]
+            if intern and self.interner is not None:
+                sets = [self.interner.intern(self._dataflow, x) for x in sets]
+            fragments.append(b'"sets":[' + b",".join(sets) + b"]")
+        plan = _variable_plans.get(type(self))
+        if plan is None:
+            constant = ("tag", "dataflow", "transformation", "sets")
+            fields, has_dict = _field_plan(type(self), "_")
+            plan = (tuple(x for x in fields if x[1] not in constant),
+                    has_dict)
+            _variable_plans[type(self)] = plan
+        fields, has_dict = plan
+        variable = {}
+        for key, name in fields:
+            value = getattr(self, key)
+            if value:
+                variable[name] = value
+        if has_dict:
+            # fields of subclasses without slots, as in get_specification()
+            for key, value in self.__dict__.items():
+                if key[0] == "_" and value:
+                    variable[key.split("_")[1]] = value
+        if variable:
+            fragments.append(dumps(variable)[1:-1])
+        return b"{" + b",".join(fragments) + b"}"
+
     def save(self):
         """ Send a post request to the Dataflow Analyzer API to store the Task.
         """
-        url = dfa_url + '/pde/task/json'
-        message = self.get_specification()
-        r = requests.post(url, json=message)
-        print(r.status_code)
+        start, clock = time.time_ns(), time.perf_counter_ns()
+        transport = self.transport or _shipper or get_default_transport()
+        # a deferred transport cannot resend the datasets in full when a
+        # reference is unknown, so they are only interned when it answers
+        intern = self.interner is not None and \
+            getattr(transport, "answers", False)
+        r = transport.post('/pde/task/json', self.to_json(intern))
+        if r is not None and r.status_code == 409 and intern:
+            # a dataset reference is unknown, send the datasets in full
+            self.interner.clear()
+            r = transport.post('/pde/task/json', self.to_json())
+        if r is not None:
+            print(r.status_code)
         self._sets = []
+        if self.profile_saves:
+            self.add_span(MethodType.PROVENANCE, start,
+                          time.perf_counter_ns() - clock)
+        if self.end_ns is not None:
+            # the save of the end is part of the task duration
+            self.end_ns = time.perf_counter_ns()
@@ -0,0 +1,204 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# an id is the milliseconds since EPOCH_MS, the node, the process slot on
+# the node and a sequence within the millisecond, in 63 bits
+TIME_BITS = 41
+NODE_BITS = 10
+PROCESS_BITS = 7
+SEQUENCE_BITS = 5
+EPOCH_MS = 1577836800000  # 2020-01-01T00:00:00Z
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_PROCESS = (1 << PROCESS_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+slot_directory = os.environ.get('DFA_ID_SLOTS', os.path.join(
+    tempfile.gettempdir(), "dfa-id-slots"))
+
+
+def node_id():
+    """ Return the node id of this host: DFA_NODE_ID if it is set, else a
+        hash of the host name. Hashes of host names may collide, so
+        DFA_NODE_ID should be set on clusters of more than a few nodes.
+    """
+    value = os.environ.get('DFA_NODE_ID')
+    if value is not None:
+        node = int(value)
+        assert 0 <= node <= MAX_NODE, \
+            "DFA_NODE_ID must be between 0 and {0}.".format(MAX_NODE)
+        return node
+    return zlib.crc32(socket.gethostname().encode("utf-8")) & MAX_NODE
+
+
+def decompose(id):
+    """ Return the time, node, process slot and sequence of an id.
+
+    Args:
+        - id (:obj:`int` or :obj:`str`): Task id.
+    """
+    id = int(id)
+    sequence = id & MAX_SEQUENCE
+    id >>= SEQUENCE_BITS
+    process = id & MAX_PROCESS
+    id >>= PROCESS_BITS
+    node = id & MAX_NODE
+    id >>= NODE_BITS
+    return (datetime.fromtimestamp((id + EPOCH_MS) / 1000.0, timezone.utc),
+            node, process, sequence)
+
+
+class IdGenerator(object):
+    """
+    This class defines a generator of task ids that needs no coordination
+    between threads, processes or hosts. Ids are 64-bit integers ordered
+    by time, made of the milliseconds since 2020, the node id, the slot of
+    the process on the node and a sequence, so two generators never give
+    the same id as long as their nodes differ.
+
+    The slot of a process is the first of the ``MAX_PROCESS + 1`` lock
+    files of ``slot_directory`` it can lock, starting from its pid; a
+    slot is freed when its process exits, and a forked process takes a
+    slot of its own. Without file locks (e.g. on Windows), the slot is
+    the pid modulo ``MAX_PROCESS + 1``.
+
+    Up to ``MAX_SEQUENCE + 1`` ids are given per millisecond, and the
+    generator waits for the next millisecond beyond that. When the clock
+    goes back, ids keep the last millisecond until it catches up.
+
+    Attributes:
+        - node (:obj:`int`, optional): Node id. Defaults to
+          :func:`node_id`.
+        - process (:obj:`int`, optional): Process slot. Defaults to a
+          locked slot of ``slot_directory``.
+    """
+    def __init__(self, node=None, process=None):
+        self._node = node_id() if node is None else node
+        assert 0 <= self._node <= MAX_NODE, \
+            "The node must be between 0 and {0}.".format(MAX_NODE)
+        assert process is None or 0 <= process <= MAX_PROCESS, \
+            "The process must be between 0 and {0}.".format(MAX_PROCESS)
+        self._fixed_process = process
+        self._lock = threading.Lock()
+        self._slot = None
+        self._pid = None
+        self._process = None
+        self._last = -1
+        self._sequence = 0
+
+    @property
+    def node(self):
+        """Get the node id."""
+        return self._node
+
+    @property
+    def process(self):
+        """Get the process slot of this process."""
+        with self._lock:
+            self._check_process()
+            return self._process
+
+    def _acquire_slot(self):
+        pid = os.getpid()
+        if fcntl is None:
+            return pid & MAX_PROCESS, None
+        os.makedirs(slot_directory, exist_ok=True)
+        for offset in range(MAX_PROCESS + 1):
+            process = (pid + offset) & MAX_PROCESS
+            fd = os.open(os.path.join(slot_directory, "{0}-{1}.lock".format(
+                self._node, process)), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return process, fd
+        raise RuntimeError("No free task id slot in {0}, {1} processes of "
+                           "the node hold one.".format(slot_directory,
+                                                       MAX_PROCESS + 1))
+
+    def _check_process(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        if self._slot is not None:
+            # the descriptor inherited from the parent, closing it leaves
+            # the lock to the parent
+            os.close(self._slot)
+            self._slot = None
+        if self._fixed_process is not None and self._pid is None:
+            self._process = self._fixed_process
+        else:
+            self._process, self._slot = self._acquire_slot()
+        self._pid = pid
+        self._sequence = 0
+        # the previous owner of the slot may have given ids in this
+        # millisecond
+        self._last = self._wait(self._now())
+
+    @staticmethod
+    def _now():
+        return time.time_ns() // 1000000 - EPOCH_MS
+
+    def _wait(self, last):
+        now = self._now()
+        while now <= last:
+            time.sleep(0.0001)
+            now = self._now()
+        return now
+
+    def next_id(self):
+        """Return a new id."""
+        with self._lock:
+            self._check_process()
+            now = self._now()
+            if now > self._last:
+                self._last = now
+                self._sequence = 0
+            elif self._sequence < MAX_SEQUENCE:
+                # same millisecond, or the clock went back
+                self._sequence += 1
+            else:
+                self._last = self._wait(self._last)
+                self._sequence = 0
+            return (((self._last << NODE_BITS | self._node)
+                     << PROCESS_BITS | self._process)
+                    << SEQUENCE_BITS | self._sequence)
+
+    def __call__(self):
+        return self.next_id()
+
+    def close(self):
+        """Free the slot of this process."""
+        with self._lock:
+            if self._slot is not None and self._pid == os.getpid():
+                os.close(self._slot)
+            self._slot = None
+            self._pid = None
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    """Return the :obj:`IdGenerator` shared by the process."""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = IdGenerator()
+    return _generator
+
+
+def next_id():
+    """Return a new id of the shared :obj:`IdGenerator`."""
+    return get_generator().next_id()
@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from .ProvenanceObject import dumps
+
+dfa_url = os.environ.get('DFA_URL', "http://localhost:22000/")
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def encode_message(message):
+    """ Return a message as json bytes, messages already encoded by
+        ``to_json()`` are returned as they are.
+
+    Args:
+        - message (:obj:`dict` or :obj:`bytes`): The json message.
+    """
+    if isinstance(message, bytes):
+        return message
+    return dumps(message)
+
+
+def decode_message(message):
+    """ Return a message as a :obj:`dict`.
+
+    Args:
+        - message (:obj:`dict` or :obj:`bytes`): The json message.
+    """
+    if isinstance(message, bytes):
+        return json.loads(message.decode("utf-8"))
+    return message
+
+
+class HTTPTransport(object):
+    """
+    This class defines a pooled, keep-alive HTTP transport to the
+    Dataflow Analyzer API. A single transport can be shared by many
+    tasks and dataflows, so consecutive requests reuse the same TCP
+    connections instead of opening a new one per request.
+
+    Attributes:
+        - url (:obj:`str`, optional): Dataflow Analyzer base url.
+        - pool_connections (:obj:`int`, optional): Number of host pools to
+          keep.
+        - pool_maxsize (:obj:`int`, optional): Connections kept alive per host.
+        - connect_timeout (:obj:`float`, optional): Seconds to wait for a
+          connection.
+        - read_timeout (:obj:`float`, optional): Seconds to wait for an answer.
+        - max_retries (:obj:`int`, optional): Retries on connection errors.
+    """
+    # post() returns the answer of the server, see interning
+    answers = True
+
+    def __init__(self, url=None, pool_connections=1, pool_maxsize=10,
+                 connect_timeout=3.05, read_timeout=30, max_retries=0):
+        assert isinstance(pool_maxsize, int) and pool_maxsize > 0, \
+            "The pool size must be a positive integer."
+        self._url = (url or dfa_url).rstrip('/')
+        self._timeout = (connect_timeout, read_timeout)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              max_retries=max_retries)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    @property
+    def url(self):
+        """Get the Dataflow Analyzer base url."""
+        return self._url
+
+    @property
+    def timeout(self):
+        """Get the (connect, read) timeout tuple."""
+        return self._timeout
+
+    def post(self, route, message):
+        """ Send a post request with a json message to the Dataflow
+            Analyzer API.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/task/json'.
+            - message (:obj:`dict` or :obj:`bytes`): The json message, or
+              the json bytes built by ``to_json()``.
+        """
+        if isinstance(message, bytes):
+            return self._session.post(self._url + route, data=message,
+                                      headers=JSON_HEADERS,
+                                      timeout=self._timeout)
+        return self._session.post(self._url + route, json=message,
+                                  timeout=self._timeout)
+
+    def get(self, route):
+        """ Send a get request to the Dataflow Analyzer API.
+
+        Args:
+            - route (:obj:`str`): API route, e.g. '/pde/dataflow/{tag}'.
+        """
+        return self._session.get(self._url + route, timeout=self._timeout)
+
+    def close(self):
+        """Close every pooled connection."""
+        self._session.close()
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport():
+    """ Return the process-wide transport used by tasks and dataflows,
+        creating an :obj:`HTTPTransport` on first use.
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_lock:
+            if _default_transport is None:
+                _default_transport = HTTPTransport()
+    return _default_transport
+
+
+def set_default_transport(transport):
+    """ Replace the process-wide transport.
+
+    Args:
+        - transport: An object with a ``post(route, message)`` method.
+    """
+    global _default_transport
+    assert hasattr(transport, "post"), \
+        "The transport must have a post method."
+    with _default_lock:
+        _default_transport = transport
@@ -29,12 +29,15 @@ setup(
       'Development Status :: 3 - Alpha',
       'Intended Audience :: Developers',
       'Programming Language :: Python :: 3',
+      'Programming Language :: Python :: 3 :: Only',
     ],
+    python_requires='>=3.7',
     keywords='',
     packages=find_packages(exclude=['docs', 'tests*']),
     include_package_data=True,
     author='Vinícius Campos',
     install_requires=install_requires,
+    extras_require={'archive': ['pyarrow'], 'async': ['aiohttp']},
     dependency_links=dependency_links,
     author_email='silvcamposvinicius@gmail.com'
 )
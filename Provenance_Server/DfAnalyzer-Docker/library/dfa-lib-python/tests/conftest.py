@@ -0,0 +1,60 @@
+import os
+import threading
+import pytest
+from dfa_lib_python.standin import StandInServer
+from dfa_lib_python.transport import decode_message
+
+
+class RecordingTransport(object):
+    """
+    A transport keeping every posted message, answering with ``response``.
+    """
+    def __init__(self, response=None):
+        self.response = response
+        self.messages = []
+        self._lock = threading.Lock()
+
+    def post(self, route, message):
+        with self._lock:
+            self.messages.append((route, decode_message(message)))
+        return self.response
+
+    def routes(self):
+        return [route for route, message in self.messages]
+
+    def bodies(self, route=None):
+        return [message for r, message in self.messages
+                if route is None or r == route]
+
+
+class Response(object):
+    """A minimal requests.Response stand-in."""
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def recorder():
+    return RecordingTransport()
+
+
+@pytest.fixture
+def standin():
+    with StandInServer(store=True) as server:
+        yield server
+
+
+@pytest.fixture
+def server():
+    """ The url of a running Dataflow Analyzer, see
+        DfAnalyzer/test-server.sh. Tests using it are skipped unless
+        DFA_TEST_URL is set.
+    """
+    url = os.environ.get("DFA_TEST_URL")
+    if not url:
+        pytest.skip("DFA_TEST_URL is not set.")
+    return url.rstrip("/")
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.batch import TASK_ROUTE
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+pytest.importorskip("pyarrow")
+from dfa_lib_python.archive import ProvenanceArchive  # noqa: E402
+
+START = datetime(2024, 3, 1, 10, 15)
+
+
+def _register(archive):
+    split = Transformation("split")
+    split.set_sets([
+        Set("ivideo", SetType.INPUT, [
+            Attribute("camera", AttributeType.TEXT),
+            Attribute("path", AttributeType.FILE)]),
+        Set("oframe", SetType.OUTPUT, [
+            Attribute("path", AttributeType.FILE)])])
+    classify = Transformation("classify")
+    classify.set_sets([
+        Set("oframe", SetType.INPUT, [Attribute("path", AttributeType.FILE)])])
+    Dataflow("df", [split, classify], transport=archive).save()
+
+
+def _split(archive, id, camera, minutes, seconds, frames=("a.png",)):
+    start = START + timedelta(minutes=minutes)
+    end = start + timedelta(seconds=seconds)
+    sets = [{"tag": "ivideo", "elements": [[camera, "v.mp4"]]}]
+    if frames:
+        sets.append({"tag": "oframe", "elements": [[x] for x in frames]})
+    archive.post(TASK_ROUTE, {"id": str(id), "dataflow": "df",
+                              "transformation": "split", "status": "RUNNING"})
+    archive.post(TASK_ROUTE, {
+        "id": str(id), "dataflow": "df", "transformation": "split",
+        "status": "FINISHED", "sets": sets, "performances": [
+            {"startTime": str(start), "endTime": str(end)}]})
+
+
+def _archive(tmp_path):
+    archive = ProvenanceArchive(str(tmp_path))
+    _register(archive)
+    _split(archive, 1, "cam1", 0, 1.0)
+    _split(archive, 2, "cam1", 30, 2.0, frames=())
+    _split(archive, 3, "cam2", 50, 3.0)
+    _split(archive, 4, "cam1", 65, 4.0, frames=("b.png", "c.png"))
+    archive.flush()
+    return archive
+
+
+def test_tasks_are_archived_with_their_sub_id(tmp_path):
+    with ProvenanceArchive(str(tmp_path)) as archive:
+        for sub_id in ("a", "b"):
+            task = Task(1, "df", "tf", sub_id=sub_id, transport=archive)
+            task.add_dataset(DataSet("oa", [Element([1])]))
+            task.begin()
+            task.end()
+    rows = archive.table("tasks", columns=["task_id", "sub_id",
+                                           "status"]).to_pylist()
+    assert sorted((x["sub_id"], str(x["status"])) for x in rows) == [
+        ("a", "FINISHED"), ("a", "RUNNING"),
+        ("b", "FINISHED"), ("b", "RUNNING")]
+    assert archive.tasks().column("status").to_pylist() == ["FINISHED"]
+
+
+def test_tasks_are_counted_per_value_and_hour(tmp_path):
+    archive = _archive(tmp_path)
+    assert archive.tasks_per_hour("ivideo", "camera") == [
+        ("cam1", datetime(2024, 3, 1, 10), 2),
+        ("cam1", datetime(2024, 3, 1, 11), 1),
+        ("cam2", datetime(2024, 3, 1, 11), 1)]
+    assert archive.tasks_per_hour("ivideo", 0) == \
+        archive.tasks_per_hour("ivideo", "camera")
+
+
+def test_latency_percentiles_are_given_per_transformation(tmp_path):
+    archive = _archive(tmp_path)
+    assert archive.latency_percentiles((0.0, 0.5, 1.0)) == {
+        "split": {0.0: 1.0, 0.5: 2.5, 1.0: 4.0}}
+
+
+def test_finished_tasks_without_outputs_are_found(tmp_path):
+    archive = _archive(tmp_path)
+    assert archive.missing_outputs() == [("df", "split", "2", "oframe")]
+    assert archive.missing_outputs(dataflow="other") == []
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from dfa_lib_python import cache
+from dfa_lib_python.async_dataflow import AsyncDataflow
+from dfa_lib_python.async_task import AsyncTask
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.method_type import MethodType
+from conftest import RecordingTransport
+
+
+class AsyncRecordingTransport(RecordingTransport):
+    """ A recording transport with a post coroutine, answering with the
+        given status codes, or None once they are used.
+    """
+    def __init__(self, status_codes=()):
+        RecordingTransport.__init__(self)
+        self.status_codes = list(status_codes)
+
+    async def post(self, route, message):
+        RecordingTransport.post(self, route, message)
+        await asyncio.sleep(0)
+        if not self.status_codes:
+            return None
+        return AsyncResponse(self.status_codes.pop(0))
+
+
+class AsyncResponse(object):
+    """A minimal aiohttp.ClientResponse stand-in."""
+    def __init__(self, status):
+        self.status = status
+
+
+def test_datasets_are_kept_when_the_save_fails():
+    transport = AsyncRecordingTransport([500, 200])
+    task = AsyncTask(1, "df", "tf", transport=transport)
+    task.add_dataset(DataSet("ia", [Element([1])]))
+    asyncio.run(task.begin())
+    asyncio.run(task.end())
+    first, second = transport.bodies()
+    assert [x["tag"] for x in first["sets"]] == ["ia"]
+    assert [x["tag"] for x in second["sets"]] == ["ia"]
+    assert second["status"] == "FINISHED"
+
+
+def test_datasets_added_during_a_save_are_kept():
+    transport = AsyncRecordingTransport([200, 200])
+    task = AsyncTask(1, "df", "tf", transport=transport)
+
+    async def run():
+        task.add_dataset(DataSet("ia", [Element([1])]))
+        save = asyncio.ensure_future(task.begin())
+        await asyncio.sleep(0)
+        task.add_dataset(DataSet("oa", [Element([2])]))
+        await save
+        await task.end()
+
+    asyncio.run(run())
+    first, second = transport.bodies()
+    assert [x["tag"] for x in first["sets"]] == ["ia"]
+    assert [x["tag"] for x in second["sets"]] == ["oa"]
+
+
+def test_streamed_chunks_are_timed():
+    transport = AsyncRecordingTransport()
+    task = AsyncTask(1, "df", "tf", transport=transport)
+    rows = ([x] for x in range(5))
+    assert asyncio.run(task.stream_dataset("oa", rows, max_rows=2)) == 5
+    assert len(transport.bodies()) == 3
+    assert task.spans[MethodType.PROVENANCE.value][3] == 3
+
+
+def test_deferred_dataflow_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+    transport = AsyncRecordingTransport()
+    for _ in range(2):
+        assert asyncio.run(AsyncDataflow("df", transport=transport,
+                                         cache=True).save()) is None
+    assert len(transport.bodies()) == 2
+
+
+def test_tasks_are_stored_through_aiohttp(standin):
+    pytest.importorskip("aiohttp")
+    from dfa_lib_python.async_transport import AsyncHTTPTransport
+
+    async def run():
+        transport = AsyncHTTPTransport(standin.url)
+        tasks = [AsyncTask(x, "df", "tf", transport=transport)
+                 for x in range(10)]
+        await asyncio.gather(*[x.begin() for x in tasks])
+        await asyncio.gather(*[x.end() for x in tasks])
+        await transport.close()
+
+    asyncio.run(run())
+    assert len(standin.tasks) == 20
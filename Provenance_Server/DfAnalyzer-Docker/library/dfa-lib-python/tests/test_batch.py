@@ -0,0 +1,76 @@
+import json
+import time
+from dfa_lib_python.batch import BATCH_ROUTE, TASK_ROUTE, TaskBatch
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import HTTPTransport
+from conftest import RecordingTransport, Response
+
+
+def _ids(server):
+    return [x["id"] for x in server.tasks]
+
+
+def test_full_batches_are_sent_in_one_request(standin):
+    batch = TaskBatch(HTTPTransport(standin.url), max_size=3, max_delay=None)
+    for id in range(7):
+        Task(id, "df", "tf", transport=batch).save()
+    assert standin.requests == 2 and batch.pending == 1
+    assert batch.close() == []
+    assert standin.requests == 3
+    assert _ids(standin) == [str(x) for x in range(7)]
+
+
+def test_messages_are_sent_after_the_delay(standin):
+    batch = TaskBatch(HTTPTransport(standin.url), max_delay=0.05)
+    batch.add({"id": "1"})
+    deadline = time.monotonic() + 5
+    while not standin.tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _ids(standin) == ["1"]
+
+
+def test_other_routes_are_sent_after_the_buffered_tasks(recorder):
+    batch = TaskBatch(recorder, max_delay=None)
+    batch.post(TASK_ROUTE, {"id": "1"})
+    batch.post('/pde/dataflow/json', {"tag": "df"})
+    assert recorder.routes() == [BATCH_ROUTE, '/pde/dataflow/json']
+
+
+def test_rejected_tasks_are_reported(standin):
+    errors = []
+    batch = TaskBatch(HTTPTransport(standin.url), max_delay=None,
+                      on_error=lambda message, error: errors.append(error))
+    batch.add({"id": "1"})
+    batch.add(b'{"tag":"no id"}')
+    failures = batch.flush()
+    assert [json.loads(x.decode("utf-8")) for x, e in failures] == [
+        {"tag": "no id"}]
+    assert errors == ["Invalid task."] and batch.failures == failures
+    assert _ids(standin) == ["1"]
+
+
+def test_servers_without_the_batch_route_get_single_tasks():
+    transport = RecordingTransport(Response(404))
+    batch = TaskBatch(transport, max_delay=None)
+    batch.add({"id": "1"})
+    batch.add({"id": "2"})
+    batch.flush()
+    batch.add({"id": "3"})
+    batch.flush()
+    assert transport.routes() == [BATCH_ROUTE] + [TASK_ROUTE] * 3
+
+
+def test_server_errors_fail_every_task():
+    batch = TaskBatch(RecordingTransport(Response(503)), max_delay=None)
+    batch.add({"id": "1"})
+    batch.add({"id": "2"})
+    failures = batch.flush()
+    assert len(failures) == 2
+    assert all(isinstance(e, IOError) for m, e in failures)
+
+
+def test_deferred_batches_have_no_failures(recorder):
+    batch = TaskBatch(recorder, max_delay=None)
+    batch.add({"id": "1"})
+    assert batch.flush() == []
+    assert recorder.bodies() == [[{"id": "1"}]]
@@ -0,0 +1,76 @@
+import json
+import threading
+from dfa_lib_python.capture import CaptureFilter, CaptureRule
+from dfa_lib_python.capture_policy import CapturePolicy
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.task import Task
+from conftest import RecordingTransport
+
+
+class BlockedTransport(RecordingTransport):
+    """A recording transport waiting for ``release`` before answering."""
+    def __init__(self):
+        RecordingTransport.__init__(self)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def post(self, route, message):
+        self.started.set()
+        self.release.wait()
+        return RecordingTransport.post(self, route, message)
+
+
+def _save(transport, id, transformation="tf"):
+    task = Task(id, "df", transformation, transport=transport)
+    task.add_dataset(DataSet("oa", [Element(["cat"])]))
+    task.end()
+
+
+def _aggregate(transport):
+    return CaptureFilter(transport, {"tf": CaptureRule(
+        CapturePolicy.AGGREGATE, window=60)})
+
+
+def test_aggregated_tasks_are_sent_as_one_summary(recorder):
+    capture = _aggregate(recorder)
+    for id in range(5):
+        _save(capture, id)
+    assert recorder.messages == []
+    capture.close()
+    summary, = recorder.bodies()
+    values = summary["sets"][0]["elements"][0]
+    assert values[2:4] == ["5", "5"]
+    assert capture.aggregated == 5 and capture.dropped == 5
+
+
+def test_sampled_tasks_are_kept_whole(recorder):
+    capture = CaptureFilter(recorder, default=CaptureRule(
+        CapturePolicy.SAMPLE, every=3))
+    for id in range(30):
+        task = Task(id, "df", "tf", transport=capture)
+        task.begin()
+        task.end()
+    ids = [x["id"] for x in recorder.bodies()]
+    assert ids and all(ids.count(x) == 2 for x in ids)
+    assert len(ids) + capture.dropped == 60
+
+
+def test_tasks_are_captured_while_a_summary_is_sent():
+    transport = BlockedTransport()
+    capture = _aggregate(transport)
+    _save(capture, 1)
+    flush = threading.Thread(target=capture.flush, daemon=True)
+    flush.start()
+    assert transport.started.wait(5)
+    # the summary request is in flight, the filter is not locked
+    saved = threading.Thread(target=_save, args=(capture, 2), daemon=True)
+    saved.start()
+    saved.join(5)
+    assert not saved.is_alive()
+    transport.release.set()
+    flush.join(5)
+    capture.close()
+    counts = [json.loads(x["sets"][0]["elements"][0][2])
+              for x in transport.bodies()]
+    assert counts == [1, 1]
@@ -0,0 +1,90 @@
+import pytest
+from dfa_lib_python import cache
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.dataflow import Dataflow, resolve_sets
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.standin import StandInServer
+from dfa_lib_python.transformation import Transformation
+from dfa_lib_python.transport import HTTPTransport
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+
+
+def _dataflow(transport, sets=("ia",), cache=True):
+    tf = Transformation("tf")
+    tf.set_sets([Set(x, SetType.INPUT, [Attribute("a", AttributeType.TEXT)])
+                 for x in sets])
+    return Dataflow("df", [tf], transport=transport, cache=cache)
+
+
+def test_cache_is_off_by_default(recorder):
+    df = Dataflow("df", transport=recorder)
+    df.save()
+    df.save()
+    assert len(recorder.bodies()) == 2
+
+
+def test_unchanged_dataflow_is_skipped_while_the_server_stores_it(standin):
+    transport = HTTPTransport(standin.url)
+    assert _dataflow(transport).save().status_code == 200
+    assert _dataflow(transport).save() is None
+    assert len(standin.dataflows) == 1
+
+
+def test_cached_registration_is_dropped_after_a_reset():
+    with StandInServer(store=True) as first:
+        _dataflow(HTTPTransport(first.url)).save()
+    with StandInServer(store=True, port=first._server.server_address[1]) \
+            as second:
+        r = _dataflow(HTTPTransport(second.url)).save()
+        assert r.status_code == 200
+        assert len(second.dataflows) == 1
+        assert "delta" not in second.dataflows[0]
+
+
+def test_growing_dataflow_sends_a_delta(standin):
+    transport = HTTPTransport(standin.url)
+    _dataflow(transport).save()
+    _dataflow(transport, sets=("ia", "ib")).save()
+    delta = standin.dataflows[-1]
+    assert delta["delta"] is True
+    assert [x["tag"] for x in delta["transformations"][0]["sets"]] == ["ib"]
+
+
+def test_deferred_registration_is_not_cached(recorder):
+    _dataflow(recorder).save()
+    _dataflow(recorder).save()
+    assert len(recorder.bodies()) == 2
+    assert cache.load("dataflows.json") == {}
+
+
+def test_rejected_registration_drops_the_entry(standin):
+    from conftest import RecordingTransport, Response
+    transport = HTTPTransport(standin.url)
+    _dataflow(transport).save()
+    assert cache.load("dataflows.json")
+    rejecting = RecordingTransport(Response(500))
+    rejecting.url = transport.url
+    _dataflow(rejecting, sets=("ia", "ib")).save()
+    assert cache.load("dataflows.json") == {}
+
+
+def test_sets_with_a_dependency_take_the_attributes_of_their_tag():
+    def names(attributes):
+        return [x["name"] for x in attributes]
+    specification = {"tag": "df", "transformations": [
+        {"tag": "split", "sets": [
+            {"tag": "oframe", "type": "OUTPUT",
+             "attributes": [{"name": "frame", "type": "FILE"}]}]},
+        {"tag": "classify", "sets": [
+            {"tag": "oframe", "type": "INPUT", "dependency": "split"},
+            {"tag": "ovideo", "type": "INPUT", "dependency": "merge"}]}]}
+    assert [(x[0], x[1]["tag"], x[2]) for x in resolve_sets(
+        specification, names, [("ovideo", ["video"])])] == [
+        ("split", "oframe", ["frame"]), ("classify", "oframe", ["frame"]),
+        ("classify", "ovideo", ["video"])]
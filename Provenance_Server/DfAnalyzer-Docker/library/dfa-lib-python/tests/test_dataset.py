@@ -0,0 +1,38 @@
+import json
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+
+
+def _scores():
+    return Set("scores", SetType.OUTPUT, [
+        Attribute("frame", AttributeType.TEXT),
+        Attribute("score", AttributeType.NUMERIC)])
+
+
+def _elements(dataset):
+    return json.loads(dataset.to_json().decode("ascii"))["elements"]
+
+
+def test_columns_keep_numeric_values():
+    dataset = DataSet.from_columns(_scores(), {"frame": ["a", "b"],
+                                               "SCORE": [1, 0.5]})
+    assert _elements(dataset) == [["a", 1], ["b", 0.5]]
+    assert dataset.get_specification()["elements"] == _elements(dataset)
+
+
+def test_non_finite_numbers_are_null():
+    dataset = DataSet.from_columns(_scores(), [
+        ["a", "b", "c"], [float("nan"), float("inf"), -float("inf")]])
+    assert _elements(dataset) == [["a", None], ["b", None], ["c", None]]
+
+
+def test_non_finite_dataframe_values_are_null():
+    pandas = pytest.importorskip("pandas")
+    frame = pandas.DataFrame({"frame": ["a", "b"],
+                              "score": [float("nan"), 2.0]})
+    assert _elements(DataSet.from_dataframe(_scores(), frame)) == [
+        ["a", None], ["b", 2.0]]
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import pytest
+from dfa_lib_python import cache, hashing
+from dfa_lib_python.async_dataflow import AsyncDataflow
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(hashing, "_hashers", {})
+    monkeypatch.setattr(hashing, "_watched", {})
+
+
+def _frames():
+    return Set("oframes", SetType.OUTPUT, hashing.hash_attributes([
+        Attribute("frame_path", AttributeType.FILE),
+        Attribute("score", AttributeType.NUMERIC)]))
+
+
+def _file(tmp_path, content):
+    path = tmp_path / "frame.png"
+    path.write_bytes(content)
+    return str(path)
+
+
+def _elements(recorder):
+    return recorder.bodies()[-1]["sets"][0]["elements"]
+
+
+def test_datasets_of_saved_dataflows_are_hashed(tmp_path, recorder):
+    tf = Transformation("tf")
+    tf.set_sets([_frames()])
+    Dataflow("df", [tf], transport=recorder).save()
+    path = _file(tmp_path, b"frame")
+    task = Task(1, "df", "tf", transport=recorder)
+    task.add_dataset(DataSet("oframes", [Element([path, 0.5])]))
+    task.end()
+    assert _elements(recorder) == [
+        [path, hashlib.sha256(b"frame").hexdigest(), "0.5"]]
+
+
+def test_watched_set_hashes_files_once(tmp_path, recorder, monkeypatch):
+    hashing.watch("DF", _frames())
+    path = _file(tmp_path, b"frame")
+    digests = []
+    digest = hashing.digest
+    monkeypatch.setattr(hashing, "digest",
+                        lambda *args: digests.append(args) or digest(*args))
+    for id in range(3):
+        task = Task(id, "df", "tf", transport=recorder)
+        task.add_dataset(DataSet("oframes", [Element([path, 1])]))
+        task.end()
+    assert len(digests) == 1
+
+
+def test_given_digests_and_other_sets_are_kept(tmp_path, recorder):
+    hashing.watch("df", _frames())
+    task = Task(1, "df", "tf", transport=recorder)
+    task.add_dataset(DataSet("oframes", [Element(["a.png", "abc", 1])]))
+    task.add_dataset(DataSet("iframes", [Element(["b.png"])]))
+    task.end()
+    assert [x["elements"] for x in recorder.bodies()[-1]["sets"]] == [
+        [["a.png", "abc", "1"]], [["b.png"]]]
+
+
+def test_unreadable_files_have_an_empty_digest(recorder):
+    hashing.watch("df", _frames())
+    task = Task(1, "df", "tf", transport=recorder)
+    task.add_dataset(DataSet("oframes", [Element(["missing.png", 1])]))
+    task.end()
+    assert _elements(recorder) == [["missing.png", "", "1"]]
+
+
+def test_sets_without_attributes_are_saved(recorder):
+    tf = Transformation("tf", [Set("s", SetType.INPUT, [])])
+    Dataflow("df", [tf], transport=recorder).save()
+    assert len(recorder.bodies()) == 1
+
+
+def test_datasets_of_async_dataflows_are_hashed(tmp_path, recorder):
+    class AsyncRecorder(object):
+        async def post(self, route, message):
+            return recorder.post(route, message)
+
+    tf = Transformation("tf")
+    tf.set_sets([_frames()])
+    asyncio.run(AsyncDataflow("df", [tf], transport=AsyncRecorder()).save())
+    path = _file(tmp_path, b"frame")
+    task = Task(1, "df", "tf", transport=recorder)
+    task.add_dataset(DataSet("oframes", [Element([path, 1])]))
+    task.end()
+    assert _elements(recorder)[0][1] == hashlib.sha256(b"frame").hexdigest()
@@ -0,0 +1,122 @@
+import os
+import stat
+import threading
+import pytest
+from dfa_lib_python import index_ledger
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.extractor_cartridge import ExtractorCartridge
+from dfa_lib_python.index_ledger import IncrementalIndexer, IndexLedger
+from dfa_lib_python.raw_data_indexer import RawDataIndexer
+
+# indexes the file given as fourth argument, fails for files named bad*
+RDE = """#!/bin/sh
+case "$(basename "$4")" in bad*) exit 1;; esac
+echo "$4" >> "$(dirname "$0")/indexed"
+"""
+
+
+@pytest.fixture
+def rde(tmp_path, monkeypatch):
+    bin = tmp_path / "dfanalyzer" / "bin"
+    bin.mkdir(parents=True)
+    (bin / "RDE").write_text(RDE)
+    os.chmod(str(bin / "RDE"), stat.S_IRWXU)
+    monkeypatch.setenv("DFANALYZER_DIR", str(tmp_path / "dfanalyzer"))
+    return bin / "indexed"
+
+
+def _indexed(rde):
+    if not rde.exists():
+        return []
+    return sorted(os.path.basename(x) for x in rde.read_text().split())
+
+
+def _touch(path, content, mtime=None):
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(str(path), (mtime, mtime))
+
+
+def _indexer(tmp_path, rde, **kwargs):
+    indexer = RawDataIndexer(ExtractorCartridge.INDEXING, "frames", ".",
+                             "", [Attribute("x", AttributeType.NUMERIC)])
+    ledger = IndexLedger(str(tmp_path / "ledger.db"))
+    return IncrementalIndexer(indexer, ledger, pattern="*.data", settle=0,
+                              **kwargs)
+
+
+def test_only_new_and_changed_contents_are_listed(tmp_path, monkeypatch):
+    data = tmp_path / "a.data"
+    _touch(data, b"1", 1000)
+    ledger = IndexLedger(str(tmp_path / "ledger.db"))
+    changes = ledger.changes("frames", [str(data), str(tmp_path / "gone")])
+    assert [x[0] for x in changes] == [str(data)]
+    ledger.record("frames", changes)
+    hashed = []
+    monkeypatch.setattr(index_ledger, "digest",
+                        lambda path, algorithm: hashed.append(path) or "?")
+    assert ledger.changes("frames", [str(data)]) == []
+    assert hashed == []
+    assert ledger.changes("other", [str(data)]) != []
+    ledger.close()
+
+
+def test_touched_files_are_not_indexed_again(tmp_path):
+    data = tmp_path / "a.data"
+    _touch(data, b"1", 1000)
+    ledger = IndexLedger(str(tmp_path / "ledger.db"))
+    ledger.record("frames", ledger.changes("frames", [str(data)]))
+    _touch(data, b"1", 2000)
+    assert ledger.changes("frames", [str(data)]) == []
+    _touch(data, b"2", 3000)
+    assert len(ledger.changes("frames", [str(data)])) == 1
+    ledger.close()
+    ledger = IndexLedger(str(tmp_path / "ledger.db"))
+    assert len(ledger) == 1
+    ledger.forget("frames", str(data))
+    assert len(ledger) == 0
+    ledger.close()
+
+
+def test_changed_files_are_indexed_once(tmp_path, rde):
+    source = tmp_path / "extracted"
+    source.mkdir()
+    for name in ("a.data", "b.data", "c.txt"):
+        _touch(source / name, name.encode("ascii"))
+    incremental = _indexer(tmp_path, rde)
+    assert [x.ok for x in incremental.run(str(source))] == [True, True]
+    assert incremental.run(str(source)) == []
+    _touch(source / "a.data", b"changed")
+    _touch(source / "d.data", b"new")
+    incremental.run(str(source))
+    assert _indexed(rde) == ["a.data", "a.data", "b.data", "d.data"]
+
+
+def test_failed_files_are_indexed_again(tmp_path, rde):
+    source = tmp_path / "extracted"
+    source.mkdir()
+    _touch(source / "bad.data", b"1")
+    incremental = _indexer(tmp_path, rde)
+    assert [x.ok for x in incremental.run(str(source))] == [False]
+    assert len(incremental.run(str(source))) == 1
+    assert len(incremental.ledger) == 0
+
+
+def test_watch_indexes_files_as_they_land(tmp_path, rde):
+    source = tmp_path / "extracted"
+    source.mkdir()
+    incremental = _indexer(tmp_path, rde)
+    landed = threading.Event()
+
+    def on_results(results):
+        landed.set()
+        incremental.stop()
+
+    watcher = threading.Thread(target=incremental.watch, daemon=True,
+                               args=(str(source), 0.01, on_results))
+    watcher.start()
+    _touch(source / "a.data", b"1")
+    assert landed.wait(5)
+    watcher.join(5)
+    assert _indexed(rde) == ["a.data"]
@@ -0,0 +1,98 @@
+import pytest
+from dfa_lib_python import instrument
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.instrument import provenance_task
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from conftest import RecordingTransport
+
+INPUT = Set("ia", SetType.INPUT, [Attribute("path", AttributeType.TEXT)])
+OUTPUT = Set("oa", SetType.OUTPUT, [Attribute("label", AttributeType.TEXT),
+                                    Attribute("score", AttributeType.NUMERIC)])
+
+
+def _classify(recorder, function):
+    return provenance_task("tf", "df", inputs=[INPUT], outputs=[OUTPUT],
+                           transport=recorder)(function)
+
+
+def test_call_is_saved_when_it_starts_and_when_it_ends(recorder):
+    classify = _classify(recorder, lambda path: ("cat", 0.9))
+    assert classify("a.png") == ("cat", 0.9)
+    begin, end = recorder.bodies()
+    assert begin["status"] == "RUNNING"
+    assert end["status"] == "FINISHED"
+    assert end["id"] == begin["id"]
+    sets = dict((x["tag"], x["elements"]) for x in end["sets"])
+    assert sets == {"ia": [["a.png"]], "oa": [["cat", "0.9"]]}
+    assert "error" not in end
+
+
+def test_failed_call_is_recorded_with_its_error(recorder):
+    def classify(path):
+        raise ValueError("unreadable image")
+
+    with pytest.raises(ValueError):
+        _classify(recorder, classify)("a.png")
+    end = recorder.bodies()[-1]
+    assert end["error"] == "ValueError: unreadable image"
+
+
+def test_unexpected_return_value_does_not_break_the_caller(recorder):
+    classify = _classify(recorder, lambda path: ["cat"])
+    assert classify("a.png") == ["cat"]
+    end = recorder.bodies()[-1]
+    assert end["status"] == "FINISHED"
+    assert end["output"].startswith("Outputs not captured")
+    assert [x["tag"] for x in end["sets"]] == ["ia"]
+
+
+def test_block_is_captured(recorder):
+    with provenance_task("tf", "df", inputs=[INPUT], outputs=[OUTPUT],
+                         transport=recorder) as scope:
+        scope.inputs(path="a.png")
+        assert recorder.bodies()[-1]["status"] == "RUNNING"
+        scope.outputs(label="cat", score=0.9)
+    assert recorder.bodies()[-1]["status"] == "FINISHED"
+
+
+def test_disabled_capture_sends_nothing(recorder):
+    instrument.disable()
+    try:
+        assert _classify(recorder, lambda path: ("cat", 0.9))("a.png")
+    finally:
+        instrument.enable()
+    assert recorder.messages == []
+
+
+class UnreachableTransport(RecordingTransport):
+    """A transport whose server cannot be reached."""
+    def post(self, route, message):
+        raise ConnectionError("connection refused")
+
+
+def test_unsaved_task_does_not_change_the_result():
+    calls = []
+    instrumentation = provenance_task("tf", "df", inputs=[INPUT],
+                                      outputs=[OUTPUT],
+                                      transport=UnreachableTransport())
+    classify = instrumentation(lambda path: calls.append(path) or ("cat", 1))
+    assert classify("a.png") == ("cat", 1)
+    assert calls == ["a.png"]
+    assert instrumentation.failed == 2
+    assert isinstance(instrumentation.last_error, ConnectionError)
+
+
+def test_unsaved_task_does_not_hide_the_error():
+    def classify(path):
+        raise ValueError("unreadable image")
+
+    instrumentation = provenance_task("tf", "df", inputs=[INPUT],
+                                      transport=UnreachableTransport())
+    with pytest.raises(ValueError):
+        instrumentation(classify)("a.png")
+    with pytest.raises(ValueError):
+        with instrumentation:
+            raise ValueError("unreadable image")
+    assert instrumentation.failed == 4
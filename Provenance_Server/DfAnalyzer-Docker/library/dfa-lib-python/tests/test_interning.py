@@ -0,0 +1,109 @@
+import threading
+import pytest
+from dfa_lib_python import interning
+from dfa_lib_python.batch import TaskBatch
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.standin import StandInServer
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import HTTPTransport
+from conftest import RecordingTransport, Response
+
+METADATA = [Element(["host-{0}".format(x), "/usr/bin/python3", x])
+            for x in range(8)]
+
+
+@pytest.fixture(autouse=True)
+def interner():
+    yield interning.enable()
+    interning.disable()
+
+
+def _save(transport, id):
+    task = Task(id, "df", "tf", transport=transport)
+    task.add_dataset(DataSet("metadata", METADATA))
+    task.save()
+    return task
+
+
+class AnsweringTransport(RecordingTransport):
+    """A recording transport answering with the given status codes."""
+    answers = True
+
+    def __init__(self, status_codes):
+        RecordingTransport.__init__(self)
+        self.status_codes = list(status_codes)
+
+    def post(self, route, message):
+        RecordingTransport.post(self, route, message)
+        return Response(self.status_codes.pop(0))
+
+
+def test_repeated_dataset_is_sent_by_reference(standin, interner):
+    transport = HTTPTransport(standin.url)
+    for id in range(3):
+        _save(transport, id)
+    assert interner.interned == 1
+    assert interner.saved_bytes > 0
+    assert len(standin.tasks) == 3
+    for task in standin.tasks:
+        assert len(task["sets"][0]["elements"]) == len(METADATA)
+        assert "ref" not in task["sets"][0]
+
+
+def test_unknown_reference_is_sent_again_in_full(interner):
+    transport = AnsweringTransport([200, 200, 409, 200])
+    for id in range(3):
+        _save(transport, id)
+    sets = [x["sets"][0] for x in transport.bodies()]
+    assert "elements" in sets[0] and "ref" not in sets[0]
+    assert "elements" in sets[1] and "ref" in sets[1]
+    assert "elements" not in sets[2]
+    assert "elements" in sets[3] and "ref" not in sets[3]
+
+
+def test_restarted_server_gets_the_datasets_again():
+    with StandInServer(store=True) as first:
+        transport = HTTPTransport(first.url)
+        for id in range(2):
+            _save(transport, id)
+    with StandInServer(store=True, port=first._server.server_address[1]) \
+            as second:
+        _save(HTTPTransport(second.url), 2)
+        assert len(second.tasks) == 1
+        assert len(second.tasks[0]["sets"][0]["elements"]) == len(METADATA)
+
+
+def test_deferred_transports_send_datasets_in_full(recorder, interner):
+    batch = TaskBatch(recorder, max_size=10, max_delay=None)
+    for transport in (recorder, batch):
+        for id in range(3):
+            _save(transport, id)
+    batch.flush()
+    assert interner.interned == 0
+    tasks = recorder.bodies("/pde/task/json")
+    tasks += [x for body in recorder.bodies("/pde/task/batch/json")
+              for x in body]
+    assert len(tasks) == 6
+    for task in tasks:
+        assert "ref" not in task["sets"][0]
+        assert len(task["sets"][0]["elements"]) == len(METADATA)
+
+
+def test_counters_are_exact_across_threads():
+    interner = interning.DatasetInterner(min_bytes=0)
+    dataset = DataSet("metadata", METADATA).to_json()
+    saved = []
+
+    def run():
+        for _ in range(500):
+            saved.append(len(interner.intern("df", dataset)))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert interner.interned == 2000 - 2
+    assert interner.saved_bytes == sum(len(dataset) - x for x in saved
+                                       if x < len(dataset))
@@ -0,0 +1,99 @@
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.batch import TASK_ROUTE
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.lineage import LineageIndex
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.spool import Spool
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+SPLIT = ("df", "split", "1")
+CLASSIFY = ("df", "classify", "2")
+
+
+def _record(transport):
+    split = Transformation("split")
+    split.set_sets([
+        Set("ivideo", SetType.INPUT, [Attribute("video", AttributeType.FILE)]),
+        Set("oframe", SetType.OUTPUT, [
+            Attribute("frame", AttributeType.FILE),
+            Attribute("rain", AttributeType.NUMERIC)])])
+    classify = Transformation("classify")
+    classify.set_sets([
+        Set("oframe", SetType.INPUT, [
+            Attribute("frame", AttributeType.FILE),
+            Attribute("rain", AttributeType.NUMERIC)]),
+        Set("oclass", SetType.OUTPUT, [
+            Attribute("caminho", AttributeType.TEXT)])])
+    Dataflow("df", [split, classify], transport=transport).save()
+    task = Task(1, "df", "split", transport=transport)
+    task.add_dataset(DataSet("ivideo", [Element(["videos/a.mp4"])]))
+    task.add_dataset(DataSet("oframe", [Element(["frames/a_1.png", 1]),
+                                        Element(["frames/a_2.png", 0])]))
+    task.end()
+    task = Task(2, "df", "classify", transport=transport)
+    task.add_dataset(DataSet("oframe", [Element(["frames/a_1.png", 1])]))
+    task.add_dataset(DataSet("oclass", [Element(["rain/a_1.png"])]))
+    task.end()
+
+
+def _index(tmp_path, **kwargs):
+    return LineageIndex(str(tmp_path / "lineage.db"), **kwargs)
+
+
+def test_artifacts_are_traced_to_their_tasks(tmp_path, recorder):
+    with _index(tmp_path, transport=recorder) as index:
+        _record(index)
+        assert index.producers("frames/a_1.png") == [SPLIT]
+        assert index.consumers("frames/./a_1.png") == [CLASSIFY]
+        assert index.consumers("frames/a_2.png") == []
+    assert len(recorder.messages) == 3
+
+
+def test_lineage_is_walked_across_tasks(tmp_path, recorder):
+    with _index(tmp_path, attributes=["caminho"]) as index:
+        _record(index)
+        assert index.backward("rain/a_1.png") == [
+            (1, "rain/a_1.png", CLASSIFY, "frames/a_1.png"),
+            (2, "frames/a_1.png", SPLIT, "videos/a.mp4")]
+        assert index.backward("rain/a_1.png", max_depth=1) == [
+            (1, "rain/a_1.png", CLASSIFY, "frames/a_1.png")]
+        assert [x[3] for x in index.forward("videos/a.mp4")] == [
+            "frames/a_1.png", "frames/a_2.png", "rain/a_1.png"]
+        assert index.sources("rain/a_1.png") == ["videos/a.mp4"]
+
+
+def test_a_message_that_cannot_be_indexed_is_rolled_back(tmp_path):
+    with _index(tmp_path) as index:
+        with pytest.raises(KeyError):
+            index.add(TASK_ROUTE, {"id": "1", "transformation": "split"})
+        _record(index)
+        with pytest.raises(KeyError):
+            index.add(TASK_ROUTE, {
+                "id": "3", "dataflow": "df", "transformation": "split",
+                "sets": [{"tag": "oframe", "elements": [["frames/b.png"]]},
+                         {"elements": [["frames/c.png"]]}]})
+        index.flush()
+        assert index.producers("frames/a_1.png") == [SPLIT]
+        assert index.producers("frames/b.png") == []
+
+
+def test_text_attributes_are_only_indexed_when_named(tmp_path):
+    with _index(tmp_path) as index:
+        _record(index)
+        assert index.producers("rain/a_1.png") == []
+
+
+def test_index_is_built_from_a_spool_and_kept(tmp_path):
+    spool = Spool(str(tmp_path / "spool"))
+    _record(spool)
+    spool.close()
+    with _index(tmp_path) as index:
+        assert index.add_spool(str(tmp_path / "spool")) == 3
+    with _index(tmp_path) as index:
+        assert index.producers("frames/a_2.png") == [SPLIT]
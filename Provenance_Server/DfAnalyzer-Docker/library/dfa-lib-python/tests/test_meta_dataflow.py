@@ -0,0 +1,78 @@
+import os
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.meta_dataflow import MetaDataflow
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+
+FRAMES = ["frames/1.png", "frames/2.png", "frames/3.png"]
+
+
+def _dataflow(transport, tag, transformation, set, type):
+    step = Transformation(transformation)
+    step.set_sets([Set(set, type, [
+        Attribute("frame_path", AttributeType.FILE),
+        Attribute("rain", AttributeType.NUMERIC)])])
+    Dataflow(tag, [step], transport=transport).save()
+
+
+def _task(transport, id, tag, transformation, set, frames):
+    task = Task(id, tag, transformation, transport=transport)
+    task.add_dataset(DataSet(set, [Element([x, 0]) for x in frames]))
+    task.end()
+
+
+def _record(engine, consumed=FRAMES[:2]):
+    _dataflow(engine, "extraction", "split", "oframe", SetType.OUTPUT)
+    _dataflow(engine, "classification", "classify", "iframe", SetType.INPUT)
+    _task(engine, 1, "extraction", "split", "oframe", FRAMES)
+    _task(engine, 1, "classification", "classify", "iframe", consumed)
+
+
+def _edges(engine):
+    return [(x["from"]["dataflow"], x["to"]["dataflow"], x["count"])
+            for x in engine.dag()["edges"]]
+
+
+def test_dataflows_are_joined_on_key_attributes(tmp_path, recorder):
+    engine = MetaDataflow(str(tmp_path), ["FRAME_PATH"], transport=recorder)
+    _record(engine)
+    dag = engine.dag()
+    assert dag["nodes"] == ["classification/classify", "extraction/split"]
+    assert dag["edges"] == [{
+        "from": {"dataflow": "extraction", "transformation": "split",
+                 "set": "oframe", "attribute": "frame_path"},
+        "to": {"dataflow": "classification", "transformation": "classify",
+               "set": "iframe", "attribute": "frame_path"},
+        "count": 2}]
+    assert '"extraction/split" -> "classification/classify" ' \
+        '[label="oframe (2)"];' in engine.to_dot()
+    assert len(recorder.messages) == 4
+
+
+def test_spilled_partitions_give_the_same_dag(tmp_path):
+    engine = MetaDataflow(str(tmp_path), ["frame_path"], partitions=4,
+                          max_records=1)
+    _record(engine)
+    assert _edges(engine) == [("extraction", "classification", 2)]
+    assert any(x.startswith("joined-") for x in os.listdir(str(tmp_path)))
+
+
+def test_edges_accumulate_across_runs(tmp_path):
+    with MetaDataflow(str(tmp_path), ["frame_path"]) as engine:
+        _record(engine)
+    with MetaDataflow(str(tmp_path), ["frame_path"]) as engine:
+        _task(engine, 2, "classification", "classify", "iframe", FRAMES[2:])
+        assert _edges(engine) == [("extraction", "classification", 3)]
+
+
+def test_key_values_are_normalized(tmp_path):
+    engine = MetaDataflow(str(tmp_path), ["frame_path"],
+                          normalize=os.path.normpath)
+    _record(engine, consumed=["frames/./1.png"])
+    assert _edges(engine) == [("extraction", "classification", 1)]
@@ -0,0 +1,54 @@
+import os
+import pytest
+from dfa_lib_python import cache
+from dfa_lib_python.query import QUERY_DIR, Query, QueryClient
+
+LINES = ["path", "a.png", "b.png", "c.png"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+    client = QueryClient("http://localhost:1")
+    client.requests = 0
+
+    def stream(df_tag, df_id, message):
+        client.requests += 1
+        for line in LINES:
+            yield line
+
+    client._stream = stream
+    client.version = lambda df_tag: "1"
+    client._get_types = lambda df_id, query: ["TEXT"]
+    yield client
+    client.close()
+
+
+def _files(tmp_path):
+    directory = os.path.join(str(tmp_path), QUERY_DIR)
+    return sorted(os.listdir(directory)) if os.path.exists(directory) else []
+
+
+def _run(client):
+    return client.run("df", Query().projection("ia.path"), df_id=1)
+
+
+def test_result_is_cached_when_read_to_the_end(client, tmp_path):
+    assert [x for x, in _run(client)] == ["a.png", "b.png", "c.png"]
+    assert [x for x, in _run(client)] == ["a.png", "b.png", "c.png"]
+    assert client.requests == 1
+    assert [x.endswith(".csv") for x in _files(tmp_path)] == [True]
+
+
+def test_unread_result_opens_no_file(client, tmp_path):
+    _run(client)
+    assert _files(tmp_path) == []
+
+
+def test_partly_read_result_is_not_cached(client, tmp_path):
+    rows = iter(_run(client))
+    next(rows)
+    rows.close()
+    assert _files(tmp_path) == []
+    assert len(list(_run(client))) == 3
+    assert client.requests == 2
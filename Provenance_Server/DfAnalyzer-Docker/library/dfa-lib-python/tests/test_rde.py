@@ -0,0 +1,123 @@
+import os
+import stat
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.extractor_cartridge import ExtractorCartridge
+from dfa_lib_python.raw_data_extractor import RawDataExtractor
+from dfa_lib_python.method_type import MethodType
+from dfa_lib_python.raw_data_indexer import RawDataIndexer
+from dfa_lib_python.rde_batch import RDEBatch
+from dfa_lib_python.task import Task
+
+# prints the job given as fourth argument and records how many jobs run at
+# the same time; jobs with "sleep" sleep, jobs with "fail" exit with 3
+RDE = """#!/bin/sh
+bin=$(dirname "$0")
+touch "$bin/running.$$"
+ls "$bin" | grep -c '^running\\.' >> "$bin/concurrency"
+sleep 0.2
+rm "$bin/running.$$"
+case "$4" in *sleep*) exec sleep 5;; esac
+printf "%s\\n" "$4"
+case "$4" in *fail*) echo failed >&2; exit 3;; esac
+exit 0
+"""
+
+
+@pytest.fixture
+def rde(tmp_path, monkeypatch):
+    bin = tmp_path / "dfanalyzer" / "bin"
+    bin.mkdir(parents=True)
+    (bin / "RDE").write_text(RDE)
+    os.chmod(str(bin / "RDE"), stat.S_IRWXU)
+    monkeypatch.setenv("DFANALYZER_DIR", str(tmp_path / "dfanalyzer"))
+    return bin
+
+
+def _attributes():
+    return [Attribute("x", AttributeType.NUMERIC)]
+
+
+def test_extractor_arguments_match_the_command_line(monkeypatch):
+    monkeypatch.setenv("DFANALYZER_DIR", "/opt/dfa")
+    extractor = RawDataExtractor(ExtractorCartridge.EXTRACTION, "cat",
+                                 _attributes())
+    assert extractor.get_arguments() == extractor.get_command_line().split()
+    assert extractor.get_arguments("out 1.txt")[4] == "\\cat 'out 1.txt'\\"
+
+
+def test_indexer_arguments_match_the_command_line(monkeypatch):
+    monkeypatch.setenv("DFANALYZER_DIR", "/opt/dfa")
+    indexer = RawDataIndexer(ExtractorCartridge.INDEXING, "ext", ".",
+                             "data.txt", _attributes(), "-v -x")
+    assert indexer.get_arguments() == indexer.get_command_line().split()
+    assert indexer.get_arguments("other.txt")[4] == "other.txt"
+
+
+def _extractor():
+    return RawDataExtractor(ExtractorCartridge.EXTRACTION, "cat",
+                            _attributes())
+
+
+def _indexer():
+    return RawDataIndexer(ExtractorCartridge.INDEXING, "ext", ".",
+                          "data.txt", _attributes())
+
+
+def test_batch_results_are_in_the_order_of_the_jobs(rde):
+    batch = RDEBatch(max_workers=4)
+    for name in ("a", "b", "fail", "c"):
+        batch.add(_extractor(), name + ".txt")
+    batch.add(_indexer(), "d.data")
+    results = batch.run()
+    assert [x.stdout for x in results] == [
+        "\\cat a.txt\\\n", "\\cat b.txt\\\n", "\\cat fail.txt\\\n",
+        "\\cat c.txt\\\n", "d.data\n"]
+    assert [x.returncode for x in results] == [0, 0, 3, 0, 0]
+    assert results[2].stderr == "failed\n" and not results[2].ok
+    assert all(x.duration >= 2 * 10 ** 8 for x in results)
+    assert len(batch) == 0
+
+
+def test_batch_runs_at_most_max_workers_processes(rde):
+    batch = RDEBatch(max_workers=2)
+    for id in range(6):
+        batch.add(_extractor(), "{0}.txt".format(id))
+    assert all(x.ok for x in batch.run())
+    counts = [int(x) for x in (rde / "concurrency").read_text().split()]
+    assert len(counts) == 6 and max(counts) == 2
+
+
+def test_batch_runs_are_stopped_after_the_timeout(rde):
+    batch = RDEBatch(timeout=1)
+    batch.add(_extractor(), "sleep.txt")
+    batch.add(_extractor(), "a.txt")
+    slow, fast = batch.run()
+    assert slow.returncode is None and not slow.ok
+    assert slow.error == "Timed out after 1 seconds."
+    assert slow.duration < 4 * 10 ** 9
+    assert fast.ok
+
+
+def test_batch_reports_rde_that_cannot_be_started(tmp_path, monkeypatch):
+    monkeypatch.setenv("DFANALYZER_DIR", str(tmp_path))
+    batch = RDEBatch()
+    batch.add(_extractor(), "a.txt")
+    result, = batch.run()
+    assert result.returncode is None and not result.ok
+    assert "RDE" in result.error
+
+
+def test_batch_runs_are_spans_of_the_task(rde, recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    batch = RDEBatch(task=task)
+    batch.add(_extractor(), "a.txt")
+    batch.add(_extractor(), "b.txt")
+    batch.add(_indexer())
+    results = batch.run()
+    extraction = task.spans[MethodType.EXTRACTION.value]
+    indexing = task.spans[MethodType.INDEXING.value]
+    assert extraction[2:] == [results[0].duration + results[1].duration, 2]
+    assert indexing[2:] == [results[2].duration, 1]
+    assert extraction[0] == min(results[0].start, results[1].start)
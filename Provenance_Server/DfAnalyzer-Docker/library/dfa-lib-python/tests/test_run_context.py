@@ -0,0 +1,68 @@
+import hashlib
+import platform
+import pytest
+from dfa_lib_python import cache, hashing, run_context
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dependency import Dependency
+from dfa_lib_python.run_context import (RUN_CONTEXT_TAG, RunContext,
+                                        get_run_context)
+from dfa_lib_python.task import Task
+
+
+@pytest.fixture
+def context(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(hashing, "_hashers", {})
+    script = tmp_path / "split.py"
+    script.write_bytes(b"print('split')\n")
+    return RunContext(str(script), id=7)
+
+
+def test_script_and_system_metadata_are_read(context, tmp_path):
+    assert context.id == "7"
+    assert context.script_path == str(tmp_path / "split.py")
+    assert context.script_hash == \
+        hashlib.sha256(b"print('split')\n").hexdigest()
+    assert context.python_version == platform.python_version()
+
+
+def test_context_is_registered_once_per_dataflow(context, recorder):
+    for id in range(3):
+        context.attach(Task(id, "DF", "split", transport=recorder))
+    context.attach(Task(3, "other", "split", transport=recorder))
+    tasks = recorder.bodies()
+    assert [(x["dataflow"], x["transformation"]) for x in tasks] == [
+        ("df", RUN_CONTEXT_TAG), ("other", RUN_CONTEXT_TAG)]
+    assert [x["tag"] for x in tasks[0]["sets"]] == [
+        "df_system_metadata", "df_script_metadata"]
+
+
+def test_tasks_reference_the_context(context, recorder):
+    task = Task(1, "df", "split", transport=recorder)
+    context.attach(task)
+    assert task._dependency == {"tags": [{"tag": RUN_CONTEXT_TAG}],
+                                "ids": [{"id": "7"}]}
+    task = Task(2, "df", "classify", transport=recorder)
+    task.add_dependency(Dependency(["split"], ["1"]))
+    context.attach(task)
+    context.attach(task)
+    assert task._dependency == {
+        "tags": [{"tag": "split"}, {"tag": RUN_CONTEXT_TAG}],
+        "ids": [{"id": "1,7"}]}
+
+
+def test_context_sets_are_added_to_the_dataflow(context):
+    dataflow = Dataflow("df")
+    context.add_to(dataflow)
+    transformation, = dataflow.transformations
+    assert transformation["tag"] == RUN_CONTEXT_TAG
+    assert [x["tag"] for x in transformation["sets"]] == [
+        "df_system_metadata", "df_script_metadata"]
+
+
+def test_process_context_is_computed_once(context, monkeypatch):
+    monkeypatch.setattr(run_context, "_run_context", None)
+    monkeypatch.setattr(run_context, "RunContext", lambda: context)
+    assert get_run_context() is context
+    monkeypatch.setattr(run_context, "RunContext", None)
+    assert get_run_context() is context
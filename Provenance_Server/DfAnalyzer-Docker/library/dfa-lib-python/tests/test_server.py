@@ -0,0 +1,200 @@
+"""
+Round trips against a running Dataflow Analyzer and its MonetDB database,
+run by DfAnalyzer/test-server.sh. Every test registers its own dataflow.
+"""
+import json
+import time
+import uuid
+import pytest
+from dfa_lib_python import cache, interning
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.batch import DATAFLOW_ROUTE, TASK_ROUTE, TaskBatch
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.mapping_type import MappingType
+from dfa_lib_python.query import Query, QueryClient
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+from dfa_lib_python.transport import HTTPTransport
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "cache_dir", str(tmp_path))
+
+
+def _wait(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "The server did not store it."
+        time.sleep(0.2)
+
+
+def _stored(transport, df_tag):
+    """Return the number of transactions of a dataflow stored so far."""
+    r = transport.get('/query_interface/{0}/version'.format(df_tag))
+    assert r.status_code == 200
+    return int(r.text.rsplit("-", 1)[1])
+
+
+def _sets(df_tag):
+    return [Set("i" + df_tag, SetType.INPUT,
+                [Attribute("n", AttributeType.NUMERIC)]),
+            Set("o" + df_tag, SetType.OUTPUT,
+                [Attribute("v", AttributeType.TEXT)])]
+
+
+def _tag():
+    return "rt" + uuid.uuid4().hex[:8]
+
+
+def _register(server):
+    df_tag = _tag()
+    transport = HTTPTransport(server)
+    tf = Transformation("tf")
+    tf.set_sets(_sets(df_tag))
+    assert Dataflow(df_tag, [tf], transport=transport).save() \
+        .status_code == 200
+    _wait(lambda: transport.get(
+        '/pde/dataflow/' + df_tag).status_code == 200)
+    return df_tag, transport
+
+
+def _task(df_tag, id, transport):
+    task = Task(id, df_tag, "tf", transport=transport)
+    task.add_dataset(DataSet("i" + df_tag, [Element([id])]))
+    task.add_dataset(DataSet("o" + df_tag, [Element(["v{0}".format(id)])]))
+    return task
+
+
+def _query(df_tag, source="i"):
+    return Query(MappingType.PHYSICAL).source(source + df_tag) \
+        .target("o" + df_tag) \
+        .projection("{0}{1}.n".format(source, df_tag),
+                    "o{0}.v".format(df_tag))
+
+
+def _rows(server, df_tag, *selections, source="i"):
+    query = _query(df_tag, source)
+    if selections:
+        query.selection(*[x.format(df_tag) for x in selections])
+    client = QueryClient(server, cache=False)
+    try:
+        return sorted(client.run(df_tag, query))
+    finally:
+        client.close()
+
+
+def test_batch_round_trip(server):
+    df_tag, transport = _register(server)
+    stored = _stored(transport, df_tag)
+    batch = TaskBatch(transport, max_delay=None)
+    for id in range(3):
+        _task(df_tag, id, batch).end()
+    assert batch.close() == []
+    _wait(lambda: _stored(transport, df_tag) >= stored + 3)
+    assert _rows(server, df_tag) == [(0, "v0"), (1, "v1"), (2, "v2")]
+
+
+def test_null_values_are_stored_as_null(server):
+    df_tag, transport = _register(server)
+    stored = _stored(transport, df_tag)
+    input, output = _sets(df_tag)
+    task = Task(0, df_tag, "tf", transport=transport)
+    task.add_dataset(DataSet.from_columns(input, {"n": [float("nan")]}))
+    task.add_dataset(DataSet.from_columns(output, {"v": ["a"]}))
+    task.end()
+    # the library sends null for NaN only, other values are posted as json
+    message = json.loads(_task(df_tag, 1, transport).to_json())
+    message["status"] = "FINISHED"
+    message["sets"][1]["elements"] = [[None]]
+    assert transport.post(TASK_ROUTE, message).status_code == 200
+    _wait(lambda: _stored(transport, df_tag) >= stored + 2)
+    assert _rows(server, df_tag, "i{0}.n IS NULL") == [(None, "a")]
+    assert [n for n, v in _rows(server, df_tag, "o{0}.v IS NULL")] == [1]
+
+
+def test_dataflow_status_round_trip(server):
+    r = HTTPTransport(server).get('/pde/dataflow/' + _tag())
+    assert r.status_code == 404
+    assert r.json()["delta"] is True
+    df_tag, transport = _register(server)
+    assert transport.get('/pde/dataflow/' + df_tag.upper()).status_code == 200
+
+
+def test_delta_registration_round_trip(server):
+    df_tag, transport = _register(server)
+    extra = Set("j" + df_tag, SetType.INPUT,
+                [Attribute("n", AttributeType.NUMERIC)])
+    delta = {"tag": df_tag, "delta": True, "transformations": [
+        {"tag": "tf", "sets": [extra.get_specification()]}]}
+    assert transport.post(DATAFLOW_ROUTE, delta).status_code == 200
+    stored = _stored(transport, df_tag)
+    task = _task(df_tag, 0, transport)
+    task.add_dataset(DataSet("j" + df_tag, [Element([5])]))
+    task.end()
+    _wait(lambda: _stored(transport, df_tag) >= stored + 1)
+    assert _rows(server, df_tag, source="j") == [(5, "v0")]
+    assert _rows(server, df_tag) == [(0, "v0")]
+
+
+def test_delta_of_unknown_dataflow_is_rejected(server):
+    delta = {"tag": _tag(), "delta": True, "transformations": []}
+    r = HTTPTransport(server).post(DATAFLOW_ROUTE, delta)
+    assert r.status_code == 409
+
+
+def test_interned_dataset_round_trip(server):
+    df_tag, transport = _register(server)
+    stored = _stored(transport, df_tag)
+    interner = interning.enable(min_bytes=0)
+    try:
+        for id in range(3):
+            task = Task(id, df_tag, "tf", transport=transport)
+            task.add_dataset(DataSet("i" + df_tag, [Element([7])]))
+            task.add_dataset(DataSet("o" + df_tag,
+                                     [Element(["v{0}".format(id)])]))
+            task.end()
+    finally:
+        interning.disable()
+    assert interner.interned == 1
+    _wait(lambda: _stored(transport, df_tag) >= stored + 3)
+    assert _rows(server, df_tag) == [(7, "v0"), (7, "v1"), (7, "v2")]
+
+
+def test_unknown_reference_is_rejected(server):
+    df_tag, transport = _register(server)
+    message = json.loads(_task(df_tag, 0, transport).to_json())
+    message["sets"][0] = {"tag": "i" + df_tag, "ref": "unknown"}
+    assert transport.post(TASK_ROUTE, message).status_code == 409
+
+
+def test_query_result_is_streamed_and_cached(server):
+    df_tag, transport = _register(server)
+    client = QueryClient(server)
+    version = client.version(df_tag)
+    _task(df_tag, 0, transport).end()
+    _wait(lambda: client.version(df_tag) != version)
+    assert list(client.run(df_tag, _query(df_tag))) == [(0, "v0")]
+    # the same version is answered from the cache
+    client._stream = None
+    assert list(client.run(df_tag, _query(df_tag))) == [(0, "v0")]
+    client.close()
+
+
+def test_64_bit_task_ids_round_trip(server):
+    df_tag, transport = _register(server)
+    stored = _stored(transport, df_tag)
+    id = 2 ** 42 + 1
+    task = Task(id, df_tag, "tf", transport=transport)
+    task.begin()
+    # the second save updates the task found by its 64-bit identifier
+    task.add_dataset(DataSet("i" + df_tag, [Element([1])]))
+    task.add_dataset(DataSet("o" + df_tag, [Element(["v"])]))
+    task.end()
+    _wait(lambda: _stored(transport, df_tag) >= stored + 2)
+    assert _rows(server, df_tag) == [(1, "v")]
@@ -0,0 +1,185 @@
+import threading
+from dfa_lib_python import interning
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.overflow_policy import OverflowPolicy
+from dfa_lib_python.shipper import BackgroundShipper
+from dfa_lib_python.task import Task
+from conftest import RecordingTransport, Response
+
+TASK_ROUTE = '/pde/task/json'
+
+
+class FlakyTransport(RecordingTransport):
+    """A recording transport raising on its first ``failures`` requests."""
+    def __init__(self, failures, response=None):
+        RecordingTransport.__init__(self, response)
+        self.failures = failures
+        self.attempts = 0
+
+    def post(self, route, message):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise IOError("connection refused")
+        return RecordingTransport.post(self, route, message)
+
+
+class BlockedTransport(RecordingTransport):
+    """A recording transport waiting for ``release`` before answering."""
+    def __init__(self):
+        RecordingTransport.__init__(self)
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def post(self, route, message):
+        self.started.set()
+        self.release.wait()
+        return RecordingTransport.post(self, route, message)
+
+
+class LateSpillShipper(BackgroundShipper):
+    """A shipper whose spill is written right after the worker found none."""
+    late = None
+
+    def _take_spill(self):
+        draining = BackgroundShipper._take_spill(self)
+        if draining is None and self.late is not None:
+            thread = threading.Thread(target=_post, args=(self, self.late))
+            self.late = None
+            thread.start()
+            thread.join()
+        return draining
+
+
+def _ids(transport):
+    return [x["id"] for x in transport.bodies()]
+
+
+def _post(shipper, ids):
+    for id in ids:
+        shipper.post(TASK_ROUTE, {"id": str(id)})
+
+
+def test_messages_are_sent_in_order(recorder):
+    shipper = BackgroundShipper(recorder)
+    _post(shipper, range(100))
+    assert shipper.flush(5)
+    shipper.close()
+    assert _ids(recorder) == [str(x) for x in range(100)]
+    assert shipper.sent == 100
+
+
+def test_failed_post_is_retried():
+    transport = FlakyTransport(2)
+    shipper = BackgroundShipper(transport, backoff=0.01)
+    _post(shipper, [1])
+    assert shipper.flush(5)
+    shipper.close()
+    assert _ids(transport) == ["1"]
+    assert (shipper.sent, shipper.failed) == (1, 0)
+
+
+def test_messages_are_tried_once_at_close():
+    transport = FlakyTransport(1)
+    shipper = BackgroundShipper(transport, backoff=0.01)
+    _post(shipper, [1, 2])
+    shipper.close(5)
+    assert _ids(transport) == ["2"]
+    assert shipper.failed == 1
+
+
+def test_rejected_message_is_not_retried():
+    transport = FlakyTransport(0, Response(400))
+    shipper = BackgroundShipper(transport, backoff=0.01)
+    _post(shipper, [1])
+    shipper.close(5)
+    assert transport.attempts == 1
+    assert shipper.failed == 1
+
+
+def test_unsent_messages_are_counted_without_a_spill():
+    transport = FlakyTransport(100)
+    shipper = BackgroundShipper(transport, retries=1, backoff=0.01)
+    _post(shipper, [1, 2])
+    shipper.close(5)
+    assert shipper.failed == 2
+    assert transport.messages == []
+
+
+def test_unsent_messages_are_kept_in_the_spill(tmp_path, recorder):
+    spill_path = str(tmp_path / "spill.jsonl")
+    transport = FlakyTransport(100)
+    shipper = BackgroundShipper(transport, spill_path=spill_path, retries=1,
+                                backoff=0.01)
+    _post(shipper, range(3))
+    shipper.close(5)
+    assert shipper.sent == 0 and shipper.failed == 0
+    shipper = BackgroundShipper(recorder, spill_path=spill_path)
+    _post(shipper, range(3, 5))
+    shipper.close(5)
+    assert _ids(recorder) == ["0", "1", "2", "3", "4"]
+
+
+def test_spill_is_retried_once_the_server_is_back(tmp_path):
+    transport = FlakyTransport(2)
+    shipper = BackgroundShipper(transport, spill_path=str(tmp_path / "s"),
+                                retries=1, backoff=0.01)
+    _post(shipper, range(3))
+    assert shipper.flush(5)
+    shipper.close()
+    assert _ids(transport) == ["0", "1", "2"]
+
+
+def test_drop_oldest_drops_queued_messages():
+    transport = BlockedTransport()
+    shipper = BackgroundShipper(transport, maxsize=1,
+                                overflow=OverflowPolicy.DROP_OLDEST)
+    _post(shipper, [1])
+    transport.started.wait(5)
+    _post(shipper, [2, 3])
+    transport.release.set()
+    shipper.close(5)
+    assert _ids(transport) == ["1", "3"]
+    assert shipper.dropped == 1
+
+
+def test_overflow_spill_keeps_the_order(tmp_path):
+    transport = BlockedTransport()
+    shipper = BackgroundShipper(transport, maxsize=1,
+                                overflow=OverflowPolicy.SPILL,
+                                spill_path=str(tmp_path / "spill.jsonl"))
+    _post(shipper, [1])
+    transport.started.wait(5)
+    _post(shipper, [2, 3, 4])
+    transport.release.set()
+    shipper.close(5)
+    assert _ids(transport) == ["1", "2", "3", "4"]
+    assert shipper.spilled == 2
+
+
+def test_spill_written_after_the_worker_looked_is_sent(tmp_path, recorder):
+    shipper = LateSpillShipper(recorder, overflow=OverflowPolicy.SPILL,
+                               spill_path=str(tmp_path / "spill.jsonl"))
+    shipper.late = [1]
+    with shipper._lock:
+        # as after an overflow whose post has not written the spill yet
+        shipper._spilling = True
+        shipper._not_empty.notify()
+    assert shipper.flush(5)
+    shipper.close()
+    assert _ids(recorder) == ["1"]
+
+
+def test_shipped_tasks_are_not_interned(recorder):
+    interning.enable(min_bytes=0)
+    try:
+        shipper = BackgroundShipper(recorder)
+        for id in range(3):
+            task = Task(id, "df", "tf", transport=shipper)
+            task.add_dataset(DataSet("metadata", [Element(["host"])]))
+            task.save()
+        shipper.close(5)
+    finally:
+        interning.disable()
+    for task in recorder.bodies():
+        assert "ref" not in task["sets"][0]
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import time
+import pytest
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.sidecar import Sidecar, SidecarTransport
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import HTTPTransport
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are limited to about 100 bytes
+    directory = tempfile.mkdtemp(prefix="dfa-")
+    yield os.path.join(directory, "sidecar.sock")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def sidecar(standin, socket_path, tmp_path):
+    sidecar = Sidecar(str(tmp_path / "spool"), socket_path,
+                      HTTPTransport(standin.url), max_delay=60)
+    return sidecar.start()
+
+
+def _task(transport, id, sub_id=""):
+    return Task(id, "df", "tf", sub_id=sub_id, transport=transport)
+
+
+def _stop(sidecar, transport, received):
+    # frames are read by the threads of the server
+    transport.close()
+    deadline = time.time() + 5
+    while sidecar.received < received and time.time() < deadline:
+        time.sleep(0.01)
+    sidecar.stop()
+
+
+def test_begin_and_end_of_a_task_are_coalesced(standin, sidecar):
+    transport = SidecarTransport(sidecar.path)
+    task = _task(transport, 1)
+    task.add_dataset(DataSet("ia", [Element([1])]))
+    task.begin()
+    task.add_dataset(DataSet("oa", [Element([2])]))
+    task.end()
+    _stop(sidecar, transport, 2)
+    assert sidecar.coalesced == 1
+    assert len(standin.tasks) == 1
+    assert standin.tasks[0]["status"] == "FINISHED"
+    assert [x["tag"] for x in standin.tasks[0]["sets"]] == ["ia", "oa"]
+
+
+def test_tasks_of_other_sub_ids_are_kept_apart(standin, sidecar):
+    transport = SidecarTransport(sidecar.path)
+    for sub_id in ("a", "b"):
+        _task(transport, 1, sub_id).begin()
+    _stop(sidecar, transport, 2)
+    assert sidecar.coalesced == 0
+    assert sorted(x["sub"] for x in standin.tasks) == ["a", "b"]
+
+
+def test_duplicate_messages_are_dropped(standin, sidecar):
+    transport = SidecarTransport(sidecar.path)
+    task = _task(transport, 1)
+    task.begin()
+    task.save()
+    _stop(sidecar, transport, 2)
+    assert sidecar.received == 2
+    assert sidecar.duplicates == 1
+    assert len(standin.tasks) == 1
+
+
+def test_fallback_is_used_without_a_sidecar(socket_path, recorder):
+    transport = SidecarTransport(socket_path, fallback=recorder)
+    _task(transport, 1).begin()
+    assert recorder.routes() == ["/pde/task/json"]
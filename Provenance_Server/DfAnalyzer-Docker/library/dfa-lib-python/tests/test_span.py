@@ -0,0 +1,45 @@
+import time
+from dfa_lib_python.method_type import MethodType
+from dfa_lib_python.span import format_ns
+from dfa_lib_python.task import Task
+
+
+def test_spans_are_summed_by_method(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    with task.span():
+        time.sleep(0.001)
+    with task.span():
+        pass
+    start, end, duration, count = task.spans[MethodType.COMPUTATION.value]
+    assert count == 2
+    assert duration >= 1000000
+    assert end >= start + duration
+
+
+def test_span_decorator_times_every_call(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+
+    @task.span(MethodType.COMPUTATION)
+    def work():
+        return 42
+
+    assert work() == 42
+    assert work() == 42
+    assert task.spans[MethodType.COMPUTATION.value][3] == 2
+
+
+def test_end_sends_one_performance_per_method(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    task.begin()
+    with task.span():
+        pass
+    task.end()
+    performances = recorder.bodies()[-1]["performances"]
+    methods = [x.get("method") for x in performances]
+    assert MethodType.COMPUTATION.value in methods
+    assert MethodType.PROVENANCE.value in methods
+    assert 0 <= task.overhead() <= 1
+
+
+def test_format_ns_keeps_nanoseconds():
+    assert format_ns(1500000000123456789).endswith(".123456789")
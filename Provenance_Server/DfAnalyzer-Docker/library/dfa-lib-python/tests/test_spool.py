@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+from dfa_lib_python.spool import (OPEN_SUFFIX, REPLAYED_SUFFIX, Spool,
+                                  SpoolReplayer, read_records, seal_orphans)
+from conftest import RecordingTransport
+
+TASK_ROUTE = '/pde/task/json'
+
+
+class FailingTransport(RecordingTransport):
+    """A recording transport raising on the given request."""
+    def __init__(self, failing):
+        RecordingTransport.__init__(self)
+        self.failing = failing
+
+    def post(self, route, message):
+        if len(self.messages) + 1 == self.failing:
+            raise IOError("connection refused")
+        return RecordingTransport.post(self, route, message)
+
+
+def _ids(transport):
+    ids = []
+    for route, message in transport.messages:
+        for task in message if isinstance(message, list) else [message]:
+            ids.append(task["id"])
+    return ids
+
+
+def _files(directory, suffix):
+    return [x for x in os.listdir(directory) if x.endswith(suffix)]
+
+
+def _write(spool, ids):
+    for id in ids:
+        spool.post(TASK_ROUTE, {"id": str(id), "dataflow": "df",
+                                "transformation": "tf"})
+
+
+def test_sealed_segments_are_replayed_and_deleted(tmp_path, recorder):
+    spool = Spool(str(tmp_path))
+    _write(spool, range(3))
+    spool.close()
+    assert SpoolReplayer(str(tmp_path), recorder).run()
+    assert _ids(recorder) == ["0", "1", "2"]
+    assert _files(str(tmp_path), ".jsonl") == []
+
+
+def test_open_segments_of_other_writers_are_left_alone(tmp_path, recorder):
+    first, second = Spool(str(tmp_path)), Spool(str(tmp_path))
+    _write(first, range(2))
+    _write(second, range(2, 4))
+    first.close()
+    replayer = SpoolReplayer(str(tmp_path), recorder)
+    replayer.run()
+    assert _ids(recorder) == ["0", "1"]
+    assert len(_files(str(tmp_path), OPEN_SUFFIX)) == 1
+    # the writer keeps appending to its segment
+    _write(second, range(4, 6))
+    second.close()
+    replayer.run()
+    assert _ids(recorder) == ["0", "1", "2", "3", "4", "5"]
+
+
+def test_full_segments_are_sealed(tmp_path, recorder):
+    spool = Spool(str(tmp_path), segment_size=1)
+    _write(spool, range(3))
+    SpoolReplayer(str(tmp_path), recorder).run()
+    assert _ids(recorder) == ["0", "1"]
+    spool.close()
+
+
+def test_segments_of_dead_processes_are_sealed(tmp_path, recorder):
+    script = ("import sys; from dfa_lib_python.spool import Spool; "
+              "Spool(sys.argv[1]).post('/pde/task/json', "
+              "{'id': '7', 'dataflow': 'df', 'transformation': 'tf'})")
+    subprocess.check_call([sys.executable, "-c", script, str(tmp_path)],
+                          cwd=os.path.dirname(os.path.dirname(__file__)))
+    assert len(_files(str(tmp_path), OPEN_SUFFIX)) == 1
+    assert seal_orphans(str(tmp_path)) == 1
+    SpoolReplayer(str(tmp_path), recorder).run()
+    assert _ids(recorder) == ["7"]
+
+
+def test_interrupted_replay_resumes_at_the_checkpoint(tmp_path, recorder):
+    spool = Spool(str(tmp_path))
+    _write(spool, range(5))
+    spool.close()
+    failing = FailingTransport(2)
+    assert not SpoolReplayer(str(tmp_path), failing, batch_size=2).run()
+    assert _ids(failing) == ["0", "1"]
+    assert SpoolReplayer(str(tmp_path), recorder, batch_size=2).run()
+    assert _ids(recorder) == ["2", "3", "4"]
+
+
+def test_kept_segments_are_not_replayed_again(tmp_path, recorder):
+    spool = Spool(str(tmp_path))
+    _write(spool, range(2))
+    spool.close()
+    replayer = SpoolReplayer(str(tmp_path), recorder, delete=False)
+    replayer.run()
+    replayer.run()
+    assert _ids(recorder) == ["0", "1"]
+    assert len(_files(str(tmp_path), REPLAYED_SUFFIX)) == 1
+    assert len(list(read_records(str(tmp_path)))) == 2
@@ -0,0 +1,137 @@
+import sqlite3
+import time
+import pytest
+from dfa_lib_python.attribute import Attribute
+from dfa_lib_python.attribute_type import AttributeType
+from dfa_lib_python.batch import TaskBatch, TASK_ROUTE
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.set import Set
+from dfa_lib_python.set_type import SetType
+from dfa_lib_python.sqlite_backend import SQLiteBackend
+from dfa_lib_python.task import Task
+from dfa_lib_python.transformation import Transformation
+from dfa_lib_python.transport import HTTPTransport
+from conftest import RecordingTransport
+
+
+class FailingTransport(RecordingTransport):
+    """A transport whose server cannot be reached."""
+    def post(self, route, message):
+        raise IOError("connection refused")
+
+
+def _save_dataflow(backend):
+    split = Transformation("split")
+    split.set_sets([
+        Set("ivideo", SetType.INPUT, [Attribute("path", AttributeType.FILE)]),
+        Set("oframe", SetType.OUTPUT, [
+            Attribute("path", AttributeType.FILE),
+            Attribute("rain", AttributeType.NUMERIC)])])
+    classify = Transformation("classify")
+    classify.set_sets([
+        Set("oframe", SetType.INPUT, [
+            Attribute("path", AttributeType.FILE),
+            Attribute("rain", AttributeType.NUMERIC)])])
+    Dataflow("df", [split, classify], transport=backend).save()
+
+
+def _task(backend, id, transformation, set, values):
+    task = Task(id, "df", transformation, transport=backend)
+    task.begin()
+    task.add_dataset(DataSet(set, [Element(values)]))
+    task.end()
+
+
+def _backend(tmp_path, **kwargs):
+    backend = SQLiteBackend(str(tmp_path / "provenance.db"), **kwargs)
+    _save_dataflow(backend)
+    _task(backend, 1, "split", "ivideo", ["a.mp4"])
+    _task(backend, 1, "split", "oframe", ["a_1.png", 0.5])
+    _task(backend, 2, "classify", "oframe", ["a_1.png", 0.5])
+    return backend
+
+
+def test_files_are_traced_to_their_tasks(tmp_path):
+    with _backend(tmp_path) as backend:
+        assert backend.file_lineage("a_1.png") == [
+            ("df", "split", "1", "oframe", "OUTPUT", "FINISHED"),
+            ("df", "classify", "2", "oframe", "INPUT", "FINISHED")]
+        assert backend.file_lineage("b.png") == []
+
+
+def test_messages_of_a_task_update_one_row(tmp_path):
+    with _backend(tmp_path) as backend:
+        assert backend.query(
+            "SELECT transformation, identifier, status FROM task") == [
+            ("split", "1", "FINISHED"), ("classify", "2", "FINISHED")]
+        assert backend.query("SELECT COUNT(*) FROM message") == [(7,)]
+
+
+def test_messages_are_committed_in_batches(tmp_path):
+    backend = _backend(tmp_path, batch_size=100, commit_interval=60)
+    reader = sqlite3.connect(backend.path)
+    assert reader.execute("SELECT COUNT(*) FROM message").fetchone() == (0,)
+    backend.flush()
+    assert reader.execute("SELECT COUNT(*) FROM message").fetchone() == (7,)
+    reader.close()
+    backend.close()
+
+
+def test_messages_are_committed_after_the_interval(tmp_path):
+    backend = _backend(tmp_path, batch_size=100, commit_interval=0.05)
+    reader = sqlite3.connect(backend.path)
+    deadline = time.time() + 5
+    while reader.execute("SELECT COUNT(*) FROM message").fetchone() != (7,):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    reader.close()
+    backend.close()
+
+
+def test_a_message_that_cannot_be_stored_is_rolled_back(tmp_path):
+    with _backend(tmp_path, batch_size=100, commit_interval=None) as backend:
+        with pytest.raises(KeyError):
+            backend.post(TASK_ROUTE, {"id": "3", "transformation": "split"})
+        _task(backend, 3, "split", "ivideo", ["b.mp4"])
+        backend.flush()
+        assert backend.query("SELECT COUNT(*) FROM message") == [(9,)]
+        assert backend.query("SELECT identifier FROM task") == [
+            ("1",), ("2",), ("3",)]
+
+
+def test_a_failed_first_message_closes_its_transaction(tmp_path):
+    with SQLiteBackend(str(tmp_path / "provenance.db")) as backend:
+        with pytest.raises(KeyError):
+            backend.post(TASK_ROUTE, {"id": "1", "transformation": "tf"})
+        Task(1, "df", "tf", transport=backend).save()
+        assert backend.query("SELECT identifier FROM task") == [("1",)]
+
+
+def test_batches_are_stored_as_single_tasks(tmp_path):
+    with SQLiteBackend(str(tmp_path / "provenance.db")) as backend:
+        batch = TaskBatch(backend, max_delay=None)
+        for id in range(3):
+            Task(id, "df", "tf", transport=batch).save()
+        assert batch.flush() == []
+        assert backend.query("SELECT identifier FROM task") == [
+            ("0",), ("1",), ("2",)]
+
+
+def test_messages_are_exported_once_in_order(tmp_path, standin):
+    with _backend(tmp_path) as backend:
+        transport = HTTPTransport(standin.url)
+        assert backend.export(transport, batch_size=2) == (7, 0)
+        assert backend.export(transport) == (0, 0)
+    assert len(standin.dataflows) == 1
+    assert [(x["id"], x["status"]) for x in standin.tasks] == [
+        ("1", "RUNNING"), ("1", "FINISHED"), ("1", "RUNNING"),
+        ("1", "FINISHED"), ("2", "RUNNING"), ("2", "FINISHED")]
+
+
+def test_export_resumes_after_a_failure(tmp_path, recorder):
+    with _backend(tmp_path) as backend:
+        assert backend.export(FailingTransport()) == (0, 0)
+        assert backend.export(recorder) == (7, 0)
+        assert recorder.routes()[0] == '/pde/dataflow/json'
@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from dfa_lib_python.standin import StandInServer
+from dfa_lib_python.transport import HTTPTransport
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_requests_are_answered_and_counted(standin):
+    transport = HTTPTransport(standin.url)
+    transport.post('/pde/dataflow/json', b'{"tag":"df"}')
+    transport.post('/pde/task/json', b'{"id":"1"}')
+    assert transport.post('/pde/unknown', b'{}').status_code == 404
+    stats = transport.get('/standin/stats').json()
+    assert stats == {"requests": 3, "bytes_received": 24}
+    assert transport.get('/pde/dataflow/df').status_code == 200
+    assert transport.get('/pde/dataflow/other').status_code == 404
+    assert standin.tasks == [{"id": "1"}]
+
+
+def test_batches_are_answered_per_task(standin):
+    r = HTTPTransport(standin.url).post('/pde/task/batch/json',
+                                        b'[{"id":"1"},{"tag":"tf"}]')
+    assert r.json() == [{"id": "1", "status": 200},
+                        {"status": 400, "error": "Invalid task."}]
+    assert standin.tasks == [{"id": "1"}]
+
+
+def test_latency_is_injected():
+    with StandInServer(latency=0.05) as server:
+        start = time.perf_counter()
+        HTTPTransport(server.url).post('/pde/task/json', {"id": "1"})
+        assert time.perf_counter() - start >= 0.05
+        assert server.tasks == []
+
+
+def test_benchmark_writes_its_results(tmp_path):
+    output = str(tmp_path / "results.json")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    subprocess.check_call(
+        [sys.executable, os.path.join(ROOT, "benchmarks",
+                                      "capture_benchmark.py"),
+         "--tasks", "5", "--rows", "5", "--videos", "2", "--intern",
+         "--output", output], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)
+    with open(output) as f:
+        results = json.load(f)["results"]
+    assert [(x["workload"], x["interned"]) for x in results] == [
+        ("tiny", False), ("tiny", True), ("huge", False), ("huge", True),
+        ("wide", False), ("wide", True)]
+    assert [x["tasks"] for x in results] == [5, 5, 1, 1, 2, 2]
+    assert all(x["requests"] > 0 and x["request_bytes"] > 0
+               for x in results)
@@ -0,0 +1,50 @@
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.task import Task
+
+
+def _chunks(recorder):
+    return [x["sets"][0]["elements"] for x in recorder.bodies()]
+
+
+def test_rows_are_sent_in_chunks_of_one_task(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    rows = ([str(x)] for x in range(25))
+    assert task.stream_dataset("OA", rows, max_rows=10) == 25
+    assert [len(x) for x in _chunks(recorder)] == [10, 10, 5]
+    assert sum(_chunks(recorder), []) == [[str(x)] for x in range(25)]
+    assert {x["id"] for x in recorder.bodies()} == {"1"}
+    assert {x["sets"][0]["tag"] for x in recorder.bodies()} == {"oa"}
+
+
+def test_chunks_are_bounded_in_bytes(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    task.stream_dataset("oa", [Element(["x" * 40]) for x in range(10)],
+                        max_bytes=100)
+    assert [len(x) for x in _chunks(recorder)] == [2] * 5
+
+
+def test_rows_are_read_while_chunks_are_sent(recorder):
+    produced = []
+
+    def rows():
+        for x in range(6):
+            produced.append(x)
+            yield [x]
+
+    sent = []
+    post = recorder.post
+    recorder.post = lambda route, message: \
+        sent.append(len(produced)) or post(route, message)
+    Task(1, "df", "tf", transport=recorder).stream_dataset(
+        "oa", rows(), max_rows=2)
+    assert sent == [2, 4, 6]
+
+
+def test_pending_datasets_are_kept_for_the_next_save(recorder):
+    task = Task(1, "df", "tf", transport=recorder)
+    task.add_dataset(DataSet("ia", [Element(["a"])]))
+    task.stream_dataset("oa", [["b"]])
+    task.save()
+    assert [[x["tag"] for x in body["sets"]]
+            for body in recorder.bodies()] == [["oa"], ["ia"]]
@@ -0,0 +1,42 @@
+import json
+import pytest
+from dfa_lib_python.dataset import DataSet
+from dfa_lib_python.element import Element
+from dfa_lib_python.method_type import MethodType
+from dfa_lib_python.task import Task
+
+
+class LabeledTask(Task):
+    def __init__(self, *args, **kwargs):
+        Task.__init__(self, *args, **kwargs)
+        self._label = "nightly"
+
+
+def test_to_json_matches_the_specification():
+    task = Task(1, "DF", "TF", sub_id="a", workspace="/tmp")
+    task.add_dataset(DataSet("ia", [Element(["a.png", 1])]))
+    assert json.loads(task.to_json().decode("utf-8")) == \
+        task.get_specification()
+
+
+def test_instances_only_have_their_slots():
+    task = Task(1, "df", "tf")
+    dataset = DataSet("ia", [Element([1])])
+    for value in (task, dataset, dataset.elements[0]):
+        assert not hasattr(value, "__dict__")
+        with pytest.raises(AttributeError):
+            value.note = "not sent"
+
+
+def test_save_profiling_is_turned_off_on_the_class(recorder, monkeypatch):
+    monkeypatch.setattr(Task, "profile_saves", False)
+    task = Task(1, "df", "tf", transport=recorder)
+    task.begin()
+    assert MethodType.PROVENANCE.value not in task.spans
+
+
+def test_fields_of_subclasses_are_sent(recorder):
+    task = LabeledTask(1, "df", "tf", transport=recorder)
+    task.save()
+    assert recorder.bodies()[0]["label"] == "nightly"
+    assert task.get_specification()["label"] == "nightly"
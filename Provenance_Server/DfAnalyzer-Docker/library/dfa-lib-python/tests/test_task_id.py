@@ -0,0 +1,92 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from dfa_lib_python import task_id
+from dfa_lib_python.task import Task
+from dfa_lib_python.task_id import (MAX_SEQUENCE, IdGenerator, decompose,
+                                    node_id)
+
+
+@pytest.fixture(autouse=True)
+def slots(tmp_path, monkeypatch):
+    monkeypatch.setattr(task_id, "slot_directory", str(tmp_path))
+
+
+def test_ids_are_unique_and_ordered_across_threads():
+    generator = IdGenerator(node=3)
+    ids = [[] for x in range(4)]
+
+    def draw(target):
+        for x in range(2000):
+            target.append(generator.next_id())
+
+    threads = [threading.Thread(target=draw, args=(x,)) for x in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(x == sorted(x) for x in ids)
+    every = sum(ids, [])
+    assert len(set(every)) == len(every)
+    assert all(0 < x < 1 << 63 for x in every)
+
+
+def test_ids_are_decomposed():
+    generator = IdGenerator(node=5, process=9)
+    time, node, process, sequence = decompose(str(generator.next_id()))
+    assert (node, process) == (5, 9)
+    assert abs(datetime.now(timezone.utc) - time) < timedelta(seconds=5)
+
+
+def test_generators_of_a_node_take_different_slots():
+    first, second = IdGenerator(node=1), IdGenerator(node=1)
+    process = first.process
+    assert process != second.process
+    first.close()
+    assert IdGenerator(node=1).process == process
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_processes_take_a_slot_of_their_own():
+    generator = IdGenerator(node=1)
+    parent = generator.process
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write, str(generator.process).encode("ascii"))
+        os._exit(0)
+    os.close(write)
+    child = int(os.read(read, 16))
+    os.waitpid(pid, 0)
+    os.close(read)
+    assert child != parent and generator.process == parent
+
+
+def test_full_milliseconds_and_clock_steps_back_keep_ids_ordered(
+        monkeypatch):
+    generator = IdGenerator(node=1, process=1)
+    clock = [1000]
+    generator._now = lambda: clock[0]
+    # waiting for the next millisecond moves the clock
+    monkeypatch.setattr(task_id.time, "sleep",
+                        lambda seconds: clock.__setitem__(0, clock[0] + 1))
+    ids = [generator.next_id() for x in range(MAX_SEQUENCE + 2)]
+    # the ids of a full millisecond go on in the next one
+    assert decompose(ids[-1])[0] > decompose(ids[0])[0]
+    clock[0] = 900
+    ids.extend(generator.next_id() for x in range(MAX_SEQUENCE + 2))
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+
+def test_node_id_comes_from_the_environment(monkeypatch):
+    monkeypatch.setenv("DFA_NODE_ID", "42")
+    assert node_id() == 42
+    monkeypatch.setenv("DFA_NODE_ID", "4096")
+    with pytest.raises(AssertionError):
+        node_id()
+
+
+def test_tasks_without_an_id_draw_one():
+    first, second = Task(None, "df", "tf"), Task(None, "df", "tf")
+    assert int(second._id) > int(first._id)
@@ -0,0 +1,63 @@
+import pytest
+import requests
+from dfa_lib_python import transport as transport_module
+from dfa_lib_python.dataflow import Dataflow
+from dfa_lib_python.task import Task
+from dfa_lib_python.transport import (HTTPTransport, get_default_transport,
+                                      set_default_transport)
+
+
+def _count_connections(server):
+    connections = []
+    process_request = server._server.process_request
+
+    def counted(request, address):
+        connections.append(address)
+        return process_request(request, address)
+
+    server._server.process_request = counted
+    return connections
+
+
+def test_requests_share_one_connection(standin):
+    connections = _count_connections(standin)
+    transport = HTTPTransport(standin.url)
+    Dataflow("df", transport=transport).save()
+    for id in range(5):
+        Task(id, "df", "tf", transport=transport).save()
+    transport.close()
+    assert len(standin.dataflows) == 1
+    assert [x["id"] for x in standin.tasks] == ["0", "1", "2", "3", "4"]
+    assert len(connections) == 1
+
+
+def test_dicts_and_encoded_messages_are_posted_as_json(standin):
+    transport = HTTPTransport(standin.url + "/")
+    assert transport.post('/pde/task/json', {"id": "1"}).status_code == 200
+    assert transport.post('/pde/task/json', b'{"id":"2"}').status_code == 200
+    assert standin.tasks == [{"id": "1"}, {"id": "2"}]
+    assert transport.get('/standin/stats').json()["requests"] == 2
+
+
+def test_unreachable_server_raises():
+    transport = HTTPTransport("http://127.0.0.1:1", connect_timeout=0.5)
+    with pytest.raises(requests.ConnectionError):
+        transport.post('/pde/task/json', {"id": "1"})
+    assert transport.timeout == (0.5, 30)
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(AssertionError):
+        HTTPTransport(pool_maxsize=0)
+
+
+def test_default_transport_is_shared_and_replaceable(recorder, monkeypatch):
+    monkeypatch.setattr(transport_module, "_default_transport", None)
+    default = get_default_transport()
+    assert isinstance(default, HTTPTransport)
+    assert get_default_transport() is default
+    set_default_transport(recorder)
+    Task(1, "df", "tf").save()
+    assert [x["id"] for x in recorder.bodies()] == ["1"]
+    with pytest.raises(AssertionError):
+        set_default_transport(object())